@@ -0,0 +1,106 @@
+import os
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from V2L_Profile import file_record
+from V2L_Render import use_agg
+
+# Resultado de procesar un elemento del lote (archivo, hoja...)
+BatchResult = namedtuple("BatchResult", ["item", "result", "error", "seconds"])
+
+
+def set_executor(kind):
+    """Tipo de pool para workers > 1: "process" (por defecto) o "thread" (se hereda en los procesos hijos)."""
+    if kind not in ("process", "thread"):
+        raise ValueError(f"Tipo de pool desconocido: {kind}")
+    os.environ["V2L_EXECUTOR"] = kind
+
+
+def executor_kind():
+    return os.environ.get("V2L_EXECUTOR", "process")
+
+
+def init_worker():
+    """Inicializa cada proceso del pool con el backend no interactivo Agg."""
+    use_agg()
+
+
+def _run_one(func, item, args):
+    t0 = time.perf_counter()
+    try:
+        with file_record(item):
+            return BatchResult(item, func(item, *args), None, time.perf_counter() - t0)
+    except Exception as e:
+        detalle = "".join(traceback.format_exception_only(type(e), e)).strip()
+        return BatchResult(item, None, detalle, time.perf_counter() - t0)
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def create_pool(workers):
+    """Pool de procesos (inicializados con Agg) o de hilos, según executor_kind()."""
+    if executor_kind() == "thread":
+        use_agg()
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="v2l")
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+
+def run_batch(func, items, args=(), workers=1):
+    """Aplica func(item, *args) a cada elemento, en serie o repartido en un pool de procesos (o de hilos).
+
+    Con hilos, func no debe usar pyplot: cada archivo dibuja en sus propias figuras (V2L_Render.new_figure).
+    """
+    items = list(items)
+    if workers is None or workers <= 0:
+        workers = default_workers()
+    workers = min(workers, len(items)) if items else 1
+
+    if workers <= 1:
+        results = []
+        for item in items:
+            result = _run_one(func, item, args)
+            _report(result)
+            results.append(result)
+        return results
+
+    results = []
+    with create_pool(workers) as pool:
+        futures = [pool.submit(_run_one, func, item, args) for item in items]
+        for future in as_completed(futures):
+            result = future.result()
+            _report(result)
+            results.append(result)
+
+    # Mantener el orden de entrada para que el resumen sea reproducible
+    orden = {item: k for k, item in enumerate(items)}
+    results.sort(key=lambda r: orden[r.item])
+    return results
+
+
+def _report(result):
+    nombre = os.path.basename(str(result.item))
+    if result.error:
+        print(f"Error al procesar {nombre}: {result.error}")
+    else:
+        print(f"Procesado {nombre} en {result.seconds:.2f} s")
+
+
+def print_summary(results, wall_time=None):
+    """Imprime el resumen final del lote: correctos, errores y tiempos."""
+    ok = [r for r in results if r.error is None]
+    errores = [r for r in results if r.error is not None]
+    total_cpu = sum(r.seconds for r in results)
+
+    print("\nResumen del lote")
+    print(f"  Archivos procesados: {len(ok)} / {len(results)}")
+    if wall_time is not None:
+        print(f"  Tiempo total: {wall_time:.2f} s (suma por archivo: {total_cpu:.2f} s)")
+    if errores:
+        print(f"  Errores ({len(errores)}):")
+        for r in errores:
+            print(f"    {os.path.basename(str(r.item))}: {r.error}")
+    return len(errores)
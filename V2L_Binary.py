@@ -0,0 +1,131 @@
+"""Formato binario intermedio de las capturas: columnas float32/float64 que se abren con np.memmap.
+
+Un CSV de forma de onda se convierte una sola vez (por bloques, con memoria acotada) en un archivo con una
+cabecera pequeña y una matriz contigua por canal:
+
+    V2LBIN01 | longitud de la cabecera (uint32 LE) | cabecera JSON | relleno | columna 0 | columna 1 | ...
+
+La cabecera guarda el número de filas, el tipo, los canales con sus unidades, la frecuencia de muestreo y el
+desplazamiento de cada columna (alineado a ALIGN bytes). BinaryTable abre cada columna como np.memmap de solo
+lectura: los cortes no copian datos y los procesos del pool que abren el mismo archivo comparten las páginas.
+"""
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"V2LBIN01"
+EXTENSION = ".v2lb"
+# Alineación (bytes) del inicio de los datos y de cada columna
+ALIGN = 64
+DTYPES = ("float32", "float64")
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def write_binary(path, blocks, columns, dtype="float32", sample_rate=None, units=None, metadata=None):
+    """Escribe los bloques (filas x columnas) en path en formato columnar; devuelve el número de filas.
+
+    Los bloques se vuelcan según llegan a un temporal por columna, así que la conversión no necesita tener
+    todo el archivo en memoria.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Tipo no admitido {dtype!r}: use {' o '.join(DTYPES)}")
+    columns = list(columns)
+    itemsize = np.dtype(dtype).itemsize
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryDirectory(dir=directory, prefix=".v2lb_") as tmp:
+        parts = [open(os.path.join(tmp, f"{k}.col"), "wb") for k in range(len(columns))]
+        rows = 0
+        try:
+            for block in blocks:
+                block = np.asarray(block)
+                if block.ndim != 2 or block.shape[1] != len(columns):
+                    raise ValueError(f"Bloque de forma {block.shape}; se esperaban {len(columns)} columnas")
+                for k, part in enumerate(parts):
+                    part.write(np.ascontiguousarray(block[:, k], dtype=dtype).tobytes())
+                rows += len(block)
+        finally:
+            for part in parts:
+                part.close()
+
+        offsets, offset = [], 0
+        for _ in columns:
+            offsets.append(offset)
+            offset = _aligned(offset + rows * itemsize)
+        header = {
+            "version": 1, "rows": rows, "dtype": dtype, "columns": columns,
+            "units": list(units) if units is not None else [""] * len(columns),
+            "sample_rate": sample_rate, "offsets": offsets, "metadata": metadata or {},
+        }
+        text = json.dumps(header).encode("utf-8")
+        data_start = _aligned(len(MAGIC) + 4 + len(text))
+
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(text)) + text)
+            for k, part_offset in enumerate(offsets):
+                f.seek(data_start + part_offset)
+                with open(os.path.join(tmp, f"{k}.col"), "rb") as part:
+                    while True:
+                        chunk = part.read(1 << 24)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+            f.truncate(data_start + offset)
+    return rows
+
+
+def read_header(path):
+    """(cabecera, inicio de los datos) de un archivo binario."""
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + 4)
+        if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} no es un archivo binario de V2L")
+        (length,) = struct.unpack("<I", prefix[len(MAGIC):])
+        header = json.loads(f.read(length).decode("utf-8"))
+    return header, _aligned(len(MAGIC) + 4 + length)
+
+
+class BinaryTable:
+    """Columnas de un archivo binario como mapas de memoria de solo lectura."""
+
+    def __init__(self, path):
+        self.path = path
+        self.header, data_start = read_header(path)
+        self.rows = self.header["rows"]
+        self.dtype = np.dtype(self.header["dtype"])
+        self.columns = self.header["columns"]
+        self.units = dict(zip(self.columns, self.header["units"]))
+        self.sample_rate = self.header["sample_rate"]
+        self._arrays = {}
+        for col, offset in zip(self.columns, self.header["offsets"]):
+            if self.rows:
+                self._arrays[col] = np.memmap(path, dtype=self.dtype, mode="r", offset=data_start + offset,
+                                              shape=(self.rows,))
+            else:
+                self._arrays[col] = np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, column):
+        return self._arrays[column]
+
+    def iter_blocks(self, chunksize, columns=None):
+        """Bloques float64 (filas x columnas) de chunksize filas; solo se copia el bloque en curso."""
+        arrays = [self._arrays[col] for col in (columns or self.columns)]
+        for start in range(0, self.rows, chunksize):
+            yield np.column_stack([a[start:start + chunksize] for a in arrays]).astype(float, copy=False)
+
+    def frame(self, columns=None):
+        """DataFrame float64 con las columnas indicadas (una copia en memoria, sin volver a leer el texto)."""
+        return pd.DataFrame({col: np.asarray(self._arrays[col], dtype=float) for col in (columns or self.columns)})
+
+
+def open_binary(path):
+    return BinaryTable(path)
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from V2L_Cache import file_hash
+
+MANIFEST_NAME = ".v2l_build.json"
+
+
+def params_hash(params):
+    """Hash estable de los parámetros de dibujo/cálculo que afectan a las salidas."""
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def data_hash(*arrays):
+    """Hash del contenido de uno o varios arrays (p. ej. los datos de una hoja)."""
+    h = hashlib.blake2b(digest_size=20)
+    for array in arrays:
+        h.update(np.ascontiguousarray(array))
+    return h.hexdigest()
+
+
+class BuildManifest:
+    """Registro entrada -> (hash, parámetros, salidas) para regenerar solo lo que ha cambiado, al estilo make."""
+
+    def __init__(self, output_folder, name=MANIFEST_NAME):
+        self.path = os.path.join(output_folder, name)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"Manifiesto de compilación ilegible, se regenera todo: {self.path}")
+
+    def _key(self, input_path, key):
+        return key or os.path.abspath(input_path)
+
+    def is_up_to_date(self, input_path, params, key=None, content_hash=None):
+        """True si la entrada no ha cambiado, los parámetros son los mismos y todas las salidas existen."""
+        entry = self.entries.get(self._key(input_path, key))
+        if not entry or entry["params"] != params_hash(params):
+            return False
+        if not all(os.path.exists(output) for output in entry["outputs"]):
+            return False
+        if content_hash is not None:
+            return entry["hash"] == content_hash
+
+        stat = os.stat(input_path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        # Misma longitud pero otra fecha: decidir por el contenido
+        return file_hash(input_path) == entry["hash"]
+
+    def record(self, input_path, params, outputs, key=None, content_hash=None):
+        """Anota las salidas generadas a partir de una entrada con unos parámetros concretos."""
+        entry = {
+            "input": os.path.abspath(input_path),
+            "params": params_hash(params),
+            "outputs": [os.path.abspath(output) for output in outputs],
+            "built": time.time(),
+        }
+        if content_hash is not None:
+            entry["hash"] = content_hash
+        else:
+            stat = os.stat(input_path)
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, hash=file_hash(input_path))
+        self.entries[self._key(input_path, key)] = entry
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from V2L_Profile import stage
+
+try:
+    import pyarrow  # noqa: F401
+    FORMATO_CACHE = "parquet"
+except ImportError:
+    FORMATO_CACHE = "pickle"
+
+# Configuración por variables de entorno, para que la hereden también los procesos hijos
+CACHE_DIR_DEFECTO = os.path.join(os.path.expanduser("~"), ".cache", "v2l")
+MAX_MB_DEFECTO = 2048
+
+
+def configure(cache_dir=None, max_mb=None, enabled=None):
+    """Ajusta la carpeta, el tamaño máximo y la activación de la caché."""
+    if cache_dir is not None:
+        os.environ["V2L_CACHE_DIR"] = str(cache_dir)
+    if max_mb is not None:
+        os.environ["V2L_CACHE_MAX_MB"] = str(max_mb)
+    if enabled is not None:
+        os.environ["V2L_CACHE"] = "1" if enabled else "0"
+
+
+def cache_dir():
+    return os.environ.get("V2L_CACHE_DIR", CACHE_DIR_DEFECTO)
+
+
+def cache_enabled():
+    return os.environ.get("V2L_CACHE", "1") != "0"
+
+
+def max_cache_bytes():
+    return int(float(os.environ.get("V2L_CACHE_MAX_MB", MAX_MB_DEFECTO)) * 1024 ** 2)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Calcula el hash del contenido de un archivo leyéndolo por bloques."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(chunk_size), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _entry_key(path, kind):
+    return hashlib.sha1(f"{os.path.abspath(path)}|{kind}".encode("utf-8")).hexdigest()[:24]
+
+
+def _read_entry(entry_path):
+    try:
+        with open(entry_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_entry(entry_path, entry):
+    # Escritura atómica: varios procesos pueden usar la caché a la vez
+    tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=1)
+    os.replace(tmp_path, entry_path)
+
+
+def manifest(directory=None):
+    """Devuelve las entradas de la caché (origen, tamaño, mtime, hash, último acceso)."""
+    directory = directory or cache_dir()
+    if not os.path.isdir(directory):
+        return []
+    entradas = []
+    for nombre in os.listdir(directory):
+        if nombre.endswith(".json"):
+            entry = _read_entry(os.path.join(directory, nombre))
+            if entry:
+                entradas.append(entry)
+    return entradas
+
+
+def _remove_entry(directory, entry):
+    for nombre in (entry["data_file"], f"{entry['key']}.json"):
+        try:
+            os.remove(os.path.join(directory, nombre))
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # En Windows no se puede borrar un archivo abierto como mapa de memoria: se deja para otra vez
+            return
+
+
+def _load_data(directory, entry):
+    data_path = os.path.join(directory, entry["data_file"])
+    if entry["format"] == "parquet":
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def _store_data(directory, key, df):
+    """Guarda el DataFrame en formato columnar; si no es posible, recurre a pickle."""
+    if FORMATO_CACHE == "parquet":
+        data_file = f"{key}.parquet"
+        try:
+            df.to_parquet(os.path.join(directory, data_file), index=False)
+            return data_file, "parquet"
+        except (ValueError, TypeError, ImportError) as e:
+            # Columnas con tipos mezclados que Arrow no admite
+            print(f"Caché: no se pudo guardar en Parquet ({e}); se usa pickle.")
+    data_file = f"{key}.pkl"
+    df.to_pickle(os.path.join(directory, data_file))
+    return data_file, "pickle"
+
+
+def cached_read(path, kind, loader):
+    """Devuelve loader(path) usando la copia en caché si el archivo de origen no ha cambiado."""
+    with stage("load") as s:
+        df, hit = _cached_read(path, kind, loader)
+        s.add(rows=len(df), cache_hits=int(hit))
+    return df
+
+
+def _cached_read(path, kind, loader):
+    if not cache_enabled():
+        return loader(path), False
+
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    key = _entry_key(path, kind)
+    entry_path = os.path.join(directory, f"{key}.json")
+    stat = os.stat(path)
+    entry = _read_entry(entry_path)
+
+    if entry and os.path.exists(os.path.join(directory, entry["data_file"])):
+        if _is_current(entry, path, stat):
+            try:
+                df = _load_data(directory, entry)
+            except Exception as e:
+                print(f"Caché: entrada corrupta para {path} ({e}); se vuelve a leer.")
+            else:
+                _touch_entry(entry_path, entry, stat)
+                return df, True
+        _remove_entry(directory, entry)
+
+    df = loader(path)
+    data_file, formato = _store_data(directory, key, df)
+    _new_entry(directory, key, kind, path, stat, data_file, formato)
+    return df, False
+
+
+def _is_current(entry, path, stat):
+    vigente = entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+    if not vigente and entry["size"] == stat.st_size:
+        # Solo cambió la fecha (copia, sincronización...): comprobar el contenido
+        vigente = entry["hash"] == file_hash(path)
+    return vigente
+
+
+def _touch_entry(entry_path, entry, stat):
+    entry["mtime_ns"] = stat.st_mtime_ns
+    entry["last_access"] = time.time()
+    _write_entry(entry_path, entry)
+
+
+def _new_entry(directory, key, kind, path, stat, data_file, formato):
+    entry = {
+        "key": key,
+        "kind": kind,
+        "source": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": file_hash(path),
+        "data_file": data_file,
+        "format": formato,
+        "bytes": os.path.getsize(os.path.join(directory, data_file)),
+        "last_access": time.time(),
+    }
+    _write_entry(os.path.join(directory, f"{key}.json"), entry)
+    # La entrada recién creada nunca se expulsa: quien la ha pedido la va a abrir a continuación
+    evict(directory, keep=key)
+
+
+def cached_file(path, kind, converter, extension):
+    """Ruta de un archivo derivado de path que se genera una sola vez con converter(path, destino).
+
+    El archivo derivado vive en la caché con las mismas reglas que cached_read (se regenera si el origen
+    cambia, cuenta para el tamaño máximo y se borra con `cache --clear`). Con la caché desactivada se
+    regenera en cada llamada.
+    """
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    key = _entry_key(path, kind)
+    data_file = f"{key}{extension}"
+    data_path = os.path.join(directory, data_file)
+    entry_path = os.path.join(directory, f"{key}.json")
+    stat = os.stat(path)
+
+    with stage("load") as s:
+        entry = _read_entry(entry_path) if cache_enabled() else None
+        if entry and os.path.exists(data_path) and _is_current(entry, path, stat):
+            _touch_entry(entry_path, entry, stat)
+            s.add(cache_hits=1)
+            return data_path
+        if entry:
+            _remove_entry(directory, entry)
+
+        # Conversión a un temporal y renombrado: un lector nunca ve un archivo a medio escribir
+        tmp_path = f"{data_path}.{os.getpid()}.tmp"
+        try:
+            converter(path, tmp_path)
+            os.replace(tmp_path, data_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        s.add(cache_hits=0)
+        if cache_enabled():
+            _new_entry(directory, key, kind, path, stat, data_file, extension.lstrip("."))
+    return data_path
+
+
+def evict(directory=None, max_bytes=None, keep=None):
+    """Elimina las entradas usadas hace más tiempo hasta respetar el tamaño máximo (LRU).
+
+    La entrada con clave keep se conserva aunque por sí sola supere el máximo.
+    """
+    directory = directory or cache_dir()
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    entradas = sorted(manifest(directory), key=lambda e: e["last_access"])
+    total = sum(e["bytes"] for e in entradas)
+    eliminadas = 0
+    for entry in entradas:
+        if total <= max_bytes:
+            break
+        if entry["key"] == keep:
+            continue
+        _remove_entry(directory, entry)
+        total -= entry["bytes"]
+        eliminadas += 1
+    if total > max_bytes:
+        for entry in entradas:
+            if entry["key"] == keep:
+                print(f"Caché: la entrada de {os.path.basename(entry['source'])} ({entry['bytes'] / 1024 ** 2:.1f} MB) "
+                      f"supera por sí sola el tamaño máximo ({max_bytes / 1024 ** 2:.1f} MB); se conserva.")
+    return eliminadas
+
+
+def invalidate(source=None, directory=None):
+    """Borra de la caché las entradas de un archivo de origen, o todas si no se indica ninguno."""
+    directory = directory or cache_dir()
+    source = os.path.abspath(source) if source else None
+    eliminadas = 0
+    for entry in manifest(directory):
+        if source is None or entry["source"] == source:
+            _remove_entry(directory, entry)
+            eliminadas += 1
+    return eliminadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gestiona la caché columnar de archivos de instrumentos.")
+    parser.add_argument("--cache-dir", help="Carpeta de la caché (por defecto ~/.cache/v2l)")
+    parser.add_argument("--list", action="store_true", help="Lista las entradas de la caché")
+    parser.add_argument("--clear", action="store_true", help="Invalida toda la caché o solo la de --source")
+    parser.add_argument("--source", help="Archivo de origen cuya entrada se invalida")
+    parser.add_argument("--max-mb", type=float, help="Aplica un tamaño máximo y expulsa las entradas más antiguas")
+    args = parser.parse_args(argv)
+
+    configure(cache_dir=args.cache_dir)
+    if args.clear or args.source:
+        print(f"Entradas eliminadas: {invalidate(args.source)}")
+    if args.max_mb is not None:
+        print(f"Entradas expulsadas: {evict(max_bytes=int(args.max_mb * 1024 ** 2))}")
+    if args.list:
+        entradas = sorted(manifest(), key=lambda e: e["last_access"], reverse=True)
+        for e in entradas:
+            print(f"{e['bytes'] / 1024:10.1f} KB  {e['kind']:12s}  {e['source']}")
+        print(f"Total: {len(entradas)} entradas, {sum(e['bytes'] for e in entradas) / 1024 ** 2:.1f} MB en {cache_dir()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import numpy as np
+
+# Por debajo de este número de muestras no merece la pena diezmar
+MIN_POINTS = 4000
+
+
+def set_decimation(enabled):
+    """Activa o desactiva el diezmado de las series (se hereda en los procesos hijos)."""
+    os.environ["V2L_DECIMATE"] = "1" if enabled else "0"
+
+
+def decimation_enabled():
+    return os.environ.get("V2L_DECIMATE", "1") != "0"
+
+
+def _bucket_extremes(values, size):
+    """Posición del mínimo y del máximo de cada tramo de `size` muestras, ignorando NaN."""
+    k = len(values) // size
+    body = values[:k * size].reshape(k, size)
+    if np.isnan(body).any():
+        lo = np.where(np.isnan(body), np.inf, body).argmin(axis=1)
+        hi = np.where(np.isnan(body), -np.inf, body).argmax(axis=1)
+    else:
+        lo = body.argmin(axis=1)
+        hi = body.argmax(axis=1)
+    starts = np.arange(k) * size
+    return starts + lo, starts + hi
+
+
+def minmax_indices(n_buckets, *series):
+    """Índices que conservan el mínimo y el máximo de cada tramo, en orden temporal."""
+    n = len(series[0])
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = int(np.ceil(n / n_buckets))
+    partes = [np.array([0, n - 1])]
+    for values in series:
+        values = np.asarray(values, dtype=float)
+        partes.extend(_bucket_extremes(values, size))
+        resto = n % size
+        if resto:
+            cola = values[n - resto:]
+            if not np.isnan(cola).all():
+                partes.append(n - resto + np.array([np.nanargmin(cola), np.nanargmax(cola)]))
+    return np.unique(np.concatenate(partes))
+
+
+def target_buckets(ax, dpi=None):
+    """Número de tramos según el ancho en píxeles de la figura (dos puntos por píxel)."""
+    fig = ax.figure
+    dpi = dpi or fig.dpi
+    return max(1, int(fig.get_figwidth() * dpi))
+
+
+def decimate(x, y, n_buckets, xy=False):
+    """Reduce la serie (x, y) a la envolvente mín/máx de n_buckets tramos."""
+    y = np.asarray(y)
+    x = np.arange(len(y)) if x is None else np.asarray(x)
+    if len(y) < MIN_POINTS or not np.issubdtype(y.dtype, np.number):
+        return x, y
+    if xy and np.issubdtype(x.dtype, np.number):
+        idx = minmax_indices(n_buckets, y, x)
+    else:
+        idx = minmax_indices(n_buckets, y)
+    return x[idx], y[idx]
+
+
+def plot_line(ax, x, y, *args, dpi=None, xy=False, **kwargs):
+    """ax.plot() con diezmado mín/máx previo: conserva picos y valles con ~2 puntos por píxel."""
+    if decimation_enabled():
+        x, y = decimate(x, y, target_buckets(ax, dpi), xy=xy)
+    return ax.plot(x, y, *args, **kwargs)
+
+
+def update_line(line, x, y, dpi=None, xy=False):
+    """line.set_data() con el mismo diezmado que plot_line(), para reutilizar una figura ya construida."""
+    if decimation_enabled():
+        x, y = decimate(x, y, target_buckets(line.axes, dpi), xy=xy)
+    line.set_data(x, y)
+
+
+class StreamingMinMax:
+    """Envolvente mín/máx construida bloque a bloque con memoria acotada (para archivos que no caben en RAM)."""
+
+    def __init__(self, n_buckets=2000):
+        self.n_buckets = n_buckets
+        self.size = 1
+        self.count = 0
+        self._lo_idx = np.empty(0, dtype=np.int64)
+        self._lo_val = np.empty(0)
+        self._hi_idx = np.empty(0, dtype=np.int64)
+        self._hi_val = np.empty(0)
+        self._pending = np.empty(0)
+
+    def update(self, values):
+        """Añade las siguientes muestras de la serie."""
+        values = np.asarray(values, dtype=float)
+        data = np.concatenate([self._pending, values]) if len(self._pending) else values
+        start = self.count - len(self._pending)
+        self.count += len(values)
+
+        # Tramos más grandes si el bloque por sí solo ya supera el presupuesto de puntos
+        while len(data) // self.size > 2 * self.n_buckets:
+            self.size *= 2
+
+        k = len(data) // self.size
+        if k:
+            lo, hi = _bucket_extremes(data, self.size)
+            self._lo_idx = np.concatenate([self._lo_idx, start + lo])
+            self._lo_val = np.concatenate([self._lo_val, data[lo]])
+            self._hi_idx = np.concatenate([self._hi_idx, start + hi])
+            self._hi_val = np.concatenate([self._hi_val, data[hi]])
+        self._pending = data[k * self.size:].copy()
+
+        while len(self._lo_idx) > 2 * self.n_buckets:
+            self._merge()
+
+    def _merge(self):
+        # Une los tramos contiguos de dos en dos y duplica el tamaño de los siguientes
+        m = len(self._lo_idx) // 2 * 2
+        a, b = slice(0, m, 2), slice(1, m, 2)
+        lo_first = (self._lo_val[a] <= self._lo_val[b]) | np.isnan(self._lo_val[b])
+        hi_first = (self._hi_val[a] >= self._hi_val[b]) | np.isnan(self._hi_val[b])
+        lo_idx = np.where(lo_first, self._lo_idx[a], self._lo_idx[b])
+        lo_val = np.where(lo_first, self._lo_val[a], self._lo_val[b])
+        hi_idx = np.where(hi_first, self._hi_idx[a], self._hi_idx[b])
+        hi_val = np.where(hi_first, self._hi_val[a], self._hi_val[b])
+        self._lo_idx = np.concatenate([lo_idx, self._lo_idx[m:]])
+        self._lo_val = np.concatenate([lo_val, self._lo_val[m:]])
+        self._hi_idx = np.concatenate([hi_idx, self._hi_idx[m:]])
+        self._hi_val = np.concatenate([hi_val, self._hi_val[m:]])
+        self.size *= 2
+
+    def result(self):
+        """Devuelve (índices de muestra, valores) de la envolvente en orden temporal."""
+        idx = [self._lo_idx, self._hi_idx]
+        val = [self._lo_val, self._hi_val]
+        if len(self._pending):
+            start = self.count - len(self._pending)
+            idx.append(start + np.arange(len(self._pending)))
+            val.append(self._pending)
+        idx = np.concatenate(idx)
+        val = np.concatenate(val)
+        idx, first = np.unique(idx, return_index=True)
+        return idx, val[first]
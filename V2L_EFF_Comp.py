@@ -1,91 +1,309 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib import colormaps
 import numpy as np
 import os
+import sys
+import warnings
 
-# Ruta del archivo Excel y carpeta de destino
-ruta_excel = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\KONA_EFF_Comparation.xlsx"
-ruta_salida = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\comparacion_eff"
-
-# Crear carpeta de salida si no existe
-os.makedirs(ruta_salida, exist_ok=True)
-
-# Leer el archivo Excel
-df = pd.read_excel(ruta_excel, engine='openpyxl')
-
-# Eliminar la columna A (no necesaria)
-df = df.iloc[:, 1:]  # Nos quedamos con las columnas de eficiencia y la columna B de potencia
-
-# Obtener los valores de la columna B (potencia en kW) como eje X
-x_values = df.iloc[:, 0]  # La columna B es la primera columna ahora
-x_label = "Power (kW)"
-
-# Asegurarnos de que 0.1 kW esté en el conjunto de datos si no está presente
-if 0.1 not in x_values.values:
-    x_values = np.append([0.1], x_values)  # Agregar 0.1 si no está
-    # Insertamos una fila con NaN para las eficiencias asociadas al 0.1 kW
-    empty_row = np.nan * np.ones(df.shape[1])
-    df.loc[-1] = empty_row
-    df.index = df.index + 1  # Reindexar
-    df.loc[0, df.columns[1:]] = np.nan  # Establecer NaN para las eficiencias
-
-# Convertir eficiencias a porcentaje (multiplicamos por 100)
-df.iloc[:, 1:] *= 100  # Convertir todas las eficiencias a porcentaje
-
-# Crear el gráfico
-plt.figure(figsize=(10, 6))
-
-# Colores personalizados para las curvas (pares de colores similares)
-colores = [
-    ['#1f77b4', '#aec7e8'],  # Dos tonos de azul
-    ['#2ca02c', '#98df8a'],  # Dos tonos de verde
-    ['#9467bd', '#c5b0d5']   # Dos tonos de violeta
-]
-
-# Graficar las curvas de las columnas de eficiencia (desde la columna C hacia adelante)
-for i, col in enumerate(df.columns[1:]):  # Excluir la columna B (potencia)
-    color_par = colores[i // 2]  # Asignar el par de colores basado en el índice
-    
-    # Excluir la fila 4 (índice 3) al graficar la curva
-    if col in ['G', 'H']:  # Especificamos las columnas G y H
-        # Graficar las curvas excluyendo la fila 4 (índice 3)
-        plt.plot(x_values.drop(3), df[col].drop(3), marker='o', label=col, color=color_par[i % 2])  
-        
-        # Agregar los puntos de la fila 4 como puntos rojos (se visualizan de forma independiente)
-        plt.scatter(x_values.iloc[3], df[col].iloc[3], color='red', s=100, zorder=5, label=f'{col} Fila 4')
+from V2L_Profile import file_record, stage
+from V2L_Render import new_figure, open_image, save_figure
+from V2L_StatsDB import record
+
+# Ruta del archivo Excel y carpeta de destino por defecto
+RUTA_EXCEL = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\KONA_EFF_Comparation.xlsx"
+RUTA_SALIDA = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\comparacion_eff"
+
+# Paso (kW) de la malla común de potencias
+PASO_MALLA = 0.1
+# La malla empieza como mínimo en 0.1 kW, el primer punto de los ensayos de eficiencia
+POTENCIA_MINIMA = 0.1
+# Umbral del z-score robusto (Iglewicz y Hoaglin) para marcar un punto como atípico
+Z_ATIPICO = 3.5
+
+# Pares de tonos de tab20 (oscuro, claro): azul, verde y violeta primero, como en la comparación original,
+# y el rojo al final para no confundirlo con los puntos atípicos
+PARES_TAB20 = [0, 2, 4, 9, 8, 6, 5, 7, 1, 3]
+
+
+def leer_curvas(ruta_excel):
+    """Curvas de eficiencia (%) de todas las hojas del libro: [(nombre, potencia kW, eficiencia %)].
+
+    En cada hoja la columna A se ignora, la B es la potencia y cada columna siguiente es un vehículo.
+    Con varias hojas el nombre de la curva lleva delante el de la hoja.
+    """
+    hojas = pd.read_excel(ruta_excel, sheet_name=None, engine='openpyxl')
+    curvas = []
+    for hoja, df in hojas.items():
+        df = df.iloc[:, 1:].apply(pd.to_numeric, errors='coerce').dropna(subset=[df.columns[1]])
+        df = df.sort_values(df.columns[0])
+        potencia = df.iloc[:, 0].to_numpy(dtype=float)
+        for col in df.columns[1:]:
+            nombre = str(col) if len(hojas) == 1 else f"{hoja}: {col}"
+            curvas.append((nombre, potencia, df[col].to_numpy(dtype=float) * 100))
+    return curvas
+
+
+def interpolar_curvas(x, Y, malla):
+    """Interpolación lineal de varias curvas con la misma x (filas de Y, con huecos NaN) sobre la malla.
+
+    Cada curva se interpola solo entre sus puntos válidos y vale NaN fuera de ellos; todas las curvas
+    se resuelven a la vez con índices del punto válido anterior y siguiente.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n = len(x)
+    idx = np.arange(n)
+    valido = ~np.isnan(Y)
+    # Último punto válido en o antes de cada índice, y primero en o después
+    anterior = np.maximum.accumulate(np.where(valido, idx, -1), axis=1)
+    siguiente = np.minimum.accumulate(np.where(valido, idx, n)[:, ::-1], axis=1)[:, ::-1]
+
+    izq = np.clip(np.searchsorted(x, malla, side='right') - 1, 0, n - 1)
+    der = np.clip(np.searchsorted(x, malla, side='left'), 0, n - 1)
+    dentro = (malla >= x[0]) & (malla <= x[-1])
+    i0 = anterior[:, izq]
+    i1 = siguiente[:, der]
+    ok = dentro & (i0 >= 0) & (i1 < n)
+    i0c, i1c = np.clip(i0, 0, n - 1), np.clip(i1, 0, n - 1)
+
+    filas = np.arange(len(Y))[:, None]
+    y0, y1 = Y[filas, i0c], Y[filas, i1c]
+    x0, x1 = x[i0c], x[i1c]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(x1 > x0, (malla - x0) / (x1 - x0), 0.0)
+    return np.where(ok, y0 + t * (y1 - y0), np.nan)
+
+
+def _residuos_vecinos(x, Y):
+    """Residuo de cada punto frente a la interpolación de su curva sin él (NaN en los extremos)."""
+    residuos = np.full(Y.shape, np.nan)
+    for j in range(1, len(x) - 1):
+        sin_punto = Y.copy()
+        sin_punto[:, j] = np.nan
+        residuos[:, j] = Y[:, j] - interpolar_curvas(x, sin_punto, x[j:j + 1])[:, 0]
+    return residuos
+
+
+def marcar_atipicos(x, Y, umbral=Z_ATIPICO):
+    """Máscara de puntos atípicos por z-score robusto del residuo frente a sus vecinos.
+
+    El residuo se centra con la mediana de todas las curvas en la misma potencia (la curvatura propia
+    de la curva de eficiencia es común a todos los vehículos) y se escala con la MAD conjunta. En cada
+    iteración se marca como mucho el peor punto de cada curva, para que los vecinos de un atípico no
+    hereden su residuo.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float)).copy()
+    mascara = np.zeros(Y.shape, dtype=bool)
+    filas = np.arange(len(Y))
+    while True:
+        residuos = _residuos_vecinos(x, Y)
+        if np.isnan(residuos).all():
+            return mascara
+        with warnings.catch_warnings():
+            # Potencias sin ningún residuo válido
+            warnings.simplefilter('ignore', RuntimeWarning)
+            centrados = residuos - np.nanmedian(residuos, axis=0)
+        mad = np.nanmedian(np.abs(centrados))
+        if not mad > 0:
+            return mascara
+        z = np.abs(np.nan_to_num(0.6745 * centrados / mad))
+        peor = z.argmax(axis=1)
+        nuevos = z[filas, peor] > umbral
+        if not nuevos.any():
+            return mascara
+        mascara[filas[nuevos], peor[nuevos]] = True
+        Y[filas[nuevos], peor[nuevos]] = np.nan
+
+
+def eficiencia_ponderada(malla, eficiencias, ciclo=None):
+    """Eficiencia media del ciclo de trabajo (energía de salida / energía de entrada) y fracción del ciclo cubierta.
+
+    ciclo es un DataFrame con las columnas potencia_kw y peso (fracción de tiempo); sin ciclo, todos los
+    puntos de la malla pesan lo mismo.
+    """
+    if ciclo is None:
+        peso = np.ones_like(malla)
+    else:
+        # Cada punto del ciclo se asigna al punto más próximo de la malla
+        idx = np.abs(malla[None, :] - ciclo['potencia_kw'].to_numpy(dtype=float)[:, None]).argmin(axis=1)
+        peso = np.bincount(idx, weights=ciclo['peso'].to_numpy(dtype=float), minlength=len(malla))
+    cubierto = ~np.isnan(eficiencias) & (eficiencias > 0)
+    w = np.where(cubierto, peso, 0.0)
+    salida = (w * malla).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        entrada = np.where(cubierto, w * malla / (eficiencias / 100), 0.0).sum(axis=1)
+        media = np.where(entrada > 0, salida / entrada * 100, np.nan)
+    return media, w.sum(axis=1) / peso.sum()
+
+
+def comparar(curvas, referencia=None, ciclo=None, paso=PASO_MALLA):
+    """Remuestrea todas las curvas sobre una malla común y calcula atípicos, diferencias y medias.
+
+    Devuelve un diccionario con malla, nombres, eficiencias (curvas x malla), deltas frente a la
+    referencia (puntos porcentuales), atipicos [(nombre, potencia, eficiencia)] y la tabla resumen.
+    """
+    nombres = [nombre for nombre, _, _ in curvas]
+    if referencia is None:
+        referencia = nombres[0]
+    if referencia not in nombres:
+        raise ValueError(f"La curva de referencia {referencia!r} no está en el libro ({', '.join(nombres)})")
+
+    inicio = min(min(x[0] for _, x, _ in curvas), POTENCIA_MINIMA)
+    fin = max(x[-1] for _, x, _ in curvas)
+    malla = np.round(np.arange(inicio, fin + paso / 2, paso), 6)
+
+    # Las curvas que comparten la columna de potencia (misma hoja) se procesan juntas
+    eficiencias = np.full((len(curvas), len(malla)), np.nan)
+    limpias = [None] * len(curvas)
+    atipicos = []
+    grupos = {}
+    for k, (_, x, _) in enumerate(curvas):
+        grupos.setdefault(x.tobytes(), []).append(k)
+    for indices in grupos.values():
+        x = curvas[indices[0]][1]
+        Y = np.vstack([curvas[k][2] for k in indices])
+        mascara = marcar_atipicos(x, Y)
+        for fila, col in zip(*np.nonzero(mascara)):
+            atipicos.append((curvas[indices[fila]][0], x[col], Y[fila, col]))
+        Y = np.where(mascara, np.nan, Y)
+        eficiencias[indices] = interpolar_curvas(x, Y, malla)
+        for i, k in enumerate(indices):
+            limpias[k] = (x, Y[i])
+
+    deltas = eficiencias - eficiencias[nombres.index(referencia)]
+    media_ciclo, cobertura = eficiencia_ponderada(malla, eficiencias, ciclo)
+    n_atipicos = pd.Series([a[0] for a in atipicos], dtype=object).value_counts()
+    with warnings.catch_warnings():
+        # Una curva sin ningún punto válido da NaN en el resumen
+        warnings.simplefilter('ignore', RuntimeWarning)
+        resumen = pd.DataFrame({
+            'Vehículo': nombres,
+            'Eficiencia mín (%)': np.nanmin(eficiencias, axis=1),
+            'Eficiencia máx (%)': np.nanmax(eficiencias, axis=1),
+            'Eficiencia media (%)': np.nanmean(eficiencias, axis=1),
+            'Eficiencia ciclo (%)': media_ciclo,
+            'Cobertura ciclo': cobertura,
+            f'Delta medio vs {referencia} (pp)': np.nanmean(deltas, axis=1),
+            'Puntos atípicos': [int(n_atipicos.get(n, 0)) for n in nombres],
+        })
+    return {'malla': malla, 'nombres': nombres, 'referencia': referencia, 'eficiencias': eficiencias,
+            'deltas': deltas, 'curvas': limpias, 'atipicos': atipicos, 'resumen': resumen}
+
+
+def colores_curvas(n):
+    """Un color por curva: pares de tonos de tab20 hasta 20 curvas y un mapa continuo a partir de ahí."""
+    if n <= 20:
+        tab20 = colormaps['tab20'].colors
+        return [tab20[2 * p + t] for p in PARES_TAB20 for t in (0, 1)][:n]
+    return list(colormaps['viridis'](np.linspace(0, 0.95, n)))
+
+
+def graficar_comparacion(resultado, ruta_grafico, mostrar=False):
+    """Curvas de todos los vehículos con los puntos atípicos en rojo."""
+    nombres = resultado['nombres']
+    colores = colores_curvas(len(nombres))
+    muchas = len(nombres) > 12
+
+    fig = new_figure((14, 8) if muchas else (10, 6))
+    ax = fig.add_subplot()
+    for nombre, (x, y), color in zip(nombres, resultado['curvas'], colores):
+        validos = ~np.isnan(y)
+        ax.plot(x[validos], y[validos], marker='o' if not muchas else None, label=nombre, color=color,
+                 linewidth=1 if muchas else 1.5)
+    if resultado['atipicos']:
+        _, xs, ys = zip(*resultado['atipicos'])
+        ax.scatter(xs, ys, color='red', s=100, zorder=5, label='Atypical points')
+
+    # Ajustar límites y etiquetas del gráfico
+    malla = resultado['malla']
+    ax.set_xlim(malla[0], malla[-1])
+    ax.set_ylim(0, 100)  # Rango de eficiencia de 0% a 100%
+    ax.set_xticks(np.arange(0, malla[-1] + 0.5, 0.5))  # Ticks del eje X cada 0,5 kW
+    ax.set_yticks(np.linspace(0, 100, 10))  # 10 intervalos en el eje Y
+
+    ax.set_xlabel("Power (kW)")
+    ax.set_ylabel("Efficiency (%)")
+    ax.set_title("Vehicle Efficiency Comparison")
+    if muchas:
+        # Con muchas curvas la leyenda va fuera del gráfico, en varias columnas
+        ax.legend(title="Vehicle", loc='upper left', bbox_to_anchor=(1.01, 1.0), fontsize=7,
+                  ncol=int(np.ceil(len(nombres) / 30)))
     else:
-        # Para las demás columnas, graficamos como una curva normal
-        plt.plot(x_values, df[col], marker='o', label=col, color=color_par[i % 2])
+        ax.legend(title="Vehicle", loc='lower right', bbox_to_anchor=(1.0, 0.0))
+    ax.grid(True, which='both', axis='both', linestyle='--', color='gray', alpha=0.7)
+    fig.subplots_adjust(left=0.1, right=0.9, top=0.9, bottom=0.1)
+    save_figure(fig, ruta_grafico, bbox_inches='tight')
+
+    # Abrir la imagen guardada en el visor del sistema (sin bloquear, como en los lotes sin pantalla)
+    if mostrar:
+        open_image(ruta_grafico)
+    return ruta_grafico
+
+
+def graficar_deltas(resultado, ruta_grafico):
+    """Diferencia de eficiencia de cada vehículo frente a la referencia sobre la malla común."""
+    nombres = resultado['nombres']
+    fig = new_figure((14, 8) if len(nombres) > 12 else (10, 6))
+    ax = fig.add_subplot()
+    for nombre, delta, color in zip(nombres, resultado['deltas'], colores_curvas(len(nombres))):
+        if nombre != resultado['referencia']:
+            ax.plot(resultado['malla'], delta, label=nombre, color=color)
+    ax.axhline(0, color='black', linewidth=1)
+    ax.set_xlabel("Power (kW)")
+    ax.set_ylabel(f"Efficiency delta vs {resultado['referencia']} (pp)")
+    ax.set_title("Efficiency Delta Between Vehicles")
+    ax.legend(title="Vehicle", loc='upper left', bbox_to_anchor=(1.01, 1.0), fontsize=7,
+              ncol=max(1, int(np.ceil(len(nombres) / 30))))
+    ax.grid(True, linestyle='--', color='gray', alpha=0.7)
+    return save_figure(fig, ruta_grafico, bbox_inches='tight')
 
-# Ajustar límites y etiquetas del gráfico
-plt.xlim(min(x_values), max(x_values))  # El eje X se ajusta automáticamente a los valores de la columna B
-plt.ylim(0, 100)  # Rango de eficiencia de 0% a 100%
 
-# Ajustar el eje X para que vaya de 0,5 en 0,5 kW
-ticks_x = np.arange(0, max(x_values) + 0.5, 0.5)  # Comenzamos en 0.1 kW
-plt.xticks(ticks_x)  # Establecer los ticks del eje X
+def exportar_resumen(resultado, ruta_resumen):
+    """Libro con el resumen por vehículo, las curvas remuestreadas, las diferencias y los puntos atípicos."""
+    malla = pd.Index(resultado['malla'], name='Potencia (kW)')
+    with pd.ExcelWriter(ruta_resumen, engine='openpyxl') as writer:
+        resultado['resumen'].to_excel(writer, sheet_name='Resumen', index=False)
+        pd.DataFrame(resultado['eficiencias'].T, index=malla, columns=resultado['nombres']).to_excel(writer, sheet_name='Malla')
+        pd.DataFrame(resultado['deltas'].T, index=malla, columns=resultado['nombres']).to_excel(writer, sheet_name='Deltas')
+        pd.DataFrame(resultado['atipicos'], columns=['Vehículo', 'Potencia (kW)', 'Eficiencia (%)']).to_excel(
+            writer, sheet_name='Atipicos', index=False)
+    return ruta_resumen
 
-# Dividir el eje Y en 10 intervalos
-ticks_y = np.linspace(0, 100, 10)  # Crear 10 intervalos para el eje Y
-plt.yticks(ticks_y)  # Establecer los ticks del eje Y
 
-# Etiquetas y título
-plt.xlabel(x_label)
-plt.ylabel("Efficiency (%)")
-plt.title("Vehicle Efficiency Comparison")
+def leer_ciclo(ruta):
+    """Ciclo de trabajo en CSV con las columnas potencia_kw y peso."""
+    ciclo = pd.read_csv(ruta)
+    if 'potencia_kw' not in ciclo or 'peso' not in ciclo:
+        raise ValueError(f"{ruta}: el ciclo de trabajo necesita las columnas 'potencia_kw' y 'peso'")
+    return ciclo
 
-# Agregar leyenda y moverla a la parte inferior derecha
-plt.legend(title="Vehicle", loc='lower right', bbox_to_anchor=(1.0, 0.0))
 
-# Mostrar cuadrícula ajustada a los puntos del gráfico
-plt.grid(True, which='both', axis='both', linestyle='--', color='gray', alpha=0.7)
+def main(ruta_excel=RUTA_EXCEL, ruta_salida=RUTA_SALIDA, mostrar=False, referencia=None, ruta_ciclo=None,
+         paso=PASO_MALLA):
+    # Crear carpeta de salida si no existe
+    os.makedirs(ruta_salida, exist_ok=True)
 
-# Ajustar el espacio alrededor del gráfico para separar las curvas del eje Y
-plt.subplots_adjust(left=0.1, right=0.9, top=0.9, bottom=0.1)
+    with file_record(ruta_excel):
+        with stage("load") as s:
+            curvas = leer_curvas(ruta_excel)
+            ciclo = leer_ciclo(ruta_ciclo) if ruta_ciclo else None
+            s.add(rows=sum(len(potencia) for _, potencia, _ in curvas))
+        with stage("compute"):
+            resultado = comparar(curvas, referencia=referencia, ciclo=ciclo, paso=paso)
+        for nombre, potencia, eficiencia in resultado['atipicos']:
+            print(f"Punto atípico: {nombre} a {potencia:g} kW ({eficiencia:.2f} %)")
 
-# Guardar el gráfico en la carpeta correspondiente
-nombre_archivo = "Efficiency Comparison Between Vehicles.png"
-plt.savefig(os.path.join(ruta_salida, nombre_archivo), bbox_inches='tight')
+        # Guardar el gráfico, las diferencias y el resumen en la carpeta correspondiente
+        graficar_comparacion(resultado, os.path.join(ruta_salida, "Efficiency Comparison Between Vehicles.png"), mostrar)
+        graficar_deltas(resultado, os.path.join(ruta_salida, "Efficiency Delta Between Vehicles.png"))
+        with stage("write"):
+            exportar_resumen(resultado, os.path.join(ruta_salida, "Resumen comparacion.xlsx"))
+            # Una ejecución por vehículo, con el nombre de la curva como vehículo
+            for fila in resultado['resumen'].itertuples(index=False):
+                record('eff-compare', ruta_excel, {'eficiencia': {
+                    'min': fila[1], 'max': fila[2], 'mean': fila[3], 'ciclo': fila[4], 'cobertura_ciclo': fila[5],
+                    'delta_mean': fila[6], 'atipicos': fila[7]}}, item=fila[0], vehicle=fila[0])
+    print(f"Comparación de {len(curvas)} curvas guardada en {ruta_salida}")
 
-# Mostrar el gráfico
-plt.show()
+if __name__ == "__main__":
+    from v2l import main as v2l_main
+    sys.exit(v2l_main(['eff-compare'] + sys.argv[1:]))
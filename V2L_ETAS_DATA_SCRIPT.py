@@ -1,10 +1,25 @@
 import os
+import sys
+import tempfile
+import time
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
-
-# Configuración de logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from V2L_Batch import run_batch, print_summary
+from V2L_Cache import cached_read
+from V2L_Stats import frame_stats, stats_table
+from V2L_Decimate import plot_line, decimation_enabled
+from V2L_Render import new_figure, save_figure
+from V2L_Build import BuildManifest, data_hash
+from V2L_Profile import stage
+from V2L_StatsDB import record
+
+# Libro de entrada y carpeta de salida por defecto
+DEFAULT_EXCEL = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\Etas_kona_excel_V2L.xlsx"
+DEFAULT_OUTPUT = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\señales tratadas"
+
+# Columnas de cada hoja del ETAS
+ETAS_COLUMNS = ["Tiempo", "ADS1_CH1", "ADS1_CH2", "ADS1_CH3", "ADS1_CH4", "ADS2_CH3"]
 
 def create_output_folder(base_path, folder_name):
     """Crea una carpeta de salida si no existe."""
@@ -12,19 +27,32 @@ def create_output_folder(base_path, folder_name):
     os.makedirs(folder_path, exist_ok=True)
     return folder_path
 
-def process_sheet(df, sheet_name, output_folder):
-    """Genera gráficos para una hoja específica."""
+def process_sheet(df, sheet_name, output_folder, source=None):
+    """Genera gráficos y la tabla de estadísticos de una hoja y devuelve las rutas de los archivos.
+
+    df puede ser un DataFrame o un diccionario de arrays con las columnas de ETAS_COLUMNS. Con source
+    (el libro de origen) los estadísticos se anotan además en la base de estadísticos.
+    """
     sheet_folder = create_output_folder(output_folder, sheet_name)
 
+    # Estadísticos de todos los canales en una pasada (la integral de las corrientes es la carga en Ah)
+    with stage("compute"):
+        stats = frame_stats(df, ETAS_COLUMNS[1:], time_column="Tiempo")
+    stats_path = os.path.join(sheet_folder, "Estadisticas.csv")
+    with stage("write"):
+        stats_table(stats).to_csv(stats_path, index=False)
+        if source is not None:
+            record("etas", source, stats, item=sheet_name)
+
     # Valores medio y máximo de las curvas
-    mean_current_lv = df["ADS1_CH1"].mean()
-    max_current_lv = df["ADS1_CH1"].max()
-    mean_voltage_lv = df["ADS2_CH3"].mean()
-    max_voltage_lv = df["ADS2_CH3"].max()
-    mean_dcdc_current = df["ADS1_CH2"].mean()
-    max_dcdc_current = df["ADS1_CH2"].max()
-    mean_v2l_current = df["ADS1_CH3"].mean()
-    max_v2l_current = df["ADS1_CH3"].max()
+    mean_current_lv = stats["ADS1_CH1"]["mean"]
+    max_current_lv = stats["ADS1_CH1"]["max"]
+    mean_voltage_lv = stats["ADS2_CH3"]["mean"]
+    max_voltage_lv = stats["ADS2_CH3"]["max"]
+    mean_dcdc_current = stats["ADS1_CH2"]["mean"]
+    max_dcdc_current = stats["ADS1_CH2"]["max"]
+    mean_v2l_current = stats["ADS1_CH3"]["mean"]
+    max_v2l_current = stats["ADS1_CH3"]["max"]
 
     # Gráfico 1: ADS1_CH1 vs ADS2_CH3
     generate_plot(
@@ -51,8 +79,8 @@ def process_sheet(df, sheet_name, output_folder):
     )
 
     # Gráfico 3: ADS1_CH3 con eje Y dinámico
-    min_y = df["ADS1_CH3"].min()
-    max_y = df["ADS1_CH3"].max()
+    min_y = stats["ADS1_CH3"]["min"]
+    max_y = stats["ADS1_CH3"]["max"]
     margin = (max_y - min_y) * 0.1  # Margen del 10% para el rango
 
     generate_plot(
@@ -67,58 +95,131 @@ def process_sheet(df, sheet_name, output_folder):
         y_limits=(min_y - margin, max_y + margin)  # Eje Y dinámico con margen
     )
 
+    return [os.path.join(sheet_folder, f"Grafico{n}.png") for n in (1, 2, 3)] + [stats_path]
+
 def generate_plot(x, y_list, labels, colors, title, xlabel, ylabel, save_path, y_limits=None):
     """Genera un gráfico y lo guarda en un archivo."""
-    plt.figure()
+    fig = new_figure()
+    ax = fig.add_subplot()
     for y, label, color in zip(y_list, labels, colors):
-        plt.plot(x, y, label=label, color=color)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+        plot_line(ax, x, y, label=label, color=color)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
     if y_limits:
-        plt.ylim(y_limits)  # Configurar rango del eje Y
-    plt.legend()
-    plt.grid()
-    plt.savefig(save_path)
-    plt.close()
-
-def main():
-    # Ruta del archivo Excel
-    excel_path = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\Etas_kona_excel_V2L.xlsx"
-
-    # Ruta de salida
-    output_base_path = create_output_folder(
-        r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado",
-        "señales tratadas"
-    )
-
-    # Verifica si el archivo Excel existe
-    if not os.path.exists(excel_path):
-        raise FileNotFoundError(f"El archivo Excel no existe: {excel_path}")
+        ax.set_ylim(y_limits)  # Configurar rango del eje Y
+    ax.legend()
+    ax.grid()
+    save_figure(fig, save_path)
 
-    # Leer todas las hojas del archivo Excel
+def load_etas_workbook(excel_path):
+    """Lee todas las hojas del libro ETAS en un único DataFrame con la columna "Hoja"."""
     excel_data = pd.ExcelFile(excel_path)
+    frames = []
 
     for sheet_name in excel_data.sheet_names:
-        logging.info(f"Procesando hoja: {sheet_name}")
         df = excel_data.parse(sheet_name, skiprows=2)
-        
+
         # Asegúrate de que la hoja no esté vacía
         if df.empty:
             logging.warning(f"La hoja '{sheet_name}' está vacía. Se omite.")
             continue
 
         # Renombrar las columnas
-        df.columns = ["Tiempo", "ADS1_CH1", "ADS1_CH2", "ADS1_CH3", "ADS1_CH4", "ADS2_CH3"]
-        
+        df.columns = ETAS_COLUMNS
+
         # Convertir "Tiempo" a valores numéricos y eliminar filas con NaN
         df["Tiempo"] = pd.to_numeric(df["Tiempo"], errors="coerce")
         df.dropna(subset=["Tiempo"], inplace=True)
+        df.insert(0, "Hoja", sheet_name)
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=["Hoja"] + ETAS_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+def sheet_block(df):
+    """Datos de una hoja como matriz float (filas x ETAS_COLUMNS), lista para guardarse en columnas."""
+    return df[ETAS_COLUMNS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+def export_sheet(block, sheet_name, directory):
+    """Guarda la hoja como .npy para que los procesos del pool la abran como mapa de memoria."""
+    path = os.path.join(directory, f"{sheet_name}.npy")
+    np.save(path, block)
+    return path
+
+def process_sheet_file(npy_path, output_folder, source=None):
+    """Tarea del pool: abre la hoja exportada sin copiarla y genera sus gráficos."""
+    sheet_name = os.path.splitext(os.path.basename(npy_path))[0]
+    block = np.load(npy_path, mmap_mode="r")
+    columns = {col: block[:, k] for k, col in enumerate(ETAS_COLUMNS)}
+    return process_sheet(columns, sheet_name, output_folder, source), len(block)
+
+def main(excel_path=DEFAULT_EXCEL, output_folder=DEFAULT_OUTPUT, incremental=False, workers=1):
+    # Carpeta de salida
+    output_base_path = output_folder
+    os.makedirs(output_base_path, exist_ok=True)
+
+    # Verifica si el archivo Excel existe
+    if not os.path.exists(excel_path):
+        raise FileNotFoundError(f"El archivo Excel no existe: {excel_path}")
 
-        # Procesar la hoja actual
-        process_sheet(df, sheet_name, output_base_path)
+    # Con incremental=True se omite el libro si no ha cambiado y, si ha cambiado, las hojas con los mismos datos
+    manifest = BuildManifest(output_base_path)
+    params = {"script": "etas", "version": 2, "decimate": decimation_enabled()}
+    if incremental and manifest.is_up_to_date(excel_path, params):
+        logging.info("El libro no ha cambiado desde la última ejecución. No hay nada que regenerar.")
+        return 0
+
+    # Leer todas las hojas del archivo Excel (o su copia en caché)
+    workbook = cached_read(excel_path, "etas", load_etas_workbook)
+
+    outputs = []
+    with tempfile.TemporaryDirectory(prefix="v2l_etas_") as tmp:
+        # 1) Conversión única del libro a una matriz por hoja; los workers solo reciben la ruta de su hoja
+        pending = {}
+        for sheet_name, df in workbook.groupby("Hoja", sort=False):
+            block = sheet_block(df)
+            sheet_key = f"{os.path.abspath(excel_path)}::{sheet_name}"
+            sheet_hash = data_hash(block)
+            if incremental and manifest.is_up_to_date(excel_path, params, key=sheet_key, content_hash=sheet_hash):
+                logging.info(f"Hoja sin cambios, se omite: {sheet_name}")
+                outputs += manifest.entries[sheet_key]["outputs"]
+                continue
+            pending[export_sheet(block, sheet_name, tmp)] = (sheet_name, sheet_key, sheet_hash)
+        del workbook
+
+        # 2) Procesar las hojas (en paralelo si workers > 1)
+        logging.info(f"Procesando {len(pending)} hojas")
+        t0 = time.perf_counter()
+        results = run_batch(process_sheet_file, list(pending), args=(output_base_path, excel_path),
+                            workers=workers)
+        wall_time = time.perf_counter() - t0
+
+    total_samples = 0
+    for result in results:
+        sheet_name, sheet_key, sheet_hash = pending[result.item]
+        if result.error is not None:
+            logging.error(f"Hoja {sheet_name}: {result.error}")
+            continue
+        sheet_outputs, samples = result.result
+        total_samples += samples
+        logging.info(f"Hoja {sheet_name}: {samples} muestras en {result.seconds:.2f} s "
+                     f"({samples / max(result.seconds, 1e-9):,.0f} muestras/s)")
+        manifest.record(excel_path, params, sheet_outputs, key=sheet_key, content_hash=sheet_hash)
+        outputs += sheet_outputs
+    if results:
+        logging.info(f"Total: {total_samples} muestras en {wall_time:.2f} s "
+                     f"({total_samples / max(wall_time, 1e-9):,.0f} muestras/s)")
+
+    # El libro solo queda al día si todas sus hojas se han generado; si no, se reintentan las que fallaron
+    if all(result.error is None for result in results):
+        manifest.record(excel_path, params, outputs)
+    manifest.save()
 
     logging.info("Gráficos generados y guardados en las carpetas correspondientes.")
+    return print_summary(results, wall_time)
 
 if __name__ == "__main__":
-    main()
+    from v2l import main as v2l_main
+    sys.exit(v2l_main(["etas"] + sys.argv[1:]))
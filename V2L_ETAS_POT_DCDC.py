@@ -1,77 +1,150 @@
 import os
+import sys
 import pandas as pd
-import matplotlib.pyplot as plt
-
-# Ruta del archivo Excel y carpeta de salida
-ruta_excel = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\ETAS_Kona_EXCEL_V2L_POT.xlsx"
-carpeta_salida = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\Pot_DCDC"
-
-# Crear carpeta de salida si no existe
-os.makedirs(carpeta_salida, exist_ok=True)
-
-# Leer el archivo Excel y obtener las hojas
-excel = pd.ExcelFile(ruta_excel)
-hojas = excel.sheet_names
-
-# Procesar cada hoja
-for hoja in hojas:
-    # Leer los datos de la hoja
-    df = excel.parse(sheet_name=hoja, skiprows=2)  # Saltar las dos primeras filas
-    df.columns = ['Tiempo', 'Corriente', 'Voltaje', 'Potencia']  # Asignar nombres a las columnas
-
-    # Filtrar datos para el rango de tiempo deseado (150 a 175)
-    df_filtrado = df[(df['Tiempo'] >= 150) & (df['Tiempo'] <= 175)]
-
-    # Calcular estadísticas dentro del rango
-    max_corriente, mean_corriente = df_filtrado['Corriente'].max(), df_filtrado['Corriente'].mean()
-    max_voltaje, mean_voltaje = df_filtrado['Voltaje'].max(), df_filtrado['Voltaje'].mean()
-    max_potencia, mean_potencia = df_filtrado['Potencia'].max(), df_filtrado['Potencia'].mean()
-
-    # Crear el gráfico
-    fig, ax1 = plt.subplots(figsize=(12, 8))  # Ajustar tamaño para incluir leyenda y estadísticas
-
-    # Gráfico del eje Y izquierdo (Corriente y Voltaje)
-    ax1.plot(df['Tiempo'], df['Corriente'], label='Current (A)', color='blue', linewidth=1.5)
-    ax1.plot(df['Tiempo'], df['Voltaje'], label='Voltage (V)', color='green', linewidth=1.5)
-    ax1.set_xlabel('Time (s)')
-    ax1.set_ylabel('Current / Voltage', color='black')
-    ax1.tick_params(axis='y', labelcolor='black')
-    ax1.grid()
-
-    # Crear un segundo eje Y para la Potencia
-    ax2 = ax1.twinx()
-    ax2.plot(df['Tiempo'], df['Potencia'], label='Power', color='red', linewidth=1.5)
-    ax2.set_ylabel('Power', color='red')
-    ax2.tick_params(axis='y', labelcolor='red')
-
-    # Ajustar dinámicamente el rango del eje Y derecho con un margen del 30%
-    potencia_max = df['Potencia'].max()
-    potencia_min = df['Potencia'].min()
-    margen = 0.90 * max(abs(potencia_max), abs(potencia_min))  # Margen del 30% en ambos lados
-    ax2.set_ylim(potencia_min - margen, potencia_max + margen)
-
-    # Preparar texto para las estadísticas
-    stats_text = (
-        f"DCDC_Current (A) (Blue): Máx = {max_corriente:.2f}, Average = {mean_corriente:.2f}\n"
-        f"DCDC_Voltage (V) (Green): Máx = {max_voltaje:.2f}, Average = {mean_voltaje:.2f}\n"
-        f"DCDC_Power (W) (Red): Máx = {max_potencia:.2f}, Average = {mean_potencia:.2f}"
-    )
-
-    # Agregar estadísticas como parte del gráfico
-    plt.figtext(0.5, 0.02, stats_text, wrap=True, horizontalalignment='center', fontsize=10, color='black')
-
-    # Agregar leyenda unificada dentro del gráfico
-    lines1, labels1 = ax1.get_legend_handles_labels()
-    lines2, labels2 = ax2.get_legend_handles_labels()
-    ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper center', bbox_to_anchor=(0.5, -0.1), ncol=3, frameon=False)
-
-    # Título del gráfico
-    plt.title(f'Test graph: {hoja}')
-
-    # Guardar el gráfico en la carpeta de salida
-    ruta_grafico = os.path.join(carpeta_salida, f'{hoja}.png')
-    plt.tight_layout(rect=[0, 0.15, 1, 1])  # Deja espacio para estadísticas debajo del gráfico
-    plt.savefig(ruta_grafico)
-    plt.close()
-
-print(f"Gráficos generados y guardados en {carpeta_salida}")
+from V2L_Cache import cached_read
+from V2L_Decimate import plot_line
+from V2L_Render import new_figure, save_figure
+from V2L_Profile import file_record, stage
+from V2L_Stats import frame_stats
+from V2L_StatsDB import record_many
+from V2L_Window import monotonic_time, resolve_windows, select_windows, window_label
+
+# Columnas de cada hoja del libro, tras las dos filas de cabecera
+COLUMNAS_LIBRO = ['Tiempo', 'Corriente', 'Voltaje', 'Potencia']
+
+def leer_libro_pot(ruta):
+    """Lee todas las hojas del libro en un único DataFrame con la columna "Hoja"."""
+    excel = pd.ExcelFile(ruta)
+    frames = []
+    for hoja in excel.sheet_names:
+        df = excel.parse(sheet_name=hoja, skiprows=2)  # Saltar las dos primeras filas
+        if df.empty:
+            print(f"La hoja '{hoja}' está vacía. Se omite.")
+            continue
+        df.columns = COLUMNAS_LIBRO  # Asignar nombres a las columnas
+        df.insert(0, 'Hoja', hoja)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['Hoja'] + COLUMNAS_LIBRO)
+    return pd.concat(frames, ignore_index=True)
+
+# Libro de entrada y carpeta de salida por defecto
+RUTA_EXCEL = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\ETAS_Kona_EXCEL_V2L_POT.xlsx"
+CARPETA_SALIDA = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\ETAS tratado\Pot_DCDC"
+
+# Ventanas de análisis (s); "auto" usa el tramo estable de la potencia
+VENTANAS = [(150, 175)]
+COLUMNAS = ['Corriente', 'Voltaje', 'Potencia']
+
+def estadisticas_ventanas(df, ventanas=VENTANAS):
+    """Estadísticas de la hoja en cada ventana: [(ventana, stats)]; las ventanas "auto" sin tramo estable se omiten."""
+    # El tiempo se comprueba una vez por hoja; las búsquedas de cada ventana son O(log n)
+    tiempo = monotonic_time(df['Tiempo'].to_numpy(dtype=float))
+    ventanas = resolve_windows(tiempo, df['Potencia'].to_numpy(dtype=float), ventanas)
+    columnas = {col: df[col].to_numpy(dtype=float) for col in COLUMNAS + ['Tiempo']}
+    # Cada ventana es una vista de las columnas: sin máscaras booleanas ni copias por ventana
+    return [(ventana, frame_stats(vista, COLUMNAS, time_column='Tiempo', percentiles=()))
+            for ventana, vista in select_windows(columnas, tiempo, ventanas)]
+
+def main(ruta_excel=RUTA_EXCEL, carpeta_salida=CARPETA_SALIDA, ventanas=VENTANAS):
+    # Crear carpeta de salida si no existe
+    os.makedirs(carpeta_salida, exist_ok=True)
+
+    with file_record(ruta_excel):
+        generar_graficos(ruta_excel, carpeta_salida, ventanas)
+    print(f"Gráficos generados y guardados en {carpeta_salida}")
+
+def generar_graficos(ruta_excel, carpeta_salida, ventanas):
+    # Leer el archivo Excel (o su copia en caché) con todas las hojas
+    libro = cached_read(ruta_excel, 'etas_pot', leer_libro_pot)
+
+    # Procesar cada hoja
+    filas = []
+    ventanas_db = []
+    for hoja, df in libro.groupby('Hoja', sort=False):
+        # Estadísticas en cada ventana (una pasada; la integral da la carga en Ah y la energía en Wh)
+        with stage("compute"):
+            resultados = estadisticas_ventanas(df, ventanas)
+        for ventana, stats in resultados:
+            fila = {'Hoja': hoja, 'Inicio (s)': ventana[0], 'Fin (s)': ventana[1],
+                    'Muestras': stats['Potencia']['count'],
+                    'Carga (Ah)': stats['Corriente']['integral'], 'Energía (Wh)': stats['Potencia']['integral']}
+            for col in COLUMNAS:
+                fila[f'{col} media'] = stats[col]['mean']
+                fila[f'{col} máx'] = stats[col]['max']
+            filas.append(fila)
+            ventanas_db.append((f"{hoja} {window_label(ventana)}", stats))
+        if not resultados:
+            print(f"{hoja}: no se ha encontrado ningún tramo estable. Se grafica sin estadísticas.")
+
+        # El texto del gráfico corresponde a la primera ventana
+        ventana, stats = resultados[0] if resultados else (None, None)
+        if stats is not None:
+            max_corriente, mean_corriente = stats['Corriente']['max'], stats['Corriente']['mean']
+            max_voltaje, mean_voltaje = stats['Voltaje']['max'], stats['Voltaje']['mean']
+            max_potencia, mean_potencia = stats['Potencia']['max'], stats['Potencia']['mean']
+            carga, energia = stats['Corriente']['integral'], stats['Potencia']['integral']
+
+        # Crear el gráfico
+        fig = new_figure((12, 8))  # Ajustar tamaño para incluir leyenda y estadísticas
+        ax1 = fig.add_subplot()
+
+        # Gráfico del eje Y izquierdo (Corriente y Voltaje)
+        plot_line(ax1, df['Tiempo'], df['Corriente'], label='Current (A)', color='blue', linewidth=1.5)
+        plot_line(ax1, df['Tiempo'], df['Voltaje'], label='Voltage (V)', color='green', linewidth=1.5)
+        ax1.set_xlabel('Time (s)')
+        ax1.set_ylabel('Current / Voltage', color='black')
+        ax1.tick_params(axis='y', labelcolor='black')
+        ax1.grid()
+
+        # Sombrear las ventanas de análisis
+        for v, _ in resultados:
+            ax1.axvspan(v[0], v[1], color='grey', alpha=0.15)
+
+        # Crear un segundo eje Y para la Potencia
+        ax2 = ax1.twinx()
+        plot_line(ax2, df['Tiempo'], df['Potencia'], label='Power', color='red', linewidth=1.5)
+        ax2.set_ylabel('Power', color='red')
+        ax2.tick_params(axis='y', labelcolor='red')
+
+        # Ajustar dinámicamente el rango del eje Y derecho con un margen del 30%
+        rango_potencia = frame_stats(df, ['Potencia'], percentiles=())['Potencia']
+        potencia_max = rango_potencia['max']
+        potencia_min = rango_potencia['min']
+        margen = 0.90 * max(abs(potencia_max), abs(potencia_min))  # Margen del 30% en ambos lados
+        ax2.set_ylim(potencia_min - margen, potencia_max + margen)
+
+        # Preparar texto para las estadísticas
+        stats_text = "" if stats is None else (
+            f"Window {window_label(ventana)}\n"
+            f"DCDC_Current (A) (Blue): Máx = {max_corriente:.2f}, Average = {mean_corriente:.2f}, Charge = {carga:.4f} Ah\n"
+            f"DCDC_Voltage (V) (Green): Máx = {max_voltaje:.2f}, Average = {mean_voltaje:.2f}\n"
+            f"DCDC_Power (W) (Red): Máx = {max_potencia:.2f}, Average = {mean_potencia:.2f}, Energy = {energia:.3f} Wh"
+        )
+
+        # Agregar estadísticas como parte del gráfico
+        fig.text(0.5, 0.02, stats_text, wrap=True, horizontalalignment='center', fontsize=10, color='black')
+
+        # Agregar leyenda unificada dentro del gráfico
+        lines1, labels1 = ax1.get_legend_handles_labels()
+        lines2, labels2 = ax2.get_legend_handles_labels()
+        ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper center', bbox_to_anchor=(0.5, -0.1), ncol=3, frameon=False)
+
+        # Título del gráfico
+        ax2.set_title(f'Test graph: {hoja}')
+
+        # Guardar el gráfico en la carpeta de salida
+        ruta_grafico = os.path.join(carpeta_salida, f'{hoja}.png')
+        fig.tight_layout(rect=[0, 0.15, 1, 1])  # Deja espacio para estadísticas debajo del gráfico
+        save_figure(fig, ruta_grafico)
+
+    # Tabla con todas las hojas y ventanas
+    if filas:
+        with stage("write"):
+            pd.DataFrame(filas).to_csv(os.path.join(carpeta_salida, 'Ventanas.csv'), index=False)
+            # Todas las ventanas del libro en una sola transacción de la base de estadísticos
+            record_many('etas-dcdc', ruta_excel, ventanas_db)
+
+if __name__ == "__main__":
+    from v2l import main as v2l_main
+    sys.exit(v2l_main(['etas-dcdc'] + sys.argv[1:]))
@@ -0,0 +1,220 @@
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from V2L_Batch import run_batch
+from V2L_OBD_Reader import cargar_datos_obd
+from V2L_Profile import stage
+from V2L_Render import new_figure, save_figure
+from V2L_Stats import frame_stats
+from V2L_Window import monotonic_time, resolve_windows, window_slices
+
+# Manifiesto opcional en la carpeta de entrada: archivo, carga_kw, soc, ambiente, correccion_kw
+MANIFIESTO = "ensayos.csv"
+
+# Tramo estable del ensayo (s); "auto" lo detecta a partir de la potencia
+VENTANA = (25, 170)
+
+# Consumo propio del sistema (kW) que se descuenta para la eficiencia del componente, por (carga kW, SOC %).
+# SOC None es el SOC nominal del ensayo; para cargas que no están en la tabla se interpola entre las nominales.
+CORRECCIONES = {
+    (0.1, None): 0.23874 / 0.95,
+    (0.5, None): 0.23877 / 0.95,
+    (0.5, 20): 0.15857 / 0.95,
+    (1, None): 0.23878 / 0.95,
+    (2, None): 0.23859 / 0.95,
+    (3, None): 0.2384 / 0.95,
+    (3.3, None): 0.2389 / 0.95,
+}
+
+# Metadatos en el nombre del archivo, p. ej. "x - eff 500W - 20.xlsx", "eff 3.3kW SOC80 25C.xlsx"
+_CARGA = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kW|W)\b", re.IGNORECASE)
+_SOC = re.compile(r"SOC\s*[_-]?\s*(\d+(?:[.,]\d+)?)|(\d+(?:[.,]\d+)?)\s*%\s*SOC|\d\s*k?W\s*-\s*(\d+(?:[.,]\d+)?)\b",
+                  re.IGNORECASE)
+_AMBIENTE = re.compile(r"(?:amb|\bT)\s*[_=]?\s*(-?\d+(?:[.,]\d+)?)\b|(-?\d+(?:[.,]\d+)?)\s*[°º]?C\b", re.IGNORECASE)
+
+
+def _numero(texto):
+    return float(texto.replace(",", "."))
+
+
+def metadatos_nombre(nombre):
+    """Carga (kW), SOC (%) y temperatura ambiente (°C) del nombre del archivo; None si no aparecen.
+
+    Sin carga en el nombre devuelve None: el archivo no es un ensayo de eficiencia.
+    """
+    base = os.path.splitext(os.path.basename(nombre))[0]
+    carga = _CARGA.search(base)
+    if not carga:
+        return None
+    valor = _numero(carga.group(1))
+    meta = {"carga_kw": valor if carga.group(2).lower() == "kw" else valor / 1000, "soc": None, "ambiente": None}
+
+    soc = _SOC.search(base)
+    if soc:
+        meta["soc"] = _numero(next(g for g in soc.groups() if g))
+    # La temperatura se busca fuera del texto de la carga para no confundir "3.3kW" con grados
+    resto = base[:carga.start()] + " " + base[carga.end():]
+    ambiente = _AMBIENTE.search(resto)
+    if ambiente:
+        meta["ambiente"] = _numero(next(g for g in ambiente.groups() if g))
+    return meta
+
+
+def leer_manifiesto(ruta_entrada):
+    """Metadatos del manifiesto de la carpeta, por nombre de archivo ({} si no hay manifiesto)."""
+    ruta = os.path.join(ruta_entrada, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    df = pd.read_csv(ruta)
+    if "archivo" not in df or "carga_kw" not in df:
+        raise ValueError(f"{ruta}: el manifiesto necesita al menos las columnas 'archivo' y 'carga_kw'")
+    manifiesto = {}
+    for fila in df.to_dict("records"):
+        manifiesto[fila["archivo"]] = {
+            clave: (None if pd.isna(fila.get(clave)) else float(fila[clave]))
+            for clave in ("carga_kw", "soc", "ambiente", "correccion_kw")
+        }
+    return manifiesto
+
+
+def buscar_ensayos(ruta_entrada):
+    """{ruta: metadatos} de los libros de la carpeta; el manifiesto tiene prioridad sobre el nombre."""
+    manifiesto = leer_manifiesto(ruta_entrada)
+    ensayos = {}
+    for archivo in sorted(os.listdir(ruta_entrada)):
+        if not (archivo.endswith(".xlsx") or archivo.endswith(".xls")):
+            continue
+        meta = manifiesto.get(archivo) or metadatos_nombre(archivo)
+        if meta is None:
+            print(f"Archivo {archivo} no corresponde a ningún test definido. Saltando.")
+            continue
+        ensayos[os.path.join(ruta_entrada, archivo)] = meta
+    return ensayos
+
+
+def medir_ensayo(ruta_archivo, ventana=VENTANA):
+    """Potencia media (kW) y SOC al inicio y al final de la ventana de análisis, o None si no hay datos."""
+    # El SOC acompaña a las filas con tiempo y potencia, aunque alguna de sus celdas esté vacía
+    todos = cargar_datos_obd(ruta_archivo, ("tiempo", "potencia", "soc"))
+    with stage("compute"):
+        mascara = ~np.isnan(todos["tiempo"]) & ~np.isnan(todos["potencia"])
+        datos = {clave: todos[clave][mascara] for clave in ("tiempo", "potencia", "soc")}
+        datos["tiempo"] = monotonic_time(datos["tiempo"])
+        ventanas = resolve_windows(datos["tiempo"], datos["potencia"], [ventana])
+        if not ventanas:
+            return None
+        tramo = window_slices(datos["tiempo"], ventanas)[0]
+        vista = {clave: valores[tramo] for clave, valores in datos.items()}
+        if vista["potencia"].size == 0:
+            return None
+        stats = frame_stats(vista, ["potencia"], percentiles=())
+    soc = vista["soc"][~np.isnan(vista["soc"])]
+    return {"inicio_s": ventanas[0][0], "fin_s": ventanas[0][1], "muestras": stats["potencia"]["count"],
+            "potencia_kw": stats["potencia"]["mean"],
+            "soc_inicio": float(soc[0]) if soc.size else np.nan, "soc_fin": float(soc[-1]) if soc.size else np.nan}
+
+
+def correcciones_ensayos(carga, soc, correcciones=CORRECCIONES):
+    """Corrección (kW) de cada ensayo: valor exacto por (carga, SOC) o interpolado por carga entre las nominales."""
+    nominales = sorted((c, v) for (c, s), v in correcciones.items() if s is None)
+    interpolada = np.interp(carga, [c for c, _ in nominales], [v for _, v in nominales])
+    exacta = [correcciones.get((c, None if pd.isna(s) else s)) for c, s in zip(carga, soc)]
+    return np.array([np.nan if e is None else e for e in exacta], dtype=float), interpolada
+
+
+def calcular_eficiencias(df, correcciones=CORRECCIONES):
+    """Añade las columnas de eficiencia del sistema y del componente (%) a la tabla de ensayos, sin bucles."""
+    df = df.copy()
+    carga = df["carga_kw"].to_numpy(dtype=float)
+    potencia = np.abs(df["potencia_kw"].to_numpy(dtype=float))
+
+    exacta, interpolada = correcciones_ensayos(carga, df["soc"].to_numpy(dtype=float), correcciones)
+    manual = df["correccion_kw"].to_numpy(dtype=float) if "correccion_kw" in df else np.full(len(df), np.nan)
+    correccion = np.where(~np.isnan(manual), manual, np.where(~np.isnan(exacta), exacta, interpolada))
+
+    neta = potencia - correccion
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["correccion_kw"] = correccion
+        df["eficiencia_sistema"] = carga / potencia * 100
+        df["eficiencia_componente"] = np.where(neta > 0, carga / neta * 100, 0.0)
+    return df
+
+
+def cargar_ensayos(ruta_entrada, workers=1, ventana=VENTANA):
+    """Tabla con una fila por ensayo: metadatos, potencia media medida y eficiencias."""
+    ensayos = buscar_ensayos(ruta_entrada)
+    t0 = time.perf_counter()
+    filas = []
+    for resultado in run_batch(medir_ensayo, ensayos, args=(ventana,), workers=workers):
+        if resultado.error is not None:
+            continue  # run_batch ya ha informado del error
+        archivo = os.path.basename(resultado.item)
+        if resultado.result is None:
+            print(f"No hay datos en el rango temporal para {archivo}. Saltando archivo.")
+            continue
+        filas.append({"archivo": archivo, **ensayos[resultado.item], **resultado.result})
+    print(f"{len(filas)} ensayos cargados en {time.perf_counter() - t0:.2f} s")
+
+    columnas = ["archivo", "carga_kw", "soc", "ambiente", "correccion_kw", "inicio_s", "fin_s", "muestras",
+                "potencia_kw", "soc_inicio", "soc_fin"]
+    df = pd.DataFrame(filas).reindex(columns=columnas)
+    df[["carga_kw", "soc", "ambiente", "correccion_kw"]] = df[["carga_kw", "soc", "ambiente", "correccion_kw"]].astype(float)
+    return calcular_eficiencias(df)
+
+
+def etiqueta_soc(soc):
+    return "nominal" if pd.isna(soc) else f"{soc:g}%"
+
+
+def mapa_eficiencia(df, columna="eficiencia_componente"):
+    """Mapas carga x SOC (media de los ensayos repetidos), uno por temperatura ambiente: {ambiente: tabla}."""
+    mapas = {}
+    for ambiente, grupo in df.groupby("ambiente", dropna=False, sort=True):
+        # SOC nominal primero y después de menor a mayor
+        orden = sorted(grupo["soc"].unique(), key=lambda s: (not pd.isna(s), 0 if pd.isna(s) else s))
+        tabla = grupo.pivot_table(index=grupo["soc"].map(etiqueta_soc), columns="carga_kw", values=columna,
+                                  aggfunc="mean")
+        tabla = tabla.reindex([etiqueta_soc(s) for s in orden]).sort_index(axis=1)
+        tabla.index.name = "SOC"
+        tabla.columns.name = "Carga (kW)"
+        mapas[None if pd.isna(ambiente) else ambiente] = tabla
+    return mapas
+
+
+def graficar_mapa(tabla, ruta_grafico, titulo):
+    """Mapa de calor de la eficiencia con el valor anotado en cada celda."""
+    valores = tabla.to_numpy(dtype=float)
+    fig = new_figure((max(6, 0.9 * valores.shape[1] + 2), max(3, 0.6 * valores.shape[0] + 2)))
+    ax = fig.add_subplot()
+    imagen = ax.imshow(np.ma.masked_invalid(valores), cmap="viridis", vmin=np.nanmin(valores) if np.isfinite(valores).any() else 0,
+                       vmax=100, aspect="auto")
+    ax.set_xticks(range(valores.shape[1]), [f"{c:g}" for c in tabla.columns])
+    ax.set_yticks(range(valores.shape[0]), list(tabla.index))
+    ax.set_xlabel("Load (kW)")
+    ax.set_ylabel("SOC")
+    ax.set_title(titulo)
+    for i, j in zip(*np.nonzero(np.isfinite(valores))):
+        ax.text(j, i, f"{valores[i, j]:.1f}", ha="center", va="center", fontsize=8, color="white")
+    fig.colorbar(imagen, ax=ax, label="Efficiency (%)")
+    fig.tight_layout()
+    return save_figure(fig, ruta_grafico, dpi=150)
+
+
+def exportar_mapas(df, carpeta_salida, columna="eficiencia_componente"):
+    """Guarda la tabla de ensayos y, por temperatura ambiente, el mapa en CSV y como mapa de calor."""
+    os.makedirs(carpeta_salida, exist_ok=True)
+    salidas = [os.path.join(carpeta_salida, "ensayos_eficiencia.csv")]
+    with stage("write"):
+        df.to_csv(salidas[0], index=False)
+    for ambiente, tabla in mapa_eficiencia(df, columna).items():
+        sufijo = "" if ambiente is None else f"_{ambiente:g}C"
+        ruta = os.path.join(carpeta_salida, f"mapa_eficiencia{sufijo}.csv")
+        with stage("write"):
+            tabla.to_csv(ruta)
+        titulo = "Efficiency map" if ambiente is None else f"Efficiency map ({ambiente:g} °C)"
+        salidas += [ruta, graficar_mapa(tabla, os.path.join(carpeta_salida, f"mapa_eficiencia{sufijo}.png"), titulo)]
+    return salidas
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from V2L_Summary import write_summary_excel
+
+MAX_ORDER = 50
+F0 = 50.0
+
+# Armónicos que el Hioki exporta en las columnas MaxU1(n) del archivo HD
+HD_ORDERS = range(2, 11)
+
+
+def samples_per_window(fs, f0=F0, cycles=1):
+    """Muestras por ventana de análisis (redondeadas: si fs/f0 no es entero aparece algo de fuga espectral)."""
+    return int(round(cycles * fs / f0))
+
+
+def window_view(x, n, hop=None):
+    """Vista (sin copia) de la señal en ventanas de n muestras separadas hop muestras."""
+    x = np.asarray(x, dtype=float)
+    hop = hop or n
+    if len(x) < n:
+        return np.empty((0, n))
+    return sliding_window_view(x, n)[::hop]
+
+
+def _spectrum(windows, cycles, max_order):
+    n = windows.shape[1]
+    spectrum = np.fft.rfft(windows, axis=1)
+    orders = np.arange(1, max_order + 1)
+    bins = orders * cycles
+    # Valor eficaz de cada armónico: |X| * sqrt(2) / N
+    magnitudes = np.abs(spectrum[:, bins]) * np.sqrt(2) / n
+    phases = np.angle(spectrum[:, bins[0]])
+    return magnitudes, phases
+
+
+def analyze_waveform(voltage, current=None, fs=None, f0=F0, max_order=MAX_ORDER, cycles=1, hop=None):
+    """Analiza toda la captura de una vez: armónicos hasta max_order, THD, RMS y desfase V-I por ventana."""
+    if not fs:
+        raise ValueError("Se necesita la frecuencia de muestreo (fs) para el análisis armónico.")
+    n = samples_per_window(fs, f0, cycles)
+    hop = hop or n
+    # El orden máximo está limitado por la frecuencia de Nyquist
+    max_order = min(max_order, (n // 2) // cycles)
+
+    channels = {"U": voltage} if current is None else {"U": voltage, "I": current}
+    result = {"fs": fs, "f0": f0, "cycles": cycles, "window": n, "max_order": max_order}
+    phases = {}
+    for name, signal in channels.items():
+        windows = window_view(signal, n, hop)
+        magnitudes, phases[name] = _spectrum(windows, cycles, max_order)
+        fundamental = magnitudes[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[f"{name}_harmonics_pct"] = magnitudes / fundamental[:, None] * 100
+            result[f"{name}_thd"] = np.sqrt(np.sum(magnitudes[:, 1:] ** 2, axis=1)) / fundamental * 100
+        result[f"{name}_harmonics"] = magnitudes
+        result[f"{name}_rms"] = np.sqrt(np.mean(windows ** 2, axis=1))
+    result["t_start"] = np.arange(len(result["U_rms"])) * hop / fs
+
+    if "I" in channels:
+        # Desfase de la fundamental de la tensión respecto a la corriente, en (-180, 180]
+        phase = np.degrees(phases["U"] - phases["I"])
+        result["phase_deg"] = (phase + 180) % 360 - 180
+        result["displacement_pf"] = np.cos(np.radians(result["phase_deg"]))
+    return result
+
+
+class ChunkedHarmonics:
+    """Análisis armónico por bloques (modo streaming): las muestras sobrantes pasan al bloque siguiente."""
+
+    def __init__(self, fs, f0=F0, max_order=MAX_ORDER, cycles=1):
+        self.fs, self.f0, self.max_order, self.cycles = fs, f0, max_order, cycles
+        self.n = samples_per_window(fs, f0, cycles)
+        self._pending = np.empty((0, 2))
+        self._partial = []
+
+    def update(self, block):
+        """Añade un bloque (muestras x 2) con tensión y corriente."""
+        block = np.vstack([self._pending, np.asarray(block, dtype=float)])
+        usable = len(block) // self.n * self.n
+        if usable:
+            self._partial.append(analyze_waveform(block[:usable, 0], block[:usable, 1],
+                                                  self.fs, self.f0, self.max_order, self.cycles))
+        self._pending = block[usable:]
+
+    def result(self):
+        if not self._partial:
+            return None
+        merged = dict(self._partial[0])
+        starts = np.cumsum([0] + [len(p["U_rms"]) for p in self._partial[:-1]]) * self.n / self.fs
+        for key, value in merged.items():
+            if key == "t_start":
+                merged[key] = np.concatenate([p[key] + start for p, start in zip(self._partial, starts)])
+            elif isinstance(value, np.ndarray):
+                merged[key] = np.concatenate([p[key] for p in self._partial])
+        return merged
+
+
+def analyze_chunks(chunks, fs, f0=F0, max_order=MAX_ORDER, cycles=1):
+    """Aplica el análisis armónico a una secuencia de bloques y devuelve el resultado combinado."""
+    harmonics = ChunkedHarmonics(fs, f0, max_order, cycles)
+    for block in chunks:
+        harmonics.update(block)
+    return harmonics.result()
+
+
+def harmonics_to_frame(result):
+    """Tabla por ventana: RMS, THD, desfase y armónicos en % de la fundamental."""
+    columns = {"t_start": result["t_start"], "U_rms": result["U_rms"], "U_thd": result["U_thd"]}
+    if "I_rms" in result:
+        columns.update({"I_rms": result["I_rms"], "I_thd": result["I_thd"],
+                        "phase_deg": result["phase_deg"], "displacement_pf": result["displacement_pf"]})
+    df = pd.DataFrame(columns)
+    for name in ("U", "I"):
+        key = f"{name}_harmonics_pct"
+        if key in result:
+            orders = range(1, result[key].shape[1] + 1)
+            df = pd.concat([df, pd.DataFrame(result[key], columns=[f"{name}({h})" for h in orders])], axis=1)
+    return df
+
+
+def spectrum_summary(result):
+    """Máximo y media de cada armónico a lo largo de la captura."""
+    rows = {}
+    for name in ("U", "I"):
+        key = f"{name}_harmonics_pct"
+        if key in result:
+            rows[f"{name}_max_pct"] = np.nanmax(result[key], axis=0)
+            rows[f"{name}_mean_pct"] = np.nanmean(result[key], axis=0)
+    df = pd.DataFrame(rows)
+    df.insert(0, "Order", np.arange(1, len(df) + 1))
+    return df
+
+
+def save_harmonics(result, output_file, hd_df=None, max_excel_windows=100_000):
+    """Guarda el espectro, la comparación con el instrumento y la tabla por ventana (en CSV si es muy larga)."""
+    tables = {"Spectrum": spectrum_summary(result)}
+    if hd_df is not None:
+        tables["Cross_check"] = cross_check(result, hd_df)
+    windows = harmonics_to_frame(result)
+    if len(windows) <= max_excel_windows:
+        tables["Windows"] = windows
+    else:
+        csv_path = f"{output_file.rsplit('.', 1)[0]}_windows.csv"
+        windows.to_csv(csv_path, index=False)
+        print(f"Tabla por ventana guardada en CSV: {csv_path}")
+    write_summary_excel(tables, output_file)
+
+
+def cross_check(result, hd_df):
+    """Compara los valores calculados con los que reporta el instrumento (MaxUthd1 y MaxU1(n))."""
+    rows = [("THD U", np.nanmax(result["U_thd"]), pd.to_numeric(hd_df["MaxUthd1"], errors="coerce").max())]
+    for h in HD_ORDERS:
+        column = f"MaxU1({h})"
+        if column in hd_df and h <= result["max_order"]:
+            rows.append((f"U({h})", np.nanmax(result["U_harmonics_pct"][:, h - 1]),
+                         pd.to_numeric(hd_df[column], errors="coerce").max()))
+    df = pd.DataFrame(rows, columns=["Metric", "Computed", "Instrument"])
+    df["Difference"] = df["Computed"] - df["Instrument"]
+    return df
@@ -1,82 +1,166 @@
+import sys
+import time
 import pandas as pd 
-import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import os
 import numpy as np
-from matplotlib.patches import Arc
-def plot_and_save(df, signals, output_folder, title_prefix, x_col='Time', y_range=None, colors=None, ylabel='Valor'):
-    """Genera gráficos para las señales especificadas y guarda los gráficos en la carpeta indicada."""
+from matplotlib.patches import Arc, Circle
+from V2L_Cache import cached_read
+from V2L_Batch import run_batch, print_summary
+from V2L_Decimate import decimation_enabled
+from V2L_Render import FigureTemplate, get_template, new_figure, save_figure, figure_reuse_enabled
+from V2L_PowerQuality import HD_DTYPES, HD_NUMERIC_COLUMNS, power_factor_stats
+from V2L_Build import BuildManifest
+from V2L_Profile import stage
+from V2L_Stats import frame_stats
+from V2L_StatsDB import record
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# Carpetas por defecto cuando no se indican otras por línea de comandos
+DEFAULT_INPUT = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\V2L\Potencias_harmonicos_v2l\Archivos_csv'
+DEFAULT_OUTPUT = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\V2L\Potencias_harmonicos_v2l\Graficos'
+
+# Colores específicos para las señales
+colors_AveP_S_Q_PF = {
+    'AveP1': 'red',
+    'AveS1': 'black',
+    'AveQ1': 'yellow',
+    'AvePF1': 'cyan'
+}
+
+colors_AveU_I = {
+    'AveUrms1': 'green',
+    'AveIrms1': 'blue'
+}
+
+# Gráficos que se generan para cada CSV: (señales, prefijo del título, parámetros de plot_and_save)
+HD_PLOTS = [
+    # AveUrms1 y AveIrms1 con colores específicos y un eje secundario para AveIrms1
+    (['AveUrms1', 'AveIrms1'], 'AveU_I', dict(colors=colors_AveU_I, ylabel='Voltage (V)')),
+    # AveP1, AveS1, AveQ1, AvePF1 en un solo gráfico con Power (W, VA, VAR) en la etiqueta del eje y
+    (['AveP1', 'AveS1', 'AveQ1', 'AvePF1'], 'AveP_S_Q_PF', dict(colors=colors_AveP_S_Q_PF, ylabel='Power (W, VA, VAR)')),
+    # MaxUthd1 y MaxU1(2) a MaxU1(10) con y_range (0, 1.5)
+    (['MaxUthd1'] + [f'MaxU1({i})' for i in range(2, 11)], 'MaxU', dict(y_range=(0, 1.5), ylabel='THD (%)')),
+    # MaxU1(2), MaxU1(4), MaxU1(6), MaxU1(8), MaxU1(10) con y_range automático
+    (['MaxU1(2)', 'MaxU1(4)', 'MaxU1(6)', 'MaxU1(8)', 'MaxU1(10)'], 'MaxU1_Group1', dict(ylabel='THD (%)')),
+    # MaxU1(3), MaxU1(5), MaxU1(7), MaxU1(9) con y_range automático
+    (['MaxU1(3)', 'MaxU1(5)', 'MaxU1(7)', 'MaxU1(9)'], 'MaxU1_Group2', dict(ylabel='THD (%)')),
+]
+
+# Tamaño de los gráficos de señales (pulgadas)
+FIG_WIDTH, FIG_HEIGHT = 8.28, 2.5
+
+def _build_group_figure(signals, title_prefix, colors=None, ylabel='Valor', fixed_layout=True):
+    """Maqueta (sin datos) del gráfico con varias señales; AveIrms1 va en un eje secundario."""
+    fig = new_figure((FIG_WIDTH, FIG_HEIGHT))
+    ax1 = fig.add_subplot()
+    top = ax1
+    lines = {}
+
+    for signal in signals:
+        color = colors.get(signal, None) if colors else None
+        if signal == 'AveIrms1':  # Eje secundario
+            ax2 = top = ax1.twinx()
+            lines[signal], = ax2.plot([], [], label=signal, color='blue')
+            ax2.set_ylabel('AveIrms1', color='blue')
+            ax2.tick_params(axis='y', labelcolor='blue')
+            ax2.set_ylim(0, 20)
+        else:
+            lines[signal], = ax1.plot([], [], label=signal, color=color)
+            y_label_color = 'green' if signal == 'AveUrms1' else 'black'
+            ax1.set_ylabel(ylabel, color=y_label_color)
+            ax1.tick_params(axis='y', labelcolor=y_label_color)
+
+    if 'AveUrms1' in signals:
+        ax1.set_ylim(0, 240)
+        ax1.yaxis.set_major_locator(ticker.MultipleLocator(60))
+
+    ax1.set_xlabel('Time (s)')
+    top.set_title(title_prefix)
+
+    # Configuración de la cuadrícula
+    ax1.grid(True, which='major', axis='both')  # Cuadrícula horizontal y vertical en el eje principal
+    if 'AveIrms1' in signals:
+        ax2.grid(False)  # Evitar cuadrícula en el eje secundario
+
+    ax1.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+    ax1.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f'{int(x)}'))
+
+    top.legend(handles=list(lines.values()), labels=list(lines), loc='upper left', bbox_to_anchor=(1, 1))
+    return FigureTemplate(fig, lines, fixed_layout)
+
+def _build_signal_figure(signal, title_prefix, y_range=None, colors=None, fixed_layout=True):
+    """Maqueta (sin datos) del gráfico de una sola señal."""
+    fig = new_figure((FIG_WIDTH, FIG_HEIGHT))
+    ax = fig.add_subplot()
+    color = colors.get(signal, None) if colors else None
+    line, = ax.plot([], [], label=signal, color=color)
+    ax.set_xlabel('Time')
+    y_label_color = 'green' if signal == 'AveUrms1' else 'black'
+    ax.set_ylabel(signal, color=y_label_color)
+    ax.tick_params(axis='y', labelcolor=y_label_color)
+    ax.set_title(f'{title_prefix}: {signal}')
+    ax.grid(True, which='major', axis='both')  # Mostrar ambas cuadrículas
+    ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+    if y_range:
+        ax.set_ylim(y_range)
+    ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return FigureTemplate(fig, {signal: line}, fixed_layout)
+
+def plot_and_save(df, df_file_path, signals, output_folder, title_prefix, x_col='Time', y_range=None, colors=None, ylabel='Valor'):
+    """Genera gráficos para las señales especificadas y guarda los gráficos en la carpeta indicada.
+
+    Cada maqueta se construye una vez por proceso y se reutiliza en los siguientes archivos (ver V2L_Render).
+    """
+    # Las columnas se extraen una sola vez para todas las figuras del grupo
+    x = df[x_col].to_numpy()
+    series = {signal: (x, df[signal].to_numpy()) for signal in signals}
+    return plot_series(series, df_file_path, signals, output_folder, title_prefix, y_range, colors, ylabel)
+
+def plot_series(series, df_file_path, signals, output_folder, title_prefix, y_range=None, colors=None, ylabel='Valor'):
+    """Como plot_and_save, con series[señal] = (x, y) ya extraídas (p. ej. la envolvente de un CSV que crece)."""
     file_name = os.path.splitext(os.path.basename(df_file_path))[0]
     output_subfolder = os.path.join(output_folder, file_name)
     os.makedirs(output_subfolder, exist_ok=True)
 
-    fig_width, fig_height = 8.28, 2.5  # Tamaño del gráfico
+    color_key = tuple(sorted(colors.items())) if colors else None
 
     if len(signals) > 1:
-        plt.figure(figsize=(fig_width, fig_height))
-        ax1 = plt.gca()
-        handles, labels = [], []
-
-        for signal in signals:
-            color = colors.get(signal, None) if colors else None
-            if signal == 'AveIrms1':  # Eje secundario
-                ax2 = ax1.twinx()
-                line2, = ax2.plot(df[x_col], df[signal], label=signal, color='blue')
-                ax2.set_ylabel('AveIrms1', color='blue')
-                ax2.tick_params(axis='y', labelcolor='blue')
-                ax2.set_ylim(0, 20)
-                handles.append(line2)
-                labels.append(signal)
-            else:
-                line1, = ax1.plot(df[x_col], df[signal], label=signal, color=color)
-                y_label_color = 'green' if signal == 'AveUrms1' else 'black'
-                ax1.set_ylabel(ylabel, color=y_label_color)
-                ax1.tick_params(axis='y', labelcolor=y_label_color)
-                handles.append(line1)
-                labels.append(signal)
-
-        if 'AveUrms1' in signals:
-            ax1.set_ylim(0, 240)
-            ax1.yaxis.set_major_locator(ticker.MultipleLocator(60))
-
-        ax1.set_xlabel('Time (s)')
-        plt.title(title_prefix)
-
-        # Configuración de la cuadrícula
-        ax1.grid(True, which='major', axis='both')  # Cuadrícula horizontal y vertical en el eje principal
-        if 'AveIrms1' in signals:
-            ax2.grid(False)  # Evitar cuadrícula en el eje secundario
-
-        ax1.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
-        ax1.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f'{int(x)}'))
-
-        plt.legend(handles=handles, labels=labels, loc='upper left', bbox_to_anchor=(1, 1))
-        plt.savefig(os.path.join(output_subfolder, f'{title_prefix}.png'), bbox_inches='tight')
-        plt.close()
-    else:
-        for signal in signals:
-            plt.figure(figsize=(fig_width, fig_height))
-            color = colors.get(signal, None) if colors else None
-            plt.plot(df[x_col], df[signal], label=signal, color=color)
-            plt.xlabel('Time')
-            plt.ylabel(signal if ylabel is None else ylabel)
-            y_label_color = 'green' if signal == 'AveUrms1' else 'black'
-            plt.ylabel(signal, color=y_label_color)
-            plt.tick_params(axis='y', labelcolor=y_label_color)
-            plt.title(f'{title_prefix}: {signal}')
-            plt.grid(True, which='major', axis='both')  # Mostrar ambas cuadrículas
-            ax = plt.gca()
-            ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
-            if y_range:
-                plt.ylim(y_range)
-            plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-            plt.savefig(os.path.join(output_subfolder, f'{title_prefix}_{signal}.png'), bbox_inches='tight')
-            plt.close()
-
-
-
-
-def plot_fasorial(df, df_file_path, output_folder, title_prefix):  
+        template = get_template(
+            ('group', tuple(signals), title_prefix, color_key, ylabel),
+            lambda fixed_layout: _build_group_figure(signals, title_prefix, colors, ylabel, fixed_layout))
+        return [template.render_series(series, os.path.join(output_subfolder, f'{title_prefix}.png'))]
+
+    outputs = []
+    for signal in signals:
+        template = get_template(
+            ('signal', signal, title_prefix, y_range, color_key),
+            lambda fixed_layout: _build_signal_figure(signal, title_prefix, y_range, colors, fixed_layout))
+        outputs.append(template.render_series(series, os.path.join(output_subfolder, f'{title_prefix}_{signal}.png')))
+    return outputs
+
+def load_hd_csv(df_file_path, engine=None):
+    """Lee del CSV del Hioki solo las columnas que se usan, ya con los tipos de HD_DTYPES.
+
+    El resto de columnas del instrumento ni se convierten ni ocupan memoria. Con pyarrow instalado se usa
+    su lector. Si alguna celda no es numérica (p. ej. una marca de desbordamiento), las columnas se leen
+    como texto y esas celdas quedan en NaN, como antes.
+    """
+    engine = engine or CSV_ENGINE
+    header = pd.read_csv(df_file_path, nrows=0).columns
+    dtypes = {col: HD_DTYPES[col] for col in HD_NUMERIC_COLUMNS if col in header}
+    try:
+        return pd.read_csv(df_file_path, usecols=list(dtypes), dtype=dtypes, engine=engine)
+    except ValueError:
+        df = pd.read_csv(df_file_path, usecols=list(dtypes), dtype=str, engine=engine)
+        return df.apply(pd.to_numeric, errors='coerce').astype(dtypes)
+
+def plot_fasorial(df, df_file_path, output_folder, title_prefix, pf_stats=None):
     """Genera una gráfica fasorial de los vectores de potencia y corriente y la guarda en la carpeta indicada."""
 
     # Crear carpeta para los gráficos del archivo CSV
@@ -84,14 +168,15 @@ def plot_fasorial(df, df_file_path, output_folder, title_prefix):
     output_subfolder = os.path.join(output_folder, file_name)
     os.makedirs(output_subfolder, exist_ok=True)
 
-    # Obtener los valores máximos de P y S
-    P_max = df['AveP1'].max()
-    S_max = df['AveS1'].max()
+    # cos(θ) = P / S muestra a muestra; el fasor se dibuja en el instante de máxima carga
+    if pf_stats is None:
+        pf_stats = power_factor_stats(df)
+    P_max = pf_stats['P_at_max_load']
+    S_max = pf_stats['S_at_max_load']
 
-    # Calcular el ángulo en radianes usando la fórmula cos(θ) = P / S
-    cos_theta = P_max / S_max
-    angle_rad = np.arccos(cos_theta)  # Ángulo en radianes
-    angle_deg = np.degrees(angle_rad)  # Ángulo en grados
+    cos_theta = pf_stats['pf_at_max_load']
+    angle_deg = pf_stats['angle_at_max_load']  # Ángulo en grados
+    angle_rad = np.radians(angle_deg)  # Ángulo en radianes
 
     # Definir módulos para vectores
     V_mag = P_max  # Módulo del voltaje (proporcional a P)
@@ -105,36 +190,33 @@ def plot_fasorial(df, df_file_path, output_folder, title_prefix):
     I_y = I_mag * np.sin(angle_rad)  # Componente en el eje imaginario
 
     # Graficar el gráfico vectorial
-    plt.figure(figsize=(8, 8))
+    fig = new_figure((8, 8))
+    ax = fig.add_subplot()
 
     # Añadir el círculo unitario como cuadrícula
-    circle = plt.Circle((0, 0), max(V_mag, I_mag), color='black', fill=False, linestyle='-', linewidth=1)
-    plt.gca().add_patch(circle)
+    circle = Circle((0, 0), max(V_mag, I_mag), color='black', fill=False, linestyle='-', linewidth=1)
+    ax.add_patch(circle)
 
     # Graficar los vectores
-    plt.quiver(0, 0, V_x, V_y, angles='xy', scale_units='xy', scale=1, color='green', label='Voltage (V)', linewidth=2)
-    plt.quiver(0, 0, I_x, I_y, angles='xy', scale_units='xy', scale=1, color='blue', label='Current (A)', linewidth=2)
+    ax.quiver(0, 0, V_x, V_y, angles='xy', scale_units='xy', scale=1, color='green', label='Voltage (V)', linewidth=2)
+    ax.quiver(0, 0, I_x, I_y, angles='xy', scale_units='xy', scale=1, color='blue', label='Current (A)', linewidth=2)
 
     # Añadir el factor de potencia (FP) como un label, a la derecha, a la altura de la leyenda
-    plt.text(max(V_mag, I_mag) * 1.3, 1.4 * max(V_mag, I_mag), f'FP = {cos_theta:.4f}', color='purple', fontsize=12, va='center', ha='left')
+    ax.text(max(V_mag, I_mag) * 1.3, 1.4 * max(V_mag, I_mag), f'FP = {cos_theta:.4f}', color='purple', fontsize=12, va='center', ha='left')
 
     # Dibujar el arco que representa el ángulo entre los vectores
     arc_radius = 0.5 * max(V_mag, I_mag)  # Radio del arco
     arc = Arc((0, 0), 2 * arc_radius, 2 * arc_radius, theta1=0, theta2=angle_deg, color='red', lw=2, linestyle='--')
-    plt.gca().add_patch(arc)
+    ax.add_patch(arc)
 
     # Colocar el texto del ángulo en el gráfico (con símbolo °)
-    plt.text(0.5 * arc_radius, 0.5 * arc_radius, f'{angle_deg:.2f}°', color='red', fontsize=12, ha='center')
+    ax.text(0.5 * arc_radius, 0.5 * arc_radius, f'{angle_deg:.2f}°', color='red', fontsize=12, ha='center')
 
     # **Nueva parte: Obtener el valor máximo de THD desde las gráficas MaxU1_Group1 y MaxU1_Group2**
     # Definir las columnas de MaxU1_Group1 y MaxU1_Group2
     columns_group1 = ['MaxU1(2)', 'MaxU1(4)', 'MaxU1(6)', 'MaxU1(8)', 'MaxU1(10)']
     columns_group2 = ['MaxU1(3)', 'MaxU1(5)', 'MaxU1(7)', 'MaxU1(9)']
 
-    # Asegurarse de que las columnas existen en el DataFrame
-    df[columns_group1] = df[columns_group1].apply(pd.to_numeric, errors='coerce')
-    df[columns_group2] = df[columns_group2].apply(pd.to_numeric, errors='coerce')
-
     # Encontrar el valor máximo entre las dos gráficas
     max_value_group1 = df[columns_group1].max().max()  # Máximo entre las columnas de Group1
     max_value_group2 = df[columns_group2].max().max()  # Máximo entre las columnas de Group2
@@ -143,94 +225,105 @@ def plot_fasorial(df, df_file_path, output_folder, title_prefix):
     max_thd_value = max(max_value_group1, max_value_group2)
 
     # Agregar el label de THD al gráfico
-    plt.text(max(V_mag, I_mag) * 1.3, 1.3 * max(V_mag, I_mag), f'THD = {max_thd_value:.2f}%', color='orange', fontsize=12, va='center', ha='left')
+    ax.text(max(V_mag, I_mag) * 1.3, 1.3 * max(V_mag, I_mag), f'THD = {max_thd_value:.2f}%', color='orange', fontsize=12, va='center', ha='left')
+
+    # Distribución del factor de potencia a lo largo de todo el ensayo
+    ax.text(max(V_mag, I_mag) * 1.3, 1.25 * max(V_mag, I_mag),
+             f"FP mean = {pf_stats['pf_mean']:.4f}\nFP p5-p95 = {pf_stats['pf_p5']:.4f} - {pf_stats['pf_p95']:.4f}",
+             color='purple', fontsize=10, va='top', ha='left')
 
     # Ajustes visuales
     # Quitar el recuadro negro
-    plt.gca().set_facecolor('white')  # Eliminar fondo negro
-    plt.axis('off')  # Desactivar los ejes
+    ax.set_facecolor('white')  # Eliminar fondo negro
+    ax.axis('off')  # Desactivar los ejes
 
     # Configurar el aspecto del gráfico (círculo)
-    plt.gca().set_aspect('equal', adjustable='box')
+    ax.set_aspect('equal', adjustable='box')
 
     # Título y etiquetas
-    plt.title(f'Fasorial: Voltage & Current - Angle: {angle_deg:.2f}°', va='bottom', fontsize=14)
+    ax.set_title(f'Fasorial: Voltage & Current - Angle: {angle_deg:.2f}°', va='bottom', fontsize=14)
     
     # Aquí colocamos los valores de los ejes al lado
-    plt.text(1.05 * max(V_mag, I_mag), 0, '(0° - 360°) Real axis ', color='black', fontsize=12, ha='left', va='center')
+    ax.text(1.05 * max(V_mag, I_mag), 0, '(0° - 360°) Real axis ', color='black', fontsize=12, ha='left', va='center')
     # Mover el eje Y un poco más hacia arriba
-    plt.text(0, 1.2 * max(V_mag, I_mag), 'Imaginary axis (90°)', color='black', fontsize=12, ha='center', va='bottom')
+    ax.text(0, 1.2 * max(V_mag, I_mag), 'Imaginary axis (90°)', color='black', fontsize=12, ha='center', va='bottom')
 
     # Añadir la leyenda debajo del label de THD
-    plt.legend(loc='upper right', fontsize=12, bbox_to_anchor=(1.2, 0.9))
+    ax.legend(loc='upper right', fontsize=12, bbox_to_anchor=(1.2, 0.9))
 
     # Añadir la cuadrícula circular (en la parte interna del gráfico)
     num_ticks = 8  # Número de divisiones de la cuadrícula
     ticks = np.linspace(0, 1.2 * max(V_mag, I_mag), num_ticks)
-    plt.xticks(ticks)
-    plt.yticks(ticks)
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
 
     # Añadir círculos concéntricos en la cuadrícula
     for radius in ticks:
-        circle_inner = plt.Circle((0, 0), radius, color='gray', fill=False, linestyle='--', linewidth=0.5)
-        plt.gca().add_patch(circle_inner)
+        circle_inner = Circle((0, 0), radius, color='gray', fill=False, linestyle='--', linewidth=0.5)
+        ax.add_patch(circle_inner)
 
     # Añadir líneas radiales para los cuadrantes
     for angle in np.linspace(0, 360, 8, endpoint=False):
         radian = np.radians(angle)
-        plt.plot([0, max(V_mag, I_mag) * np.cos(radian)], [0, max(V_mag, I_mag) * np.sin(radian)], color='gray', linestyle='--', linewidth=0.5)
+        ax.plot([0, max(V_mag, I_mag) * np.cos(radian)], [0, max(V_mag, I_mag) * np.sin(radian)], color='gray', linestyle='--', linewidth=0.5)
 
     # Etiquetas para los ángulos en los ejes
-    plt.text(0, max(V_mag, I_mag) * 1.05, '90°', color='black', fontsize=12, ha='center', va='bottom')
-    plt.text(-max(V_mag, I_mag) * 1.05, 0, '180°', color='black', fontsize=12, ha='right', va='center')
-    plt.text(0, -max(V_mag, I_mag) * 1.05, '270°', color='black', fontsize=12, ha='center', va='top')
+    ax.text(0, max(V_mag, I_mag) * 1.05, '90°', color='black', fontsize=12, ha='center', va='bottom')
+    ax.text(-max(V_mag, I_mag) * 1.05, 0, '180°', color='black', fontsize=12, ha='right', va='center')
+    ax.text(0, -max(V_mag, I_mag) * 1.05, '270°', color='black', fontsize=12, ha='center', va='top')
 
     # Guardar la gráfica fasorial
-    plt.savefig(os.path.join(output_subfolder, f'{title_prefix}_Fasorial.png'), bbox_inches='tight')
-    plt.close()
-
-def main(input_folder, output_folder):
+    output_path = os.path.join(output_subfolder, f'{title_prefix}_Fasorial.png')
+    return save_figure(fig, output_path, bbox_inches='tight')
+
+def process_file(df_file_path, output_folder):
+    """Lee un archivo CSV del Hioki y genera todos sus gráficos."""
+    # Leer el archivo CSV en un DataFrame de pandas (o su copia en caché)
+    df = cached_read(df_file_path, "hioki_hd-schema", load_hd_csv)
+
+    # Factor de potencia muestra a muestra (cos φ = P/S) y su distribución
+    with stage("compute"):
+        pf_stats = power_factor_stats(df)
+        stats = frame_stats(df, [col for col in HD_NUMERIC_COLUMNS[1:] if col in df.columns], percentiles=())
+    record("hioki-hd", df_file_path, {**stats, "PF": pf_stats})
+    print(f"{os.path.basename(df_file_path)}: FP medio {pf_stats['pf_mean']:.4f} "
+          f"(p5 {pf_stats['pf_p5']:.4f}, p95 {pf_stats['pf_p95']:.4f}), "
+          f"FP a máxima carga {pf_stats['pf_at_max_load']:.4f}")
+
+    # Gráficos de señales y gráfica fasorial
+    outputs = []
+    for signals, title_prefix, kwargs in HD_PLOTS:
+        outputs += plot_and_save(df, df_file_path, signals, output_folder, title_prefix, **kwargs)
+    outputs.append(plot_fasorial(df, df_file_path, output_folder, 'Fasorial', pf_stats=pf_stats))
+
+    return {'outputs': outputs, 'pf_stats': pf_stats}
+
+def build_params():
+    """Parámetros que afectan a los gráficos: si cambian, se regeneran todas las salidas."""
+    return {'script': 'hioki_hd', 'version': 3, 'plots': HD_PLOTS, 'decimate': decimation_enabled(),
+            'figure_reuse': figure_reuse_enabled()}
+
+def main(input_folder=DEFAULT_INPUT, output_folder=DEFAULT_OUTPUT, workers=1, incremental=False):
     """Lee archivos CSV de la carpeta de entrada y genera gráficos."""
     # Obtener lista de archivos CSV en la carpeta de entrada
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.csv'):
-            global df_file_path
-            df_file_path = os.path.join(input_folder, filename)
-            
-            # Leer el archivo CSV en un DataFrame de pandas
-            df = pd.read_csv(df_file_path)
-            
-            # Colores específicos para las señales
-            colors_AveP_S_Q_PF = {
-                'AveP1': 'red',
-                'AveS1': 'black',
-                'AveQ1': 'yellow',
-                'AvePF1': 'cyan'
-            }
-            
-            colors_AveU_I = {
-                'AveUrms1': 'green',
-                'AveIrms1': 'blue'
-            }
-            # Graficar AveUrms1 y AveIrms1 con colores específicos y un eje secundario para AveIrms1
-            plot_and_save(df, ['AveUrms1', 'AveIrms1'], output_folder, 'AveU_I', colors=colors_AveU_I, ylabel='Voltage (V)')
-            
-            # Graficar AveP1, AveS1, AveQ1, AvePF1 en un solo gráfico con colores específicos y Power (W, VA, VAR) en la etiqueta del eje y
-            plot_and_save(df, ['AveP1', 'AveS1', 'AveQ1', 'AvePF1'], output_folder, 'AveP_S_Q_PF', colors=colors_AveP_S_Q_PF, ylabel='Power (W, VA, VAR)')
-
-            # Graficar MaxUthd1 y MaxU1(2) a MaxU1(10) con y_range (0, 1.5)
-            plot_and_save(df, ['MaxUthd1'] + [f'MaxU1({i})' for i in range(2, 11)], output_folder, 'MaxU', y_range=(0, 1.5), ylabel='THD (%)')
-
-            # Graficar MaxU1(2), MaxU1(4), MaxU1(6), MaxU1(8), MaxU1(10) con y_range automático
-            plot_and_save(df, ['MaxU1(2)', 'MaxU1(4)', 'MaxU1(6)', 'MaxU1(8)', 'MaxU1(10)'], output_folder, 'MaxU1_Group1', ylabel='THD (%)')
-
-            # Graficar MaxU1(3), MaxU1(5), MaxU1(7), MaxU1(9) con y_range automático
-            plot_and_save(df, ['MaxU1(3)', 'MaxU1(5)', 'MaxU1(7)', 'MaxU1(9)'], output_folder, 'MaxU1_Group2', ylabel='THD (%)')
-            # Graficar la gráfica fasorial
-            plot_fasorial(df, df_file_path, output_folder, 'Fasorial')  # Aquí incluimos df_file_path
-
-
-# Llamar a la función principal para procesar los archivos CSV
-input_folder = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\V2L\Potencias_harmonicos_v2l\Archivos_csv'
-output_folder = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\V2L\Potencias_harmonicos_v2l\Graficos'
-main(input_folder, output_folder)
+    csv_files = [os.path.join(input_folder, filename) for filename in sorted(os.listdir(input_folder)) if filename.endswith('.csv')]
+
+    manifest = BuildManifest(output_folder)
+    params = build_params()
+    if incremental:
+        pending = [path for path in csv_files if not manifest.is_up_to_date(path, params)]
+        print(f"Modo incremental: {len(csv_files) - len(pending)} archivos al día, {len(pending)} por procesar")
+        csv_files = pending
+
+    t0 = time.perf_counter()
+    results = run_batch(process_file, csv_files, args=(output_folder,), workers=workers)
+    for result in results:
+        if result.error is None:
+            manifest.record(result.item, params, result.result['outputs'])
+    manifest.save()
+    return print_summary(results, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    from v2l import main as v2l_main
+    sys.exit(v2l_main(['hioki-hd'] + sys.argv[1:]))
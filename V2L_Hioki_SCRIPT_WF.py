@@ -1,94 +1,214 @@
+import sys
+import time
+from functools import lru_cache
 import pandas as pd 
-import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
 import numpy as np
 import os
-from PIL import Image
+from V2L_Cache import cached_file, cached_read
+from V2L_Batch import run_batch, print_summary
+from V2L_Decimate import plot_line, StreamingMinMax, decimation_enabled
+from V2L_Render import new_figure, save_figure
+from V2L_Summary import WaveformSummary, summarize_block, tables_stats, write_summary_excel, export_sorted, external_sort
+from V2L_Harmonics import F0, ChunkedHarmonics, analyze_waveform, save_harmonics
+from V2L_Binary import EXTENSION as BINARY_EXTENSION, open_binary, write_binary
+from V2L_Build import BuildManifest
+from V2L_Profile import stage
+from V2L_StatsDB import record
 
-def extract_data_from_csv(csv_file):
+WAVEFORM_COLUMNS = ['Value1', 'Value2']
+WAVEFORM_UNITS = ['V', 'A']
+
+# Los CSV mayores que este tamaño se procesan por bloques con memoria acotada
+STREAM_THRESHOLD_BYTES = 1024 ** 3
+CHUNK_SIZE = 1_000_000
+TOP_K = 1000
+
+# Ancho en píxeles de los gráficos de forma de onda (6.28 pulgadas a 300 dpi)
+PLOT_WIDTH_PX = int(6.28 * 300)
+
+# Perfiles de salida: vistas previas rápidas o calidad de informe
+OUTPUT_PROFILES = {
+    'preview': {'dpi': 150, 'format': 'png'},
+    'report': {'dpi': 300, 'format': 'png'},
+    'svg': {'dpi': 300, 'format': 'svg'},
+    'pdf': {'dpi': 300, 'format': 'pdf'},
+}
+DEFAULT_PROFILE = 'report'
+
+# Logo de marca de agua: tamaño y posición definidos para 300 dpi, se escalan con el dpi del perfil
+LOGO_PATH = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\Logo_Nissan.png'
+LOGO_SIZE_300DPI = (90, 50)
+LOGO_OFFSET_300DPI = (920, 260)
+LOGO_ALPHA = 0.5
+
+def parse_waveform_csv(csv_file):
     df = pd.read_csv(csv_file, header=None, names=['Value1', 'Value2'])
     df['Value1'] = pd.to_numeric(df['Value1'], errors='coerce')
     df['Value2'] = pd.to_numeric(df['Value2'], errors='coerce')
+    return df
+
+def extract_data_from_csv(csv_file):
+    df = cached_read(csv_file, 'hioki_wf', parse_waveform_csv)
     print(f"Datos leídos del archivo CSV: {csv_file}")
     print(df)
     return df
 
-def plot_data(df, output_dir):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
+def iter_waveform_chunks(csv_file, chunksize=CHUNK_SIZE):
+    """Lee el CSV de forma de onda por bloques de filas ya convertidas a números."""
+    for chunk in pd.read_csv(csv_file, header=None, names=WAVEFORM_COLUMNS, chunksize=chunksize):
+        yield chunk.apply(pd.to_numeric, errors='coerce')
+
+def iter_waveform_blocks(csv_file, chunksize=CHUNK_SIZE, table=None):
+    """Bloques float (muestras x WAVEFORM_COLUMNS) del binario ya convertido o, si no se indica, del CSV."""
+    if table is not None:
+        return table.iter_blocks(chunksize, WAVEFORM_COLUMNS)
+    return (chunk.to_numpy(dtype=float) for chunk in iter_waveform_chunks(csv_file, chunksize))
+
+def convert_waveform(csv_file, binary_path, dtype='float32', chunksize=CHUNK_SIZE, fs=None):
+    """Convierte el CSV de forma de onda, por bloques, al formato binario de V2L_Binary."""
+    return write_binary(binary_path, iter_waveform_blocks(csv_file, chunksize), WAVEFORM_COLUMNS, dtype=dtype,
+                        sample_rate=fs, units=WAVEFORM_UNITS, metadata={'source': os.path.basename(csv_file)})
+
+def open_waveform_binary(csv_file, dtype='float32', chunksize=CHUNK_SIZE, fs=None):
+    """Binario de la captura como mapas de memoria; la conversión solo se hace la primera vez (o si cambia el CSV)."""
+    path = cached_file(csv_file, f'hioki_wf-{dtype}',
+                       lambda source, destino: convert_waveform(source, destino, dtype, chunksize, fs),
+                       BINARY_EXTENSION)
+    return open_binary(path)
+
+def stream_waveform(csv_file, chunksize=CHUNK_SIZE, top_k=TOP_K, fs=None, f0=F0, table=None):
+    """Recorre la captura por bloques acumulando estadísticos, la envolvente de los gráficos, el top-K y los armónicos.
+
+    Con table (BinaryTable) los bloques son cortes de los mapas de memoria en lugar de texto del CSV.
+    """
+    envelopes = {col: StreamingMinMax(PLOT_WIDTH_PX) for col in WAVEFORM_COLUMNS}
+    summary = WaveformSummary(WAVEFORM_COLUMNS, k=top_k)
+    harmonics = ChunkedHarmonics(fs, f0) if fs else None
+
+    for block in iter_waveform_blocks(csv_file, chunksize, table):
+        for k, col in enumerate(WAVEFORM_COLUMNS):
+            envelopes[col].update(block[:, k])
+        summary.update(block)
+        if harmonics:
+            harmonics.update(block)
+
+    origen = 'binario' if table is not None else 'archivo CSV'
+    print(f"Datos leídos por bloques del {origen}: {csv_file} ({summary.stats['Value1'].samples} muestras)")
+    series = {col: envelopes[col].result() for col in WAVEFORM_COLUMNS}
+    return summary, series, harmonics.result() if harmonics else None
+
+def plot_streamed_data(summary, series, output_dir, **plot_options):
+    """Dibuja las formas de onda a partir de la envolvente y los estadísticos calculados por bloques."""
+    extremes = {col: (summary.stats[col].max, summary.stats[col].min) for col in WAVEFORM_COLUMNS}
+    return plot_waveforms(series, extremes, output_dir, **plot_options)
+
+def plot_data(df, output_dir, **plot_options):
     length = len(df)
     time = np.arange(length)  # Crear un eje de tiempo basado en el número de muestras
-    
+
+    series = {col: (time, df[col]) for col in ['Value1', 'Value2']}
+    extremes = {col: (np.max(df[col]), np.min(df[col])) for col in ['Value1', 'Value2']}
+    return plot_waveforms(series, extremes, output_dir, **plot_options)
+
+@lru_cache(maxsize=8)
+def load_logo(logo_path, size):
+    """Logo leído y redimensionado una sola vez por proceso, con la transparencia ya aplicada (RGBA en [0, 1])."""
+    if not logo_path:
+        return None  # Marca de agua desactivada
+    if not os.path.exists(logo_path):
+        print(f'Logo no encontrado, los gráficos se generan sin marca de agua: {logo_path}')
+        return None
+    from PIL import Image
+    with Image.open(logo_path) as logo:
+        rgba = np.asarray(logo.convert('RGBA').resize(size), dtype=float) / 255
+    rgba[..., 3] *= LOGO_ALPHA
+    return rgba
+
+def add_logo(fig, logo_path, dpi):
+    """Añade el logo en la esquina superior derecha, con el tamaño y la posición escalados al dpi de salida."""
+    scale = dpi / 300
+    logo = load_logo(logo_path, (round(LOGO_SIZE_300DPI[0] * scale), round(LOGO_SIZE_300DPI[1] * scale)))
+    if logo is not None:
+        dx, dy = LOGO_OFFSET_300DPI
+        fig.figimage(logo, xo=(fig.bbox.xmax + dx) * scale, yo=(fig.bbox.ymax + dy) * scale, zorder=1)
+
+def plot_waveforms(series, extremes, output_dir, profile=DEFAULT_PROFILE, logo_path=LOGO_PATH):
+    """Dibuja las formas de onda a partir de las series (x, y) y de los extremos (máx, mín) de cada canal."""
+    dpi = OUTPUT_PROFILES[profile]['dpi']
+    ext = OUTPUT_PROFILES[profile]['format']
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    time1, value1 = series['Value1']
+    time2, value2 = series['Value2']
+
     # Cálculos para el gráfico de Value1
-    max_value1 = np.max(df['Value1'])
-    min_value1 = np.min(df['Value1'])
+    max_value1, min_value1 = extremes['Value1']
     mean_max_value1 = np.mean([max_value1])
     
     # Gráfico de Value1
-    fig, ax = plt.subplots(figsize=(6.28, 2.039))
-    ax.plot(time, df['Value1'], color='green')
+    fig = new_figure((6.28, 2.039))
+    ax = fig.add_subplot()
+    plot_line(ax, time1, value1, color='green', dpi=dpi)
     ax.set_title('Voltage waveform', fontsize=8)
     ax.set_xlabel('Time (s)', fontsize=8)
     ax.set_ylabel('Voltage (V)', fontsize=8)
     ax.axhline(y=0, color='black', linewidth=0.8)
     ax.tick_params(axis='x', which='both', bottom=False, top=False, labelbottom=False)
     ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_locator(plt.MaxNLocator(8))
+    ax.yaxis.set_major_locator(MaxNLocator(8))
     
     textstr = f'Max: {format_decimal(max_value1, 1)}V\nMin: {format_decimal(min_value1, 1)}V\nMean Max: {format_decimal(mean_max_value1, 3)}V'
     props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
     ax.text(0.02, 0.05, textstr, transform=ax.transAxes, fontsize=5.8, verticalalignment='bottom', bbox=props)
     
-    logo_path = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\Logo_Nissan.png'
-    logo = Image.open(logo_path)
-    logo_resized = logo.resize((90, 50))
-    fig.figimage(logo_resized, xo=fig.bbox.xmax - -920, yo=fig.bbox.ymax - -260, alpha=0.5, zorder=1)
+    add_logo(fig, logo_path, dpi)
     
-    voltage_waveform_path = os.path.join(output_dir, 'voltage_wave.png')
-    plt.savefig(voltage_waveform_path, dpi=300)
-    plt.close(fig)
+    voltage_waveform_path = os.path.join(output_dir, f'voltage_wave.{ext}')
+    save_figure(fig, voltage_waveform_path, dpi=dpi)
     
     # Cálculos para el gráfico de Value2
-    max_value2 = np.max(df['Value2'])
-    min_value2 = np.min(df['Value2'])
+    max_value2, min_value2 = extremes['Value2']
     mean_max_value2 = np.mean([max_value2])
     
     # Gráfico de Value2
-    fig, ax = plt.subplots(figsize=(6.28, 2.039))
-    ax.plot(time, df['Value2'], color='blue')
+    fig = new_figure((6.28, 2.039))
+    ax = fig.add_subplot()
+    plot_line(ax, time2, value2, color='blue', dpi=dpi)
     ax.set_title('Current waveform', fontsize=8)
     ax.set_xlabel('Time (s)', fontsize=8)
     ax.set_ylabel('Current (A)', fontsize=8)
     ax.axhline(y=0, color='black', linewidth=0.8)
     ax.tick_params(axis='x', which='both', bottom=False, top=False, labelbottom=False)
     ax.tick_params(axis='y', labelsize=6)
-    ax.yaxis.set_major_locator(plt.MaxNLocator(8))
+    ax.yaxis.set_major_locator(MaxNLocator(8))
     
     textstr = f'Max: {format_decimal(max_value2, 1)}A\nMin: {format_decimal(min_value2, 1)}A\nMean Max: {format_decimal(mean_max_value2, 3)}A'
     props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
     ax.text(0.02, 0.05, textstr, transform=ax.transAxes, fontsize=5.8, verticalalignment='bottom', bbox=props)
     
-    fig.figimage(logo_resized, xo=fig.bbox.xmax - -920, yo=fig.bbox.ymax - -260, alpha=0.5, zorder=1)
+    add_logo(fig, logo_path, dpi)
     
-    current_waveform_path = os.path.join(output_dir, 'current_wave.png')
-    plt.savefig(current_waveform_path, dpi=300)
-    plt.close(fig)
+    current_waveform_path = os.path.join(output_dir, f'current_wave.{ext}')
+    save_figure(fig, current_waveform_path, dpi=dpi)
     
    # Gráfico combinado: superposición de corriente y voltaje con doble eje Y
-    fig, ax1 = plt.subplots(figsize=(6.28, 2.039))
+    fig = new_figure((6.28, 2.039))
+    ax1 = fig.add_subplot()
 
     # Eje izquierdo (Tensión)
-    ax1.plot(time, df['Value1'], color='green', label='Voltage (V)')
+    plot_line(ax1, time1, value1, color='green', label='Voltage (V)', dpi=dpi)
     ax1.set_xlabel('Time (s)', fontsize=8)
     ax1.set_ylabel('Voltage (V)', fontsize=8, color='green')
     ax1.tick_params(axis='y', labelcolor='green', labelsize=6)
     ax1.axhline(y=0, color='black', linewidth=0.8)
     ax1.tick_params(axis='x', which='both', bottom=False, top=False, labelbottom=False)
-    ax1.yaxis.set_major_locator(plt.MaxNLocator(8))
+    ax1.yaxis.set_major_locator(MaxNLocator(8))
 
     # Eje derecho (Corriente)
     ax2 = ax1.twinx()
-    ax2.plot(time, df['Value2'], color='blue', label='Current (A)', alpha=0.7)
+    plot_line(ax2, time2, value2, color='blue', label='Current (A)', alpha=0.7, dpi=dpi)
     ax2.set_ylabel('Current (A)', fontsize=8, color='blue')
     ax2.tick_params(axis='y', labelcolor='blue', labelsize=6)
     ax2.set_ylim(-25, 25)  # Establecer el rango de corriente de 0 a 25
@@ -98,48 +218,135 @@ def plot_data(df, output_dir):
     fig.legend(loc='upper right', fontsize=6)
 
     # Agregar logo
-    fig.figimage(logo_resized, xo=fig.bbox.xmax - -920, yo=fig.bbox.ymax - -260, alpha=0.5, zorder=1)
+    add_logo(fig, logo_path, dpi)
 
-    combined_waveform_path = os.path.join(output_dir, 'combined_waveform.png')
-    plt.savefig(combined_waveform_path, dpi=300)
-    plt.close(fig)
+    combined_waveform_path = os.path.join(output_dir, f'combined_waveform.{ext}')
+    save_figure(fig, combined_waveform_path, dpi=dpi)
         
     return max_value1, max_value2
 
 def format_decimal(number, decimal_places):
     return f"{number:.{decimal_places}f}"
 
-def sort_and_save_to_excel(df, output_file):
-    df_sorted = df[['Value1', 'Value2']].sort_values(by=['Value1'], ascending=False)
-    excel_file = output_file
-    
-    try:
-        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-            df_sorted.to_excel(writer, index=False, sheet_name='Sorted_Data')
-        print(f'Archivo Excel generado: {excel_file}')
-    except PermissionError:
-        print(f"Permission denied: {excel_file}. Por favor, cierra el archivo si está abierto y vuelve a intentarlo.")
-
-def main():
-    directory = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\V2L\Potencia _V2L\Archivos_CSV'
-    
-    for filename in os.listdir(directory):
-        if filename.endswith('.csv'):
-            csv_file = os.path.join(directory, filename)
-            base_name = os.path.splitext(os.path.basename(csv_file))[0]
-            main_dir = os.path.join(directory, base_name)
-            output_dir = os.path.join(main_dir, 'Image_waveform')
-            output_file = os.path.join(main_dir, 'sorted_values.xlsx')
-            
-            if not os.path.exists(main_dir):
-                os.makedirs(main_dir)
-            
+def save_summary(df, output_file, top_k=TOP_K, full_export=None):
+    """Guarda el resumen (estadísticos, cuantiles y top/bottom-K) y, opcionalmente, la exportación ordenada completa.
+
+    Devuelve las tablas del resumen.
+    """
+    block = df[WAVEFORM_COLUMNS].to_numpy(dtype=float)
+    with stage("compute"):
+        tables = summarize_block(block, WAVEFORM_COLUMNS, k=top_k)
+    with stage("write"):
+        write_summary_excel(tables, output_file)
+        if full_export:
+            export_sorted(block, WAVEFORM_COLUMNS, full_export)
+    return tables
+
+DEFAULT_DIRECTORY = r'C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\Home_matrix\V2L\Potencia _V2L\Archivos_CSV'
+
+def find_hd_reference(hd_folder, base_name):
+    """Busca en hd_folder el CSV del Hioki HD con el mismo nombre base para la comparación de armónicos."""
+    hd_csv = os.path.join(hd_folder, f'{base_name}.csv') if hd_folder else None
+    if hd_csv and os.path.exists(hd_csv):
+        return pd.read_csv(hd_csv)
+    return None
+
+def expected_outputs(main_dir, full_sort=None, fs=None, profile=DEFAULT_PROFILE):
+    """Archivos que genera process_capture() para una captura, según las opciones."""
+    output_dir = os.path.join(main_dir, 'Image_waveform')
+    ext = OUTPUT_PROFILES[profile]['format']
+    outputs = [os.path.join(output_dir, f'{name}.{ext}') for name in ('voltage_wave', 'current_wave', 'combined_waveform')]
+    outputs.append(os.path.join(main_dir, 'summary_values.xlsx'))
+    if full_sort:
+        outputs.append(os.path.join(main_dir, f'sorted_values.{full_sort}'))
+    if fs:
+        outputs.append(os.path.join(main_dir, 'harmonics.xlsx'))
+    return outputs
+
+def process_capture(csv_file, output_root, stream='auto', chunksize=CHUNK_SIZE, top_k=TOP_K, full_sort=None,
+                    fs=None, f0=F0, hd_folder=None, profile=DEFAULT_PROFILE, logo_path=LOGO_PATH, binary=None):
+    """Genera los gráficos, el resumen y (con fs) el análisis armónico de una captura; devuelve las salidas.
+
+    Con binary ('float32' o 'float64') la captura se lee del binario en memoria mapeada, convertido la
+    primera vez, en lugar de volver a interpretar el texto del CSV.
+    """
+    filename = os.path.basename(csv_file)
+    base_name = os.path.splitext(filename)[0]
+    main_dir = os.path.join(output_root, base_name)
+    output_dir = os.path.join(main_dir, 'Image_waveform')
+    output_file = os.path.join(main_dir, 'summary_values.xlsx')
+    full_export = os.path.join(main_dir, f'sorted_values.{full_sort}') if full_sort else None
+
+    if not os.path.exists(main_dir):
+        os.makedirs(main_dir)
+
+    use_stream = stream == 'always' or (stream == 'auto' and os.path.getsize(csv_file) > STREAM_THRESHOLD_BYTES)
+    table = open_waveform_binary(csv_file, binary, chunksize, fs) if binary else None
+    if use_stream:
+        # Memoria acotada: estadísticos, envolvente y top-K calculados por bloques
+        with stage("load") as s:
+            # Lectura y cálculo van juntos: cada bloque se resume nada más leerse
+            summary, series, harmonics = stream_waveform(csv_file, chunksize, top_k, fs, f0, table)
+            s.add(rows=summary.stats[WAVEFORM_COLUMNS[0]].samples)
+        max_value1, max_value2 = plot_streamed_data(summary, series, output_dir, profile=profile, logo_path=logo_path)
+        with stage("write"):
+            tables = summary.tables()
+            write_summary_excel(tables, output_file)
+            if full_export:
+                # Segunda pasada: ordenación externa por bloques
+                external_sort(iter_waveform_blocks(csv_file, chunksize, table), WAVEFORM_COLUMNS, full_export)
+    else:
+        if table is not None:
+            with stage("load") as s:
+                df = table.frame(WAVEFORM_COLUMNS)
+                s.add(rows=len(df))
+        else:
             df = extract_data_from_csv(csv_file)
-            max_value1, max_value2 = plot_data(df, output_dir)
-            sort_and_save_to_excel(df, output_file)
-    
-            mean_max_value = np.mean([max_value1, max_value2])
-            print(f'Mean of max values for {filename}: {mean_max_value:.3f}V/A')
+        max_value1, max_value2 = plot_data(df, output_dir, profile=profile, logo_path=logo_path)
+        tables = save_summary(df, output_file, top_k, full_export)
+        with stage("compute"):
+            harmonics = analyze_waveform(df['Value1'], df['Value2'], fs, f0) if fs else None
+
+    if harmonics is not None:
+        # Análisis armónico desde la forma de onda, comparado con el archivo HD si existe
+        with stage("write"):
+            save_harmonics(harmonics, os.path.join(main_dir, 'harmonics.xlsx'), find_hd_reference(hd_folder, base_name))
+
+    record('hioki-wf', csv_file, tables_stats(tables))
+
+    mean_max_value = np.mean([max_value1, max_value2])
+    print(f'Mean of max values for {filename}: {mean_max_value:.3f}V/A')
+
+    outputs = expected_outputs(main_dir, full_sort, fs if harmonics is not None else None, profile)
+    return [path for path in outputs if os.path.exists(path)]
+
+def main(directory=DEFAULT_DIRECTORY, stream='auto', chunksize=CHUNK_SIZE, top_k=TOP_K, full_sort=None,
+         fs=None, f0=F0, hd_folder=None, incremental=False, output_root=None, workers=1,
+         profile=DEFAULT_PROFILE, logo_path=LOGO_PATH, binary=None):
+    """Procesa todos los CSV de la carpeta; las salidas de cada captura van a output_root/<nombre> (por defecto, junto al CSV)."""
+    output_root = output_root or directory
+    manifest = BuildManifest(output_root)
+    # El modo por bloques y su tamaño no cambian los resultados, solo la memoria usada
+    params = {'script': 'hioki_wf', 'version': 1, 'top_k': top_k, 'full_sort': full_sort, 'fs': fs, 'f0': f0,
+              'hd_folder': hd_folder and os.path.abspath(hd_folder), 'decimate': decimation_enabled(),
+              'profile': OUTPUT_PROFILES[profile], 'logo': logo_path and os.path.abspath(logo_path),
+              'dtype': 'float32' if binary == 'float32' else 'float64'}
+    csv_files = [os.path.join(directory, filename) for filename in sorted(os.listdir(directory)) if filename.endswith('.csv')]
+    if incremental:
+        pending = [path for path in csv_files if not manifest.is_up_to_date(path, params)]
+        print(f"Modo incremental: {len(csv_files) - len(pending)} archivos al día, {len(pending)} por procesar")
+        csv_files = pending
+
+    t0 = time.perf_counter()
+    results = run_batch(process_capture, csv_files, workers=workers,
+                        args=(output_root, stream, chunksize, top_k, full_sort, fs, f0, hd_folder, profile, logo_path,
+                              binary))
+    for result in results:
+        if result.error is None:
+            manifest.record(result.item, params, result.result)
+    manifest.save()
+    return print_summary(results, time.perf_counter() - t0)
 
 if __name__ == "__main__":
-    main()
+    from v2l import main as v2l_main
+    sys.exit(v2l_main(['hioki-wf'] + sys.argv[1:]))
@@ -1,84 +1,118 @@
 import os
-import matplotlib.pyplot as plt
-from openpyxl import load_workbook
-
-def generar_graficos(ruta_entrada, ruta_salida):
+import sys
+import time
+from V2L_OBD_Reader import cargar_datos_obd, filtrar_filas_completas
+from V2L_Decimate import plot_line, decimation_enabled
+from V2L_Render import new_figure, save_figure
+from V2L_Build import BuildManifest
+from V2L_Batch import run_batch, print_summary
+from V2L_Stats import frame_stats
+from V2L_Profile import stage
+from V2L_StatsDB import record
+
+# Rutas de entrada y salida por defecto
+RUTA_ENTRADA = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\OBD tratado\Datos_OBD_Excel_CT"
+RUTA_SALIDA = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\OBD tratado"
+RUTA_ARCHIVO_ESPECIFICO = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\OBD tratado\Datos_OBD_Excel_CT\20F4-10-31 09-37-13- 3h test.xlsx"
+
+def graficar_archivo(ruta_archivo, carpeta_graficos):
+    """Genera los gráficos 1 y 3 de un archivo OBD y devuelve sus rutas."""
+    archivo = os.path.basename(ruta_archivo)
+
+    # Extraer y filtrar datos sincronizados
+    datos = filtrar_filas_completas(
+        cargar_datos_obd(ruta_archivo),
+        ["tiempo", "voltaje", "corriente", "soc", "potencia"]
+    )
+
+    tiempo = datos["tiempo"]
+    columna_14 = datos["voltaje"]
+    columna_15 = datos["corriente"]
+    columna_11 = datos["soc"]
+    columna_12 = datos["potencia"]
+
+    # Estadísticos de todos los canales en una pasada; la integral da la energía (kWh) y la carga (Ah)
+    with stage("compute"):
+        stats = frame_stats(datos, ["voltaje", "corriente", "soc", "potencia"], time_column="tiempo", percentiles=())
+    print(f"{archivo}: energía {stats['potencia']['integral']:.3f} kWh, carga {stats['corriente']['integral']:.3f} Ah")
+    record("obd", ruta_archivo, stats)
+
+    # Gráfico 1: Voltaje, Corriente, SOC y Potencia
+    fig = new_figure((10, 6))
+    ax1 = fig.add_subplot()
+
+    # Calcular la media de la potencia
+    media_potencia = stats["potencia"]["mean"]
+
+    # Modificar la etiqueta del gráfico para incluir la media de la potencia
+    plot_line(ax1, tiempo, columna_12, label=f"Power (kW) Min: {stats['potencia']['min']:.2f}, Avg: {media_potencia:.2f}", color="red")
+    plot_line(ax1, tiempo, columna_15, label=f"HV Current (A) Min: {stats['corriente']['min']:.2f}", color="blue")
+    ax1.set_xlabel("Time (s)")
+    ax1.set_ylabel("Power (kW) / Current (A)", color="Black")
+    ax1.tick_params(axis="y", labelcolor="Black")
+    ax1.grid()
+
+    ax2 = ax1.twinx()
+    plot_line(ax2, tiempo, columna_11, label=f"SOC (%) Max: {stats['soc']['max']:.2f}", color="black")
+    plot_line(ax2, tiempo, columna_14, label=f"HV Voltage (V) Max: {stats['voltaje']['max']:.2f}", color="green")
+    ax2.set_ylabel("SOC (%) / HV Voltage", color="Black")
+    ax2.tick_params(axis="y", labelcolor="Black")
+
+    fig.suptitle("Graph 1: HV Voltage, HV Current, SOC & HV Power vs Time")
+
+    # Ajustar la posición de las leyendas
+    ax1.legend(loc="upper center", bbox_to_anchor=(0.5, -0.1), ncol=2)
+    ax2.legend(loc="upper center", bbox_to_anchor=(0.5, -0.2), ncol=2)
+
+    # Guardar el gráfico
+    grafico_1 = os.path.join(carpeta_graficos, f"{archivo}_grafico_1.png")
+    save_figure(fig, grafico_1, bbox_inches="tight")
+
+    # Gráfico 3: Corriente vs Potencia
+    fig = new_figure((10, 6))
+    ax = fig.add_subplot()
+    plot_line(ax, columna_15, columna_12, xy=True, label=f"Current vs Power Max: {stats['potencia']['max']:.2f}", color="blue")
+    ax.set_title("Graph 3: Current vs Power")
+    ax.set_xlabel("Power (kW)")
+    ax.set_ylabel("Current (A)")
+    ax.legend(loc="upper center", bbox_to_anchor=(0.5, -0.1), ncol=1)
+    ax.grid()
+    grafico_3 = os.path.join(carpeta_graficos, f"{archivo}_grafico_3.png")
+    save_figure(fig, grafico_3, bbox_inches="tight")
+
+    print(f"Gráficos generados y guardados para {archivo}")
+    return [grafico_1, grafico_3]
+
+def parametros_compilacion():
+    """Parámetros que afectan a los gráficos: si cambian, se regeneran todas las salidas."""
+    return {"script": "obd_kona", "version": 1, "decimate": decimation_enabled()}
+
+def generar_graficos(ruta_entrada, ruta_salida, incremental=False, workers=1):
     # Crear la carpeta de salida si no existe
     carpeta_graficos = os.path.join(ruta_salida, "graficos tratados")
     os.makedirs(carpeta_graficos, exist_ok=True)
 
-    # Procesar cada archivo Excel
-    for archivo in os.listdir(ruta_entrada):
+    # Manifiesto de compilación: con incremental=True solo se regeneran los archivos que han cambiado
+    manifiesto = BuildManifest(carpeta_graficos)
+    parametros = parametros_compilacion()
+
+    # Archivos Excel a procesar
+    archivos = []
+    for archivo in sorted(os.listdir(ruta_entrada)):
         if archivo.endswith(".xlsx") or archivo.endswith(".xls"):
             ruta_archivo = os.path.join(ruta_entrada, archivo)
-            try:
-                wb = load_workbook(ruta_archivo, data_only=True)
-                hoja = wb.active
-
-                # Extraer y filtrar datos sincronizados
-                datos = [
-                    (
-                        hoja.cell(row=i, column=4).value,  # Tiempo
-                        hoja.cell(row=i, column=14).value, # Voltaje
-                        hoja.cell(row=i, column=15).value, # Corriente
-                        hoja.cell(row=i, column=11).value, # SOC
-                        hoja.cell(row=i, column=12).value  # Potencia
-                    )
-                    for i in range(15, hoja.max_row + 1)
-                ]
-                datos = [fila for fila in datos if all(x is not None for x in fila)]
-
-                tiempo = [x[0] for x in datos]
-                columna_14 = [x[1] for x in datos]
-                columna_15 = [x[2] for x in datos]
-                columna_11 = [x[3] for x in datos]
-                columna_12 = [x[4] for x in datos]
-
-               # Gráfico 1: Voltaje, Corriente, SOC y Potencia
-                fig, ax1 = plt.subplots(figsize=(10, 6))
-
-                # Calcular la media de la potencia
-                media_potencia = sum(columna_12) / len(columna_12)
-
-                # Modificar la etiqueta del gráfico para incluir la media de la potencia
-                ax1.plot(tiempo, columna_12, label=f"Power (kW) Min: {min(columna_12):.2f}, Avg: {media_potencia:.2f}", color="red")
-                ax1.plot(tiempo, columna_15, label=f"HV Current (A) Min: {min(columna_15):.2f}", color="blue")
-                ax1.set_xlabel("Time (s)")
-                ax1.set_ylabel("Power (kW) / Current (A)", color="Black")
-                ax1.tick_params(axis="y", labelcolor="Black")
-                ax1.grid()
-
-                ax2 = ax1.twinx()
-                ax2.plot(tiempo, columna_11, label=f"SOC (%) Max: {max(columna_11):.2f}", color="black")
-                ax2.plot(tiempo, columna_14, label=f"HV Voltage (V) Max: {max(columna_14):.2f}", color="green")
-                ax2.set_ylabel("SOC (%) / HV Voltage", color="Black")
-                ax2.tick_params(axis="y", labelcolor="Black")
-
-                fig.suptitle("Graph 1: HV Voltage, HV Current, SOC & HV Power vs Time")
-
-                # Ajustar la posición de las leyendas
-                ax1.legend(loc="upper center", bbox_to_anchor=(0.5, -0.1), ncol=2)
-                ax2.legend(loc="upper center", bbox_to_anchor=(0.5, -0.2), ncol=2)
-
-                # Guardar el gráfico
-                plt.savefig(os.path.join(carpeta_graficos, f"{archivo}_grafico_1.png"), bbox_inches="tight")
-                plt.close()
-
-                # Gráfico 3: Corriente vs Potencia
-                plt.figure(figsize=(10, 6))
-                plt.plot(columna_15, columna_12, label=f"Current vs Power Max: {max(columna_12):.2f}", color="blue")
-                plt.title("Graph 3: Current vs Power")
-                plt.xlabel("Power (kW)")
-                plt.ylabel("Current (A)")
-                plt.legend(loc="upper center", bbox_to_anchor=(0.5, -0.1), ncol=1)
-                plt.grid()
-                plt.savefig(os.path.join(carpeta_graficos, f"{archivo}_grafico_3.png"), bbox_inches="tight")
-                plt.close()
-
-                print(f"Gráficos generados y guardados para {archivo}")
-
-            except Exception as e:
-                print(f"Error al procesar el archivo {archivo}: {e}")
+            if incremental and manifiesto.is_up_to_date(ruta_archivo, parametros):
+                print(f"Sin cambios, se omite {archivo}")
+                continue
+            archivos.append(ruta_archivo)
+
+    t0 = time.perf_counter()
+    resultados = run_batch(graficar_archivo, archivos, args=(carpeta_graficos,), workers=workers)
+    for resultado in resultados:
+        if resultado.error is None:
+            manifiesto.record(resultado.item, parametros, resultado.result)
+    manifiesto.save()
+    return print_summary(resultados, time.perf_counter() - t0)
 
 def generar_grafico_para_archivo_especifico(ruta_archivo, ruta_salida):
     # Crear la carpeta de salida si no existe
@@ -86,37 +120,30 @@ def generar_grafico_para_archivo_especifico(ruta_archivo, ruta_salida):
     os.makedirs(carpeta_graficos, exist_ok=True)
 
     try:
-        wb = load_workbook(ruta_archivo, data_only=True)
-        hoja = wb.active
-
         # Extraer y filtrar datos sincronizados
-        datos = [
-            (
-                hoja.cell(row=i, column=4).value,  # Tiempo
-                hoja.cell(row=i, column=14).value, # Voltaje
-                hoja.cell(row=i, column=11).value, # SOC
-                hoja.cell(row=i, column=25).value  # Temperatura
-            )
-            for i in range(15, hoja.max_row + 1)
-        ]
-        datos = [fila for fila in datos if all(x is not None for x in fila)]
-
-        tiempo = [x[0] for x in datos]
-        columna_14 = [x[1] for x in datos]
-        columna_11 = [x[2] for x in datos]
-        columna_25 = [x[3] for x in datos]
+        datos = filtrar_filas_completas(
+            cargar_datos_obd(ruta_archivo),
+            ["tiempo", "voltaje", "soc", "temperatura"]
+        )
+
+        tiempo = datos["tiempo"]
+        columna_14 = datos["voltaje"]
+        columna_11 = datos["soc"]
+        columna_25 = datos["temperatura"]
+        stats = frame_stats(datos, ["voltaje", "soc", "temperatura"], percentiles=())
 
         # Gráfico: SOC y Temperatura en eje Y izquierdo, Voltaje en eje Y derecho
-        fig, ax1 = plt.subplots(figsize=(10, 6))
-        ax1.plot(tiempo, columna_11, label=f"SOC (%) Max: {max(columna_11):.2f}", color="black")
-        ax1.plot(tiempo, columna_25, label=f"Temperature (°C) Max: {max(columna_25):.2f}", color="red")
+        fig = new_figure((10, 6))
+        ax1 = fig.add_subplot()
+        plot_line(ax1, tiempo, columna_11, label=f"SOC (%) Max: {stats['soc']['max']:.2f}", color="black")
+        plot_line(ax1, tiempo, columna_25, label=f"Temperature (°C) Max: {stats['temperatura']['max']:.2f}", color="red")
         ax1.set_xlabel("Time (s)")
         ax1.set_ylabel("SOC (%) / Temperature (°C)", color="Black")
         ax1.tick_params(axis="y", labelcolor="Black")
         ax1.grid()
 
         ax2 = ax1.twinx()
-        ax2.plot(tiempo, columna_14, label=f"Voltage (V) Max: {max(columna_14):.2f}", color="green")
+        plot_line(ax2, tiempo, columna_14, label=f"Voltage (V) Max: {stats['voltaje']['max']:.2f}", color="green")
         ax2.set_ylabel("Voltage (V)", color="Black")
         ax2.tick_params(axis="y", labelcolor="Black")
 
@@ -125,21 +152,22 @@ def generar_grafico_para_archivo_especifico(ruta_archivo, ruta_salida):
         ax2.legend(loc="upper center", bbox_to_anchor=(0.5, -0.2), ncol=1)
 
         nombre_grafico = os.path.join(carpeta_graficos, f"{os.path.basename(ruta_archivo)}_grafico_col25_11_14.png")
-        plt.savefig(nombre_grafico, bbox_inches="tight")
-        plt.close()
+        save_figure(fig, nombre_grafico, bbox_inches="tight")
 
         print(f"Gráfico generado y guardado: {nombre_grafico}")
 
     except Exception as e:
         print(f"Error al procesar el archivo {ruta_archivo}: {e}")
 
-# Rutas de entrada y salida
-ruta_entrada = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\OBD tratado\Datos_OBD_Excel_CT"
-ruta_salida = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\OBD tratado"
+def main(ruta_entrada=RUTA_ENTRADA, ruta_salida=RUTA_SALIDA, ruta_archivo_especifico=None, incremental=False, workers=1):
+    # Generar gráficos para todos los archivos
+    errores = generar_graficos(ruta_entrada, ruta_salida, incremental=incremental, workers=workers)
 
-# Generar gráficos para todos los archivos
-generar_graficos(ruta_entrada, ruta_salida)
+    # Generar gráfico específico para el archivo solicitado
+    if ruta_archivo_especifico:
+        generar_grafico_para_archivo_especifico(ruta_archivo_especifico, ruta_salida)
+    return errores
 
-# Generar gráfico específico para el archivo solicitado
-ruta_archivo_especifico = r"C:\Users\SNX6774\OneDrive - Nissan Motor Corporation\Escritorio\OBD tratado\Datos_OBD_Excel_CT\20F4-10-31 09-37-13- 3h test.xlsx"
-generar_grafico_para_archivo_especifico(ruta_archivo_especifico, ruta_salida)
+if __name__ == "__main__":
+    from v2l import main as v2l_main
+    sys.exit(v2l_main(["obd"] + sys.argv[1:]))
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from operator import itemgetter
+from V2L_Cache import cached_read
+
+try:
+    # Motor opcional en Rust, bastante más rápido que openpyxl para libros grandes
+    import python_calamine  # noqa: F401
+    MOTOR_EXCEL = "calamine"
+except ImportError:
+    MOTOR_EXCEL = "openpyxl"
+
+# Columnas del registro OBD (numeración de Excel, empezando en 1)
+COLUMNAS_OBD = {
+    "tiempo": 4,
+    "soc": 11,
+    "potencia": 12,
+    "voltaje": 14,
+    "corriente": 15,
+    "temperatura": 25,
+}
+
+# Los datos empiezan en la fila 15; las anteriores son la cabecera del registrador
+FILA_INICIO = 15
+
+
+def leer_datos_obd(ruta_archivo, columnas=None, fila_inicio=FILA_INICIO, motor=None):
+    """Lee en una sola pasada las columnas OBD indicadas y las devuelve como arrays de NumPy."""
+    columnas = columnas or COLUMNAS_OBD
+    nombres = list(columnas)
+    indices = [columnas[nombre] for nombre in nombres]
+
+    if (motor or MOTOR_EXCEL) == "calamine":
+        df = pd.read_excel(
+            ruta_archivo, sheet_name=0, engine="calamine", header=None,
+            skiprows=fila_inicio - 1, usecols=lambda c: c + 1 in indices
+        )
+        vacio = np.full(len(df), np.nan)
+        return {
+            nombre: pd.to_numeric(df[col - 1], errors="coerce").to_numpy(dtype=float) if col - 1 in df else vacio
+            for nombre, col in zip(nombres, indices)
+        }
+
+    min_col, max_col = min(indices), max(indices)
+
+    # Modo read_only: la hoja se recorre en streaming sin cargar todas las celdas en memoria
+    from openpyxl import load_workbook
+    wb = load_workbook(ruta_archivo, read_only=True, data_only=True)
+    try:
+        hoja = wb.active
+        filas = hoja.iter_rows(min_row=fila_inicio, min_col=min_col, max_col=max_col, values_only=True)
+        seleccion = itemgetter(*[c - min_col for c in indices])
+        if len(indices) == 1:
+            valores = [(seleccion(fila),) for fila in filas]
+        else:
+            valores = list(map(seleccion, filas))
+    finally:
+        wb.close()
+
+    if not valores:
+        return {nombre: np.empty(0) for nombre in nombres}
+
+    try:
+        # Las celdas vacías (None) se convierten directamente en NaN
+        bloque = np.array(valores, dtype=float)
+    except (TypeError, ValueError):
+        # Hay texto en alguna celda: convertir columna a columna y marcar lo no numérico como NaN
+        bloque = pd.DataFrame(valores).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+    return {nombre: bloque[:, k] for k, nombre in enumerate(nombres)}
+
+
+def filtrar_filas_completas(datos, claves):
+    """Devuelve solo las filas en las que todas las columnas indicadas tienen valor."""
+    mascara = np.logical_and.reduce([~np.isnan(datos[clave]) for clave in claves])
+    return {clave: datos[clave][mascara] for clave in claves}
+
+
+def cargar_datos_obd(ruta_archivo, nombres=None):
+    """Devuelve las columnas OBD indicadas (todas por defecto), usando la copia en caché si sigue vigente.
+
+    Cada selección de columnas tiene su propia entrada en la caché, así que un script que solo necesita
+    unas pocas no lee ni guarda las demás.
+    """
+    if nombres is None:
+        tipo, columnas = "obd", COLUMNAS_OBD
+    else:
+        tipo, columnas = f"obd:{','.join(nombres)}", {nombre: COLUMNAS_OBD[nombre] for nombre in nombres}
+    df = cached_read(ruta_archivo, tipo, lambda ruta: pd.DataFrame(leer_datos_obd(ruta, columnas)))
+    return {nombre: df[nombre].to_numpy() for nombre in df.columns}
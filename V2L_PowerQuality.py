@@ -0,0 +1,50 @@
+import numpy as np
+
+# Columnas del Hioki HD que se usan como números en los gráficos y en los cálculos
+HD_NUMERIC_COLUMNS = (
+    ['Time', 'AveUrms1', 'AveIrms1', 'AveP1', 'AveS1', 'AveQ1', 'AvePF1', 'MaxUthd1']
+    + [f'MaxU1({i})' for i in range(2, 11)]
+)
+# Tipos con los que se leen: float32 para las medidas (la mitad de memoria, más precisión que el
+# instrumento) y float64 para el tiempo, que en registros de muchas horas perdería resolución
+HD_DTYPES = {col: 'float64' if col == 'Time' else 'float32' for col in HD_NUMERIC_COLUMNS}
+
+
+def power_factor_series(df, p_col='AveP1', s_col='AveS1'):
+    """cos φ = P/S y ángulo φ (grados) de cada muestra; NaN donde S no es positiva."""
+    p = df[p_col].to_numpy(dtype=float)
+    s = df[s_col].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_phi = np.where(s > 0, p / s, np.nan)
+    # Pequeños errores de redondeo del instrumento pueden dar |P| > S
+    cos_phi = np.clip(cos_phi, -1.0, 1.0)
+    return cos_phi, np.degrees(np.arccos(cos_phi))
+
+
+def power_factor_stats(df, p_col='AveP1', s_col='AveS1', pf_col='AvePF1'):
+    """Distribución del factor de potencia (media, p5, p95) y valores en el instante de máxima carga."""
+    cos_phi, angle = power_factor_series(df, p_col, s_col)
+    valid = ~np.isnan(cos_phi)
+    if not valid.any():
+        raise ValueError(f"No hay muestras con {s_col} > 0 para calcular el factor de potencia.")
+
+    p = df[p_col].to_numpy(dtype=float)
+    # Instante de máxima carga (máxima potencia activa) entre las muestras válidas
+    i_max = np.flatnonzero(valid)[np.nanargmax(np.where(valid, p, np.nan)[valid])]
+    p5, p95 = np.percentile(cos_phi[valid], [5, 95])
+    stats = {
+        'samples': int(valid.sum()),
+        'pf_mean': float(np.mean(cos_phi[valid])),
+        'pf_p5': float(p5),
+        'pf_p95': float(p95),
+        'pf_at_max_load': float(cos_phi[i_max]),
+        'angle_at_max_load': float(angle[i_max]),
+        'angle_mean': float(np.mean(angle[valid])),
+        'P_at_max_load': float(p[i_max]),
+        'S_at_max_load': float(df[s_col].to_numpy(dtype=float)[i_max]),
+        'index_at_max_load': int(i_max),
+    }
+    if pf_col in df:
+        # Factor de potencia que reporta el instrumento, para contrastar
+        stats['instrument_pf_mean'] = float(np.nanmean(df[pf_col].to_numpy(dtype=float)))
+    return stats
@@ -0,0 +1,309 @@
+"""Instrumentación por etapas (lectura, cálculo, gráficos, escritura) de los scripts V2L.
+
+Uso en los scripts:
+
+    with file_record(ruta):             # un registro JSON por archivo
+        with stage("load") as s:
+            df = pd.read_csv(ruta)
+            s.add(rows=len(df))
+        with stage("render"):
+            ...
+
+Sin configure() (o con las variables de entorno vacías) stage() y file_record() devuelven un
+contexto vacío compartido, así que la instrumentación apenas cuesta nada. La configuración va en
+variables de entorno para que la hereden los procesos del pool.
+"""
+import cProfile
+import glob
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Variables de entorno: registro JSONL, carpeta de cProfile e identificador de la ejecución
+ENV_LOG = "V2L_PROFILE_LOG"
+ENV_DIR = "V2L_PROFILE_DIR"
+ENV_RUN = "V2L_PROFILE_RUN"
+
+# Nombre del registro cuando solo se pide cProfile
+LOG_NAME = "timings.jsonl"
+
+# Registro del archivo en curso y profundidad de etapas anidadas (por hilo)
+_state = threading.local()
+# Número de volcado dentro del proceso: dos archivos con el mismo nombre no se pisan
+_dump_seq = itertools.count()
+
+
+def _current():
+    return getattr(_state, "current", None)
+
+
+def _cpu_time():
+    # En un pool de hilos el tiempo de CPU del proceso mezclaría el de todos los archivos en curso
+    if threading.current_thread() is threading.main_thread():
+        return time.process_time()
+    return time.thread_time()
+
+
+def configure(log_path=None, profile_dir=None):
+    """Activa el registro por archivo (JSONL) y, con profile_dir, un volcado de cProfile por etapa.
+
+    Los volcados de cada ejecución van a una subcarpeta propia de profile_dir.
+    """
+    run = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+    if profile_dir:
+        run_dir = os.path.join(os.path.abspath(profile_dir), run)
+        os.makedirs(run_dir, exist_ok=True)
+        os.environ[ENV_DIR] = run_dir
+        log_path = log_path or os.path.join(profile_dir, LOG_NAME)
+    if log_path:
+        os.environ[ENV_LOG] = os.path.abspath(log_path)
+        os.environ[ENV_RUN] = run
+
+
+def enabled():
+    return bool(os.environ.get(ENV_LOG))
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso (MB), o None si el sistema no lo ofrece.
+
+    En Linux se usa VmHWM, que empieza de cero en cada proceso; ru_maxrss se hereda del proceso
+    padre a través de fork/exec.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb():
+    """Memoria residente actual del proceso (MB); None fuera de Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _in_worker_thread():
+    # Archivos en hilos de un mismo proceso: el pico de memoria es común a todos ellos
+    return threading.current_thread() is not threading.main_thread()
+
+
+def _reset_peak_rss():
+    # Linux >= 4.0: reinicia VmHWM para medir el pico de cada archivo y no el del proceso.
+    # Afecta a todo el proceso, así que con hilos no se reinicia (borraría el pico de los demás archivos)
+    if _in_worker_thread():
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class _Null:
+    """Contexto vacío para cuando la instrumentación está desactivada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counters):
+        pass
+
+
+_NULL = _Null()
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+        self.counters = {}
+        self.profiler = None
+
+    def add(self, **counters):
+        """Suma contadores a la etapa (rows, bytes...)."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        # cProfile no admite perfiles anidados: solo se perfila la etapa más externa
+        depth = getattr(_state, "depth", 0)
+        if depth == 0 and os.environ.get(ENV_DIR):
+            # Las repeticiones de una etapa en un archivo (un render por figura...) se acumulan en el mismo perfil
+            current = _current()
+            profilers = current.profilers if current is not None else {}
+            self.profiler = profilers.get(self.name) or cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                self.profiler = None  # otro hilo ya está perfilando (Python >= 3.12)
+            else:
+                profilers[self.name] = self.profiler
+        _state.depth = depth + 1
+        self.wall0, self.cpu0 = time.perf_counter(), _cpu_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.wall0, _cpu_time() - self.cpu0
+        _state.depth -= 1
+        current = _current()
+        if self.profiler is not None:
+            self.profiler.disable()
+            if current is None:
+                _dump_profile(self.profiler, self.name, None)
+
+        record = current if current is not None else _FileRecord(None)
+        entry = record.stages.setdefault(self.name, {"wall_s": 0.0, "cpu_s": 0.0})
+        entry["wall_s"] += wall
+        entry["cpu_s"] += cpu
+        for key, value in self.counters.items():
+            entry[key] = entry.get(key, 0) + value
+            if key in ("rows", "bytes"):
+                record.counters[key] = record.counters.get(key, 0) + value
+        if record is not current:
+            # Etapa fuera de file_record(): se registra sola
+            record.write(wall, cpu)
+        return False
+
+
+def _dump_profile(profiler, stage_name, file_path):
+    name = os.path.basename(file_path) if file_path else "run"
+    path = os.path.join(os.environ[ENV_DIR], f"{name}.{stage_name}.{os.getpid()}-{next(_dump_seq)}.prof")
+    profiler.dump_stats(path)
+
+
+class _FileRecord:
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}
+        self.counters = {}
+        self.profilers = {}
+
+    def __enter__(self):
+        self.parent, _state.current = _current(), self
+        _reset_peak_rss()
+        self.wall0, self.cpu0 = time.perf_counter(), _cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _state.current = self.parent
+        # Un volcado por etapa con todas sus repeticiones en el archivo
+        for stage_name, profiler in self.profilers.items():
+            _dump_profile(profiler, stage_name, self.path)
+        self.write(time.perf_counter() - self.wall0, _cpu_time() - self.cpu0,
+                   error=None if exc is None else f"{exc_type.__name__}: {exc}")
+        return False
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def write(self, wall, cpu, error=None):
+        path = str(self.path) if self.path is not None else None
+        size = os.path.getsize(path) if path and os.path.isfile(path) else None
+        record = {
+            "run": os.environ.get(ENV_RUN), "pid": os.getpid(), "file": path,
+            "bytes_read": size, "rows": self.counters.get("rows"),
+            "wall_s": round(wall, 6), "cpu_s": round(cpu, 6), "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_scope": "process" if _in_worker_thread() else "file",
+            "stages": {name: {k: round(v, 6) if isinstance(v, float) else v for k, v in entry.items()}
+                       for name, entry in self.stages.items()},
+        }
+        if error:
+            record["error"] = error
+        # Una línea por archivo en modo append: los procesos del pool escriben en el mismo registro
+        with open(os.environ[ENV_LOG], "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def stage(name):
+    """Mide una etapa (tiempo de pared, CPU y contadores); sin instrumentación es un contexto vacío."""
+    if not os.environ.get(ENV_LOG):
+        return _NULL
+    return _Stage(name)
+
+
+def file_record(path):
+    """Agrupa las etapas de un archivo y escribe su registro JSON al salir."""
+    if not os.environ.get(ENV_LOG):
+        return _NULL
+    return _FileRecord(path)
+
+
+def load_records(log_path=None, run=None):
+    """Registros de la ejecución indicada (por defecto, la actual) del archivo JSONL."""
+    log_path = log_path or os.environ.get(ENV_LOG)
+    run = run or os.environ.get(ENV_RUN)
+    if not log_path or not os.path.exists(log_path):
+        return []
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if run is None or r.get("run") == run]
+
+
+def print_summary(records, top=5):
+    """Tabla final: tiempo por etapa (suma de todos los archivos) y los archivos más lentos."""
+    if not records:
+        return
+    totals = {}
+    for record in records:
+        for name, entry in record["stages"].items():
+            total = totals.setdefault(name, {"n": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": 0})
+            total["n"] += 1
+            total["wall_s"] += entry["wall_s"]
+            total["cpu_s"] += entry["cpu_s"]
+            total["rows"] += entry.get("rows", 0)
+    wall_total = sum(t["wall_s"] for t in totals.values()) or 1e-12
+
+    print("\nTiempo por etapa")
+    print(f"  {'etapa':<12} {'veces':>6} {'pared (s)':>10} {'CPU (s)':>9} {'%':>6} {'filas':>11}")
+    for name, t in sorted(totals.items(), key=lambda item: -item[1]["wall_s"]):
+        print(f"  {name:<12} {t['n']:>6} {t['wall_s']:>10.2f} {t['cpu_s']:>9.2f} "
+              f"{100 * t['wall_s'] / wall_total:>5.1f}% {t['rows'] or '':>11}")
+
+    files = sorted((r for r in records if r["file"]), key=lambda r: -r["wall_s"])[:top]
+    if files:
+        print("  Archivos más lentos:")
+        for r in files:
+            scope = " del proceso" if r.get("peak_rss_scope") == "process" else ""
+            peak = f", pico{scope} {r['peak_rss_mb']:.0f} MB" if r.get("peak_rss_mb") else ""
+            print(f"    {os.path.basename(r['file'])}: {r['wall_s']:.2f} s{peak}")
+
+
+def write_profile_reports(profile_dir=None, top=30):
+    """Combina los volcados .prof de cada etapa en un informe de texto por etapa (ordenado por tiempo acumulado)."""
+    profile_dir = profile_dir or os.environ.get(ENV_DIR)
+    if not profile_dir:
+        return []
+    by_stage = {}
+    for path in glob.glob(os.path.join(profile_dir, "*.prof")):
+        by_stage.setdefault(path.rsplit(".", 3)[-3], []).append(path)
+    reports = []
+    for name, paths in sorted(by_stage.items()):
+        report = os.path.join(profile_dir, f"{name}.txt")
+        with open(report, "w", encoding="utf-8") as f:
+            stats = pstats.Stats(*paths, stream=f)
+            stats.sort_stats("cumulative").print_stats(top)
+        reports.append(report)
+    return reports
@@ -0,0 +1,134 @@
+import os
+import threading
+import webbrowser
+from pathlib import Path
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+
+from V2L_Decimate import update_line
+from V2L_Profile import stage
+
+# Margen (pulgadas) alrededor del recorte ajustado, como pad_inches de savefig
+PAD_INCHES = 0.1
+
+# Plantillas ya construidas, por clave de gráfico; una colección por hilo para poder renderizar en un pool de hilos
+_local = threading.local()
+
+
+def set_figure_reuse(enabled):
+    """Activa o desactiva la reutilización de figuras entre archivos (se hereda en los procesos hijos)."""
+    os.environ["V2L_FIGURE_REUSE"] = "1" if enabled else "0"
+
+
+def open_image(path):
+    """Abre una imagen ya guardada en el visor del sistema sin bloquear (sin pantalla no hace nada)."""
+    webbrowser.open(Path(path).resolve().as_uri())
+
+
+def figure_reuse_enabled():
+    return os.environ.get("V2L_FIGURE_REUSE", "1") != "0"
+
+
+def use_agg():
+    """Fuerza el backend no interactivo Agg: sin pantalla, sin ventanas y sin el bucle de eventos de la GUI."""
+    matplotlib.use("Agg", force=True)
+
+
+def new_figure(figsize=None, dpi=None):
+    """Figura con lienzo Agg propio, fuera del gestor de pyplot (no hace falta plt.close).
+
+    Cada figura es independiente del estado global de pyplot, así que se pueden dibujar varias a la vez
+    desde distintos hilos siempre que cada figura se use en un solo hilo.
+    """
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def save_figure(fig, output_path, **kwargs):
+    """Guarda la figura y la vacía en el acto.
+
+    La figura y su lienzo se referencian mutuamente, así que solo el recolector de ciclos liberaría sus
+    artistas; al vaciarla, la memoria de líneas, textos e imágenes se devuelve al guardar cada archivo.
+    """
+    with stage("render"):
+        fig.savefig(output_path, **kwargs)
+    fig.clear()
+    return output_path
+
+
+class FigureTemplate:
+    """Figura con la maquetación ya hecha; para cada archivo solo se actualizan los datos de las líneas."""
+
+    def __init__(self, fig, lines, fixed_layout=True):
+        self.fig = fig
+        self.lines = lines
+        self.fixed_layout = fixed_layout
+        self.bbox = None
+
+    def _layout_bbox(self):
+        # Recorte ajustado de la figura con los datos actuales
+        self.fig.canvas.draw()
+        return self.fig.get_tightbbox(self.fig.canvas.get_renderer()).padded(PAD_INCHES)
+
+    def _labels_fit(self):
+        """True si las etiquetas de los ejes con los datos actuales caben en el recorte guardado.
+
+        Título y leyenda no cambian de un archivo a otro, pero las marcas de los ejes se ajustan a los datos:
+        un archivo con valores negativos o más grandes puede necesitar etiquetas más anchas.
+        """
+        renderer = self.fig.canvas.get_renderer()
+        to_inches = self.fig.dpi_scale_trans.inverted()
+        x0, y0, x1, y1 = self.bbox.extents
+        for ax in self.fig.axes:
+            for axis in (ax.xaxis, ax.yaxis):
+                extent = axis.get_tightbbox(renderer)
+                if extent is None:
+                    continue
+                a0, b0, a1, b1 = extent.transformed(to_inches).extents
+                if a0 < x0 or b0 < y0 or a1 > x1 or b1 > y1:
+                    return False
+        return True
+
+    def render(self, x, columns, output_path, dpi=None):
+        """Sustituye los datos de cada línea por columns[señal] frente a x y guarda la figura."""
+        return self.render_series({signal: (x, columns[signal]) for signal in self.lines}, output_path, dpi)
+
+    def render_series(self, series, output_path, dpi=None):
+        """Como render(), pero con un eje x propio para cada señal: series[señal] = (x, y)."""
+        for signal, line in self.lines.items():
+            update_line(line, *series[signal])
+        for ax in self.fig.axes:
+            ax.relim()
+            ax.autoscale_view()
+
+        with stage("render"):
+            if not self.fixed_layout:
+                self.fig.savefig(output_path, dpi=dpi, bbox_inches="tight")
+                return output_path
+            # El recorte se mide con el primer archivo y solo se vuelve a medir si las etiquetas no caben; se
+            # amplía (nunca se reduce) para que las imágenes de un mismo gráfico sigan teniendo el mismo tamaño
+            if self.bbox is None:
+                self.bbox = self._layout_bbox()
+            elif not self._labels_fit():
+                self.bbox = Bbox.union([self.bbox, self._layout_bbox()])
+            self.fig.savefig(output_path, dpi=dpi, bbox_inches=self.bbox)
+        return output_path
+
+
+def clear_templates():
+    """Descarta las plantillas construidas en este hilo."""
+    _local.__dict__.pop("templates", None)
+
+
+def get_template(key, build):
+    """Plantilla para la clave: reutilizada si la reutilización está activa, nueva (y con recorte ajustado) si no."""
+    if not figure_reuse_enabled():
+        return build(fixed_layout=False)
+    templates = _local.__dict__.setdefault("templates", {})
+    if key not in templates:
+        templates[key] = build(fixed_layout=True)
+    return templates[key]
@@ -0,0 +1,98 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Percentiles que se calculan por defecto
+PERCENTILES = (5, 50, 95)
+
+# Segundos por hora: con el tiempo en s, la integral de A da Ah y la de W da Wh
+SECONDS_PER_HOUR = 3600.0
+
+
+def trapezoid_weights(time):
+    """Peso de cada muestra en la regla del trapecio, para integrar todos los canales con un solo producto."""
+    time = np.asarray(time, dtype=float)
+    dt = np.diff(time)
+    dt[np.isnan(dt)] = 0.0
+    weights = np.zeros(len(time))
+    weights[1:] += dt / 2
+    weights[:-1] += dt / 2
+    return weights
+
+
+def channel_stats(block, columns, time=None, percentiles=PERCENTILES, time_scale=SECONDS_PER_HOUR):
+    """Estadísticos de todos los canales de un bloque 2-D (muestras x canales) en una pasada vectorizada.
+
+    Devuelve {canal: {count, nan, min, max, mean, std, rms, p<q>..., integral}}. La integral
+    (regla del trapecio frente a time, dividida por time_scale) solo se calcula si se pasa time;
+    las muestras NaN no aportan área.
+    """
+    block = np.asarray(block, dtype=float)
+    if block.ndim == 1:
+        block = block[:, None]
+    # Un canal por fila contigua: las reducciones recorren la memoria en orden
+    return _row_stats(np.ascontiguousarray(block.T), list(columns), time, percentiles, time_scale)
+
+
+def frame_stats(df, columns, time_column=None, **kwargs):
+    """channel_stats() sobre columnas de un DataFrame (o de un diccionario de arrays)."""
+    rows = np.vstack([np.asarray(df[col], dtype=float) for col in columns]) if columns else np.empty((0, 0))
+    time = None if time_column is None else np.asarray(df[time_column], dtype=float)
+    return _row_stats(rows, list(columns), time, kwargs.get("percentiles", PERCENTILES),
+                      kwargs.get("time_scale", SECONDS_PER_HOUR))
+
+
+def _row_stats(rows, columns, time, percentiles, time_scale):
+    n_channels, n = rows.shape
+    nan = np.isnan(rows)
+    has_nan = bool(nan.any())
+    count = n - nan.sum(axis=1) if has_nan else np.full(n_channels, n)
+
+    # fmin/fmax ignoran los NaN sin copiar el bloque; un canal sin datos queda en NaN
+    if n:
+        lo = np.fmin.reduce(rows, axis=1)
+        hi = np.fmax.reduce(rows, axis=1)
+    else:
+        lo = hi = np.full(n_channels, np.nan)
+
+    # Sumas desplazadas por el mínimo: varianza estable aunque la media sea grande (p. ej. 230 V)
+    shift = np.nan_to_num(lo)[:, None]
+    centered = rows - shift
+    if has_nan:
+        np.copyto(centered, 0.0, where=nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s1 = centered.sum(axis=1) / count
+        s2 = np.einsum("ij,ij->i", centered, centered) / count
+        mean = shift[:, 0] + s1
+        var = np.maximum(s2 - s1 ** 2, 0.0)
+        std = np.sqrt(var)
+        rms = np.sqrt(var + mean ** 2)
+
+    result = {"count": count, "nan": n - count, "min": lo, "max": hi, "mean": mean, "std": std, "rms": rms}
+    if percentiles:
+        if not n:
+            values = np.full((len(percentiles), n_channels), np.nan)
+        elif has_nan:
+            with warnings.catch_warnings():
+                # Un canal sin ninguna muestra válida da NaN, igual que el resto de estadísticos
+                warnings.simplefilter("ignore", RuntimeWarning)
+                values = np.nanpercentile(rows, percentiles, axis=1)
+        else:
+            values = np.percentile(rows, percentiles, axis=1)
+        for q, row in zip(percentiles, np.atleast_2d(values)):
+            result[f"p{q:g}"] = row
+    if time is not None:
+        # Integral de (x - shift) más shift por el tiempo cubierto por muestras válidas
+        weights = trapezoid_weights(time)
+        covered = weights.sum() - (nan @ weights if has_nan else 0.0)
+        result["integral"] = (centered @ weights + shift[:, 0] * covered) / time_scale
+
+    return {col: {name: int(values[j]) if name in ("count", "nan") else float(values[j])
+                  for name, values in result.items()}
+            for j, col in enumerate(columns)}
+
+
+def stats_table(stats):
+    """Tabla con un canal por fila, en el mismo formato que la hoja Summary de V2L_Summary."""
+    return pd.DataFrame(stats).T.rename_axis("Channel").reset_index()
@@ -0,0 +1,287 @@
+"""Base de datos local (SQLite) con los estadísticos de todos los ensayos procesados.
+
+Cada pipeline anota los estadísticos que ya calcula (por archivo, hoja o ventana) como filas
+(canal, métrica, valor) de una ejecución; la ejecución lleva el vehículo, el ensayo y la fecha, con un
+índice sobre los tres. Así una pregunta como "corriente máxima del DCDC en todos los ensayos del Kona por
+encima de 2 kW" es una consulta de milisegundos sobre la base, sin volver a leer los archivos originales:
+
+    python v2l.py query --vehicle Kona --channel Corriente --metric max --filter "Potencia.mean>2000" --agg max
+
+Volver a procesar un archivo sustituye sus filas. La ruta de la base y el vehículo se pasan por variables
+de entorno, de modo que también los procesos del pool escriben en la misma base (WAL y busy_timeout para
+las escrituras concurrentes).
+"""
+import argparse
+import math
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import date, datetime
+
+from V2L_Cache import cache_dir
+
+# Configuración por variables de entorno, para que la hereden también los procesos hijos
+ENV_DB = "V2L_STATS_DB"
+ENV_VEHICLE = "V2L_VEHICLE"
+DB_NAME = "estadisticas.sqlite"
+# Espera máxima (ms) cuando otro proceso está escribiendo
+BUSY_TIMEOUT_MS = 30000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    source TEXT NOT NULL,
+    item TEXT NOT NULL DEFAULT '',
+    vehicle TEXT,
+    test TEXT,
+    date TEXT,
+    loaded TEXT NOT NULL,
+    UNIQUE (pipeline, source, item)
+);
+CREATE INDEX IF NOT EXISTS runs_vehicle_test_date ON runs (vehicle, test, date);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    channel TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, channel, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metrics_channel_metric_value ON metrics (channel, metric, value);
+"""
+
+# Fecha del ensayo en el nombre del archivo: 2024-10-31, 2024_10_31 o 20241031
+_DATE_RE = re.compile(r"(?<!\d)(20\d{2})[-_.]?(0[1-9]|1[0-2])[-_.]?(0[1-9]|[12]\d|3[01])(?!\d)")
+# Filtro de la consulta: Canal.métrica<op>valor
+_FILTER_RE = re.compile(r"^\s*(.+)\.([^.<>=!]+?)\s*(<=|>=|!=|=|<|>)\s*(\S+)\s*$")
+AGGREGATES = {"max": "MAX", "min": "MIN", "mean": "AVG", "count": "COUNT"}
+
+
+def default_path():
+    return os.path.join(cache_dir(), DB_NAME)
+
+
+def configure(path=None, vehicle=None, enabled=None):
+    """Ajusta la base en la que se anotan los estadísticos y el vehículo de los ensayos."""
+    if path is not None:
+        os.environ[ENV_DB] = str(path)
+    if vehicle is not None:
+        os.environ[ENV_VEHICLE] = vehicle
+    if enabled is False:
+        os.environ.pop(ENV_DB, None)
+
+
+def db_path():
+    """Ruta de la base configurada, o None si no se anotan los estadísticos."""
+    return os.environ.get(ENV_DB) or None
+
+
+def connect(path=None):
+    path = path or db_path() or default_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def test_date(path):
+    """Fecha del ensayo (AAAA-MM-DD): la del nombre del archivo o, si no tiene, la de su última modificación."""
+    match = _DATE_RE.search(os.path.basename(path))
+    if match:
+        try:
+            return date(*map(int, match.groups())).isoformat()
+        except ValueError:
+            pass
+    try:
+        return date.fromtimestamp(os.path.getmtime(path)).isoformat()
+    except OSError:
+        return None
+
+
+def _value(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def metric_rows(stats):
+    """(canal, métrica, valor) de un diccionario {canal: {métrica: valor}}; se omiten los valores no numéricos."""
+    for channel, metrics in stats.items():
+        for metric, value in metrics.items():
+            if isinstance(value, (str, bytes)) or value is None:
+                continue
+            yield str(channel), str(metric), _value(value)
+
+
+def store(conn, pipeline, source, stats, item="", vehicle=None, test=None, when=None):
+    """Sustituye la ejecución (pipeline, source, item) por los estadísticos dados; devuelve su id."""
+    source = os.path.abspath(source)
+    test = test if test is not None else os.path.splitext(os.path.basename(source))[0]
+    when = when if when is not None else test_date(source)
+    if vehicle is None:
+        # Reprocesar sin indicar el vehículo conserva el que ya tenía la ejecución
+        previous = conn.execute("SELECT vehicle FROM runs WHERE pipeline = ? AND source = ? AND item = ?",
+                                (pipeline, source, item)).fetchone()
+        vehicle = previous[0] if previous else None
+    conn.execute("DELETE FROM runs WHERE pipeline = ? AND source = ? AND item = ?", (pipeline, source, item))
+    run_id = conn.execute(
+        "INSERT INTO runs (pipeline, source, item, vehicle, test, date, loaded) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (pipeline, source, item, vehicle, test, when, datetime.now().isoformat(timespec="seconds"))).lastrowid
+    conn.executemany("INSERT OR REPLACE INTO metrics (run_id, channel, metric, value) VALUES (?, ?, ?, ?)",
+                     [(run_id, *row) for row in metric_rows(stats)])
+    return run_id
+
+
+def record(pipeline, source, stats, item="", vehicle=None, **kwargs):
+    """Anota los estadísticos de un archivo (o de una hoja/ventana con item) si hay una base configurada.
+
+    stats tiene la forma de V2L_Stats.frame_stats: {canal: {métrica: valor}}. Cada llamada es una
+    transacción; un error de la base se avisa sin interrumpir el procesado.
+    """
+    return record_many(pipeline, source, [(item, stats)], vehicle=vehicle, **kwargs)
+
+
+def record_many(pipeline, source, entries, vehicle=None, **kwargs):
+    """Como record() para varias hojas o ventanas [(item, stats)] de un mismo archivo, en una sola transacción."""
+    path = db_path()
+    if path is None:
+        return 0
+    vehicle = vehicle if vehicle is not None else os.environ.get(ENV_VEHICLE) or None
+    try:
+        with closing(connect(path)) as conn, conn:
+            for item, stats in entries:
+                store(conn, pipeline, source, stats, item=item, vehicle=vehicle, **kwargs)
+    except sqlite3.Error as exc:
+        print(f"No se han podido guardar los estadísticos de {os.path.basename(source)} en {path}: {exc}")
+        return 0
+    return len(entries)
+
+
+def parse_filter(text):
+    """Convierte "Potencia.mean>2000" en ("Potencia", "mean", ">", 2000.0)."""
+    match = _FILTER_RE.match(text)
+    if not match:
+        raise ValueError(f"Filtro no válido {text!r}: se espera Canal.métrica<op>valor, p. ej. Potencia.mean>2000")
+    channel, metric, op, value = match.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"Filtro no válido {text!r}: {value!r} no es un número")
+    return channel.strip(), metric.strip(), op, value
+
+
+def build_query(channel, metric, vehicle=None, test=None, pipeline=None, since=None, until=None, filters=(),
+                agg=None, limit=None):
+    """SQL y parámetros de la consulta de un canal y una métrica en las ejecuciones que cumplen los filtros."""
+    where = ["m.channel = ?", "m.metric = ?", "m.value IS NOT NULL"]
+    params = [channel, metric]
+    # LIKE: sin distinguir mayúsculas y con % como comodín
+    for column, value in (("r.vehicle", vehicle), ("r.test", test), ("r.pipeline", pipeline)):
+        if value is not None:
+            where.append(f"{column} LIKE ?")
+            params.append(value)
+    if since is not None:
+        where.append("r.date >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("r.date <= ?")
+        params.append(until)
+    # Cada filtro es otra métrica de la misma ejecución: búsqueda por la clave primaria de metrics
+    for f_channel, f_metric, op, value in filters:
+        where.append(f"EXISTS (SELECT 1 FROM metrics f WHERE f.run_id = r.id AND f.channel = ? "
+                     f"AND f.metric = ? AND f.value {op} ?)")
+        params += [f_channel, f_metric, value]
+
+    condition = " AND ".join(where)
+    if agg is not None:
+        sql = (f"SELECT {AGGREGATES[agg]}(m.value), COUNT(*) FROM metrics m JOIN runs r ON r.id = m.run_id "
+               f"WHERE {condition}")
+        return sql, params
+    sql = (f"SELECT m.value, r.vehicle, r.test, r.item, r.date, r.pipeline, r.source FROM metrics m "
+           f"JOIN runs r ON r.id = m.run_id WHERE {condition} ORDER BY m.value DESC")
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+def query(conn, channel, metric, **kwargs):
+    """Filas (valor, vehículo, ensayo, item, fecha, pipeline, origen), o (agregado, n) con agg."""
+    sql, params = build_query(channel, metric, **kwargs)
+    rows = conn.execute(sql, params).fetchall()
+    return rows[0] if kwargs.get("agg") else rows
+
+
+def catalog(conn):
+    """(canal, métrica, ejecuciones) de todo lo anotado en la base."""
+    return conn.execute("SELECT channel, metric, COUNT(*) FROM metrics GROUP BY channel, metric "
+                        "ORDER BY channel, metric").fetchall()
+
+
+def _print_rows(header, rows):
+    rows = [["" if v is None else (f"{v:.6g}" if isinstance(v, float) else str(v)) for v in row] for row in rows]
+    widths = [max(len(h), *(len(r[k]) for r in rows)) if rows else len(h) for k, h in enumerate(header)]
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="v2l query",
+                                     description="Consulta los estadísticos anotados de todos los ensayos procesados.")
+    parser.add_argument("--db", help=f"Base de estadísticos (por defecto {DB_NAME} en la carpeta de la caché)")
+    parser.add_argument("--cache-dir", help="Carpeta de la caché, si la base está en la ubicación por defecto")
+    parser.add_argument("--channel", help="Canal, p. ej. Corriente, ADS1_CH2, AveP1 o potencia")
+    parser.add_argument("--metric", default="max", help="Métrica: max, min, mean, std, rms, integral, p95... (por defecto max)")
+    parser.add_argument("--vehicle", help="Vehículo (sin distinguir mayúsculas; %% como comodín)")
+    parser.add_argument("--test", help="Ensayo: nombre del archivo sin extensión (%% como comodín)")
+    parser.add_argument("--pipeline", help="Subcomando que anotó los datos: etas, etas-dcdc, obd, hioki-hd...")
+    parser.add_argument("--since", help="Fecha mínima del ensayo (AAAA-MM-DD)")
+    parser.add_argument("--until", help="Fecha máxima del ensayo (AAAA-MM-DD)")
+    parser.add_argument("--filter", action="append", default=[], metavar="CANAL.METRICA<OP>VALOR",
+                        help='Condición sobre otra métrica de la misma ejecución, p. ej. "Potencia.mean>2000" (repetible)')
+    parser.add_argument("--agg", choices=sorted(AGGREGATES), help="Devolver solo el agregado de los valores")
+    parser.add_argument("--limit", type=int, default=50, help="Filas mostradas sin --agg (0 = todas)")
+    parser.add_argument("--list", action="store_true", help="Lista los canales y métricas anotados")
+    parser.add_argument("--sql", help="Ejecuta una consulta SQL directamente sobre las tablas runs y metrics")
+    args = parser.parse_args(argv)
+
+    if args.cache_dir:
+        from V2L_Cache import configure as configure_cache
+        configure_cache(cache_dir=args.cache_dir)
+    path = args.db or db_path() or default_path()
+    if not os.path.exists(path):
+        print(f"No existe la base de estadísticos {path}. Se crea al procesar los ensayos.")
+        return 1
+    try:
+        filters = [parse_filter(text) for text in args.filter]
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    with closing(connect(path)) as conn:
+        t0 = time.perf_counter()
+        if args.sql:
+            cursor = conn.execute(args.sql)
+            _print_rows([d[0] for d in cursor.description or []], cursor.fetchall())
+        elif args.list or not args.channel:
+            _print_rows(["canal", "métrica", "ejecuciones"], catalog(conn))
+        elif args.agg:
+            value, n = query(conn, args.channel, args.metric, vehicle=args.vehicle, test=args.test,
+                             pipeline=args.pipeline, since=args.since, until=args.until, filters=filters, agg=args.agg)
+            texto = "sin datos" if value is None else f"{value:.6g}"
+            print(f"{args.agg}({args.channel}.{args.metric}) = {texto} sobre {n} ejecuciones")
+        else:
+            rows = query(conn, args.channel, args.metric, vehicle=args.vehicle, test=args.test,
+                         pipeline=args.pipeline, since=args.since, until=args.until, filters=filters,
+                         limit=args.limit)
+            _print_rows([f"{args.channel}.{args.metric}", "vehículo", "ensayo", "item", "fecha", "pipeline"],
+                        [row[:6] for row in rows])
+        print(f"({(time.perf_counter() - t0) * 1e3:.1f} ms)")
+    return 0
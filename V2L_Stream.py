@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class RunningStats:
+    """Estadísticos de una serie calculados bloque a bloque (mín, máx, media, desviación, RMS)."""
+
+    def __init__(self):
+        self.count = 0
+        self.samples = 0
+        self.nan_count = 0
+        self.min = np.nan
+        self.max = np.nan
+        self.argmin = -1
+        self.argmax = -1
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        offset = self.samples
+        self.samples += len(values)
+        valid = ~np.isnan(values)
+        n = int(valid.sum())
+        self.nan_count += len(values) - n
+        if n == 0:
+            return
+
+        finite = values[valid]
+        lo, hi = finite.argmin(), finite.argmax()
+        if np.isnan(self.min) or finite[lo] < self.min:
+            self.min = float(finite[lo])
+            self.argmin = offset + int(np.flatnonzero(valid)[lo])
+        if np.isnan(self.max) or finite[hi] > self.max:
+            self.max = float(finite[hi])
+            self.argmax = offset + int(np.flatnonzero(valid)[hi])
+
+        # Combinación de media y varianza por bloques (Chan et al.)
+        mean = float(finite.mean())
+        m2 = float(((finite - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self):
+        return np.sqrt(self._m2 / self.count) if self.count else np.nan
+
+    @property
+    def rms(self):
+        return np.sqrt(self._m2 / self.count + self.mean ** 2) if self.count else np.nan
+
+    def as_dict(self):
+        return {
+            "count": self.count, "nan": self.nan_count, "min": self.min, "max": self.max,
+            "argmin": self.argmin, "argmax": self.argmax, "mean": self.mean, "std": self.std, "rms": self.rms,
+        }
+
+
+class StreamingTopK:
+    """Conserva las k filas con mayor y menor valor de la columna clave sin ordenar todo el archivo."""
+
+    def __init__(self, k, key=0):
+        self.k = k
+        self.key = key
+        self._top = None
+        self._bottom = None
+        self._top_idx = np.empty(0, dtype=np.int64)
+        self._bottom_idx = np.empty(0, dtype=np.int64)
+        self.samples = 0
+
+    def update(self, block):
+        """Añade un bloque 2-D (filas x columnas) de muestras consecutivas."""
+        block = np.asarray(block, dtype=float)
+        idx = self.samples + np.arange(len(block), dtype=np.int64)
+        self.samples += len(block)
+        keep = ~np.isnan(block[:, self.key])
+        block, idx = block[keep], idx[keep]
+        if self._top is None:
+            self._top = self._bottom = block[:0]
+
+        self._top, self._top_idx = self._select(np.vstack([self._top, block]), np.concatenate([self._top_idx, idx]), True)
+        self._bottom, self._bottom_idx = self._select(np.vstack([self._bottom, block]), np.concatenate([self._bottom_idx, idx]), False)
+
+    def _select(self, rows, idx, largest):
+        if len(rows) <= self.k:
+            return rows, idx
+        values = rows[:, self.key]
+        part = np.argpartition(-values if largest else values, self.k - 1)[:self.k]
+        return rows[part], idx[part]
+
+    def top(self):
+        """Filas con los mayores valores, en orden descendente, y su índice de muestra."""
+        if self._top is None:
+            return np.empty((0, 0)), self._top_idx
+        order = np.argsort(-self._top[:, self.key], kind="stable")
+        return self._top[order], self._top_idx[order]
+
+    def bottom(self):
+        """Filas con los menores valores, en orden ascendente, y su índice de muestra."""
+        if self._bottom is None:
+            return np.empty((0, 0)), self._bottom_idx
+        order = np.argsort(self._bottom[:, self.key], kind="stable")
+        return self._bottom[order], self._bottom_idx[order]
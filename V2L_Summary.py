@@ -0,0 +1,233 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from V2L_Stream import RunningStats, StreamingTopK
+
+# Cuantiles que se incluyen en la hoja de resumen
+QUANTILES = [0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999]
+
+
+def top_bottom_k(values, k):
+    """Índices de las k mayores (descendente) y k menores (ascendente) muestras, sin ordenar el resto."""
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) <= k:
+        order = valid[np.argsort(values[valid], kind="stable")]
+        return order[::-1], order
+    v = values[valid]
+    top = valid[np.argpartition(-v, k - 1)[:k]]
+    bottom = valid[np.argpartition(v, k - 1)[:k]]
+    top = top[np.argsort(-values[top], kind="stable")]
+    bottom = bottom[np.argsort(values[bottom], kind="stable")]
+    return top, bottom
+
+
+class QuantileSketch:
+    """Cuantiles aproximados en streaming con memoria acotada (compactadores tipo KLL)."""
+
+    def __init__(self, k=4096, seed=0):
+        self.k = k
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+
+    def _compress(self):
+        h = 0
+        while h < len(self._levels):
+            buf = self._levels[h]
+            if len(buf) > self.k:
+                # Cada compactación conserva una de cada dos muestras ordenadas con el doble de peso
+                buf = np.sort(buf)
+                rest, buf = buf[len(buf) - len(buf) % 2:], buf[:len(buf) - len(buf) % 2]
+                promoted = buf[self._rng.integers(2)::2]
+                self._levels[h] = rest
+                if h + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[h + 1] = np.concatenate([self._levels[h + 1], promoted])
+            h += 1
+
+    def quantiles(self, qs):
+        values = np.concatenate(self._levels)
+        if len(values) == 0:
+            return np.full(len(qs), np.nan)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self._levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        ranks = np.asarray(qs) * cumulative[-1]
+        pos = np.minimum(np.searchsorted(cumulative, ranks, side="left"), len(values) - 1)
+        return values[order][pos]
+
+
+class WaveformSummary:
+    """Acumula por bloques estadísticos, cuantiles y muestras extremas de un archivo de forma de onda."""
+
+    def __init__(self, columns, k=1000, key=0):
+        self.columns = list(columns)
+        self.k = k
+        self.key = key
+        self.stats = {col: RunningStats() for col in self.columns}
+        self.sketches = {col: QuantileSketch() for col in self.columns}
+        self.extremes = StreamingTopK(k, key=key)
+
+    def update(self, block):
+        block = np.asarray(block, dtype=float)
+        for j, col in enumerate(self.columns):
+            self.stats[col].update(block[:, j])
+            self.sketches[col].update(block[:, j])
+        self.extremes.update(block)
+
+    def tables(self):
+        top_rows, top_idx = self.extremes.top()
+        bottom_rows, bottom_idx = self.extremes.bottom()
+        quantiles = {col: self.sketches[col].quantiles(QUANTILES) for col in self.columns}
+        return _build_tables(self.columns, {c: s.as_dict() for c, s in self.stats.items()}, quantiles,
+                             top_rows, top_idx, bottom_rows, bottom_idx)
+
+
+def summarize_block(block, columns, k=1000, key=0):
+    """Resumen de un bloque en memoria: cuantiles exactos y top/bottom-K con argpartition."""
+    block = np.asarray(block, dtype=float)
+    stats = {}
+    for j, col in enumerate(columns):
+        s = RunningStats()
+        s.update(block[:, j])
+        stats[col] = s.as_dict()
+    quantiles = {
+        col: np.nanquantile(block[:, j], QUANTILES) if stats[col]["count"] else np.full(len(QUANTILES), np.nan)
+        for j, col in enumerate(columns)
+    }
+    top, bottom = top_bottom_k(block[:, key], k)
+    return _build_tables(columns, stats, quantiles, block[top], top, block[bottom], bottom)
+
+
+def _build_tables(columns, stats, quantiles, top_rows, top_idx, bottom_rows, bottom_idx):
+    summary = pd.DataFrame(stats).T.rename_axis("Channel").reset_index()
+    q = pd.DataFrame(quantiles, index=[f"p{100 * x:g}" for x in QUANTILES]).rename_axis("Quantile").reset_index()
+    top = pd.DataFrame(np.asarray(top_rows).reshape(-1, len(columns)), columns=columns)
+    top.insert(0, "Sample", top_idx)
+    bottom = pd.DataFrame(np.asarray(bottom_rows).reshape(-1, len(columns)), columns=columns)
+    bottom.insert(0, "Sample", bottom_idx)
+    return {"Summary": summary, "Quantiles": q, "Top_K": top, "Bottom_K": bottom}
+
+
+def tables_stats(tables):
+    """{canal: {métrica: valor}} con los estadísticos y los cuantiles de las tablas de resumen."""
+    stats = tables["Summary"].set_index("Channel").to_dict("index")
+    for quantile, row in tables["Quantiles"].set_index("Quantile").iterrows():
+        for col, value in row.items():
+            stats[col][quantile] = value
+    return stats
+
+
+def write_summary_excel(tables, output_file):
+    """Escribe las tablas de resumen, una por hoja, en un libro compacto."""
+    try:
+        with pd.ExcelWriter(output_file, engine="openpyxl") as writer:
+            for sheet_name, table in tables.items():
+                table.to_excel(writer, index=False, sheet_name=sheet_name)
+        print(f"Archivo Excel generado: {output_file}")
+    except PermissionError:
+        print(f"Permission denied: {output_file}. Por favor, cierra el archivo si está abierto y vuelve a intentarlo.")
+
+
+class _SortedWriter:
+    """Escribe filas ordenadas por lotes en CSV o Parquet según la extensión."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self.parquet = path.lower().endswith(".parquet")
+        self._writer = None
+        self._file = None
+
+    def write(self, rows):
+        df = pd.DataFrame(rows, columns=self.columns)
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+                df.to_csv(self._file, index=False)
+            else:
+                df.to_csv(self._file, index=False, header=False)
+
+    def close(self):
+        if self._writer is None and self._file is None:
+            self.write(np.empty((0, len(self.columns))))
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def export_sorted(block, columns, output_path, key=0):
+    """Exporta todas las filas de un bloque en memoria ordenadas de mayor a menor por la columna clave."""
+    block = np.asarray(block, dtype=float)
+    # Igual que sort_values: los NaN al final
+    order = np.argsort(np.where(np.isnan(block[:, key]), np.inf, -block[:, key]), kind="stable")
+    writer = _SortedWriter(output_path, columns)
+    writer.write(block[order])
+    writer.close()
+    print(f"Exportación ordenada completa: {output_path}")
+
+
+def external_sort(chunks, columns, output_path, key=0, block_rows=1_000_000, tmp_dir=None):
+    """Ordena de mayor a menor por la columna clave bloques que no caben juntos en memoria (merge sort externo)."""
+    writer = _SortedWriter(output_path, columns)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        # 1) Cada bloque se ordena y se guarda como un tramo binario
+        runs, nan_runs = [], []
+        for n, block in enumerate(chunks):
+            block = np.asarray(block, dtype=float)
+            nan_rows = np.isnan(block[:, key])
+            if nan_rows.any():
+                nan_path = os.path.join(tmp, f"nan_{n}.npy")
+                np.save(nan_path, block[nan_rows])
+                nan_runs.append(nan_path)
+                block = block[~nan_rows]
+            if len(block):
+                run_path = os.path.join(tmp, f"run_{n}.npy")
+                np.save(run_path, block[np.argsort(-block[:, key], kind="stable")])
+                runs.append(run_path)
+
+        # 2) Mezcla por lotes: se emite todo lo que sea >= que el menor valor visible de cada tramo
+        runs = [np.load(path, mmap_mode="r") for path in runs]
+        pos = [0] * len(runs)
+        windows = {}
+        step = max(1, block_rows // max(1, len(runs)))
+        while True:
+            active = [r for r in range(len(runs)) if pos[r] < len(runs[r])]
+            if not active:
+                break
+            windows = {r: np.asarray(runs[r][pos[r]:pos[r] + step]) for r in active}
+            threshold = max(windows[r][-1, key] for r in active)
+            batch = []
+            for r in active:
+                w = windows[r]
+                taken = int(np.searchsorted(-w[:, key], -threshold, side="right"))
+                batch.append(w[:taken])
+                pos[r] += taken
+            batch = np.concatenate(batch)
+            writer.write(batch[np.argsort(-batch[:, key], kind="stable")])
+
+        for nan_path in nan_runs:
+            writer.write(np.load(nan_path))
+        # Liberar los mapas de memoria antes de borrar la carpeta temporal
+        del runs, windows
+    writer.close()
+    print(f"Exportación ordenada completa: {output_path}")
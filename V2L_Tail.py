@@ -0,0 +1,278 @@
+"""Lectura incremental de los CSV del Hioki HD que siguen creciendo durante un ensayo largo.
+
+GrowingCSVReader recuerda el offset en bytes y la cabecera del archivo y en cada llamada solo convierte las
+filas completas añadidas desde la anterior. HDLiveStats acumula con esas filas los estadísticos
+(RunningStats), la distribución del factor de potencia y la envolvente mín/máx de cada señal
+(StreamingMinMax), así que un informe parcial cuesta O(filas nuevas) y no una relectura del archivo.
+
+El estado se guarda en la carpeta de la caché (V2L_CACHE_DIR/tail), de modo que cada `v2l.py tail --once`
+continúa donde lo dejó el anterior.
+"""
+import hashlib
+import io
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from V2L_Cache import cache_dir, cache_enabled
+from V2L_Decimate import StreamingMinMax
+from V2L_PowerQuality import HD_NUMERIC_COLUMNS, power_factor_series
+from V2L_StatsDB import record
+from V2L_Stream import RunningStats
+from V2L_Summary import QuantileSketch
+
+# Puntos de la envolvente de cada señal en los gráficos parciales
+ENVELOPE_BUCKETS = 2000
+# Intervalo (s) entre informes en modo seguimiento
+INTERVAL_S = 10.0
+# Cambia si cambia el contenido del estado guardado
+STATE_VERSION = 1
+
+HARMONIC_COLUMNS = ['MaxUthd1'] + [f'MaxU1({i})' for i in range(2, 11)]
+
+
+class GrowingCSVReader:
+    """Devuelve en cada read_new() solo las filas completas añadidas al CSV desde la llamada anterior."""
+
+    def __init__(self, path, columns=None):
+        self.path = os.path.abspath(path)
+        self.columns = columns
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.header = None
+        self.header_bytes = b""   # primera línea tal cual, para detectar que el archivo se ha sustituido
+        self.rows = 0
+        self.restarted = False
+
+    def _replaced(self, f, size):
+        if size < self.offset:
+            return True
+        f.seek(0)
+        return f.read(len(self.header_bytes)) != self.header_bytes
+
+    def read_new(self):
+        """DataFrame con las filas nuevas, convertidas a números (vacío si aún no hay ninguna completa).
+
+        Si el archivo se ha truncado o sustituido, se vuelve a leer desde el principio y restarted queda a True.
+        """
+        self.restarted = False
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.header is not None and self._replaced(f, size):
+                print(f"{os.path.basename(self.path)} ha cambiado desde el principio; se vuelve a leer entero")
+                self.reset()
+                self.restarted = True
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        # La última línea puede estar a medio escribir: se deja para la siguiente lectura
+        end = data.rfind(b"\n") + 1
+        data = data[:end]
+        if self.header is None:
+            first = data.find(b"\n") + 1
+            if not first:
+                return pd.DataFrame(columns=self.columns or [])
+            self.header_bytes = data[:first]
+            self.header = list(pd.read_csv(io.BytesIO(self.header_bytes), nrows=0).columns)
+            self.offset = first
+            data = data[first:]
+
+        columns = [c for c in self.columns if c in self.header] if self.columns else self.header
+        if not data.strip():
+            return pd.DataFrame(columns=columns)
+        df = pd.read_csv(io.BytesIO(data), header=None, names=self.header, usecols=columns)
+        df = df.apply(pd.to_numeric, errors="coerce")
+        self.offset += len(data)
+        self.rows += len(df)
+        return df
+
+
+class HDLiveStats:
+    """Estadísticos y envolventes de un CSV HD acumulados bloque a bloque."""
+
+    def __init__(self, columns=HD_NUMERIC_COLUMNS, buckets=ENVELOPE_BUCKETS):
+        self.columns = [c for c in columns if c != "Time"]
+        self.stats = {c: RunningStats() for c in self.columns}
+        self.envelopes = {c: StreamingMinMax(buckets) for c in self.columns}
+        self.time = np.empty(1024)   # tiempo de cada fila, para situar los puntos de la envolvente
+        self.rows = 0
+        self.pf = RunningStats()
+        self.pf_sketch = QuantileSketch()
+        self.angle = RunningStats()
+        self.max_load = None         # (P, S, cos φ, ángulo, fila) en el instante de máxima potencia activa
+
+    def update(self, df):
+        n = len(df)
+        if n == 0:
+            return
+        if self.rows + n > len(self.time):
+            self.time = np.resize(self.time, max(2 * len(self.time), self.rows + n))
+        self.time[self.rows:self.rows + n] = df["Time"].to_numpy(dtype=float) if "Time" in df else \
+            np.arange(self.rows, self.rows + n)
+        for col in self.columns:
+            if col in df:
+                values = df[col].to_numpy(dtype=float)
+                self.stats[col].update(values)
+                self.envelopes[col].update(values)
+
+        if "AveP1" in df and "AveS1" in df:
+            cos_phi, angle = power_factor_series(df)
+            valid = ~np.isnan(cos_phi)
+            self.pf.update(cos_phi)
+            self.pf_sketch.update(cos_phi)
+            self.angle.update(angle)
+            if valid.any():
+                p = df["AveP1"].to_numpy(dtype=float)
+                i = np.flatnonzero(valid)[np.nanargmax(np.where(valid, p, np.nan)[valid])]
+                if self.max_load is None or p[i] > self.max_load[0]:
+                    self.max_load = (float(p[i]), float(df["AveS1"].iloc[i]), float(cos_phi[i]), float(angle[i]),
+                                     self.rows + int(i))
+        self.rows += n
+
+    def series(self, signal):
+        """(tiempo, valor) de la envolvente de la señal."""
+        idx, values = self.envelopes[signal].result()
+        return self.time[idx], values
+
+    def pf_stats(self):
+        """Mismas claves que V2L_PowerQuality.power_factor_stats, con p5/p95 del sketch de cuantiles."""
+        if self.max_load is None:
+            raise ValueError("No hay muestras con AveS1 > 0 para calcular el factor de potencia.")
+        p, s, cos_phi, angle, row = self.max_load
+        p5, p95 = self.pf_sketch.quantiles([0.05, 0.95])
+        stats = {
+            'samples': self.pf.count, 'pf_mean': self.pf.mean, 'pf_p5': float(p5), 'pf_p95': float(p95),
+            'pf_at_max_load': cos_phi, 'angle_at_max_load': angle, 'angle_mean': self.angle.mean,
+            'P_at_max_load': p, 'S_at_max_load': s, 'index_at_max_load': row,
+        }
+        if "AvePF1" in self.stats and self.stats["AvePF1"].count:
+            stats['instrument_pf_mean'] = self.stats["AvePF1"].mean
+        return stats
+
+    def table(self):
+        return pd.DataFrame([{"columna": col, **self.stats[col].as_dict()} for col in self.columns
+                             if self.stats[col].samples])
+
+    def metrics(self):
+        """{canal: {métrica: valor}} para la base de estadísticos, con el factor de potencia como canal "PF"."""
+        metrics = {col: self.stats[col].as_dict() for col in self.columns if self.stats[col].samples}
+        if self.max_load is not None:
+            metrics["PF"] = self.pf_stats()
+        return metrics
+
+    def maxima(self):
+        """Una fila con el máximo de cada columna (lo que plot_fasorial lee de los armónicos)."""
+        return pd.DataFrame([{col: self.stats[col].max for col in self.columns}])
+
+
+class HDTail:
+    """Lector y estadísticos de un CSV HD en curso."""
+
+    def __init__(self, path):
+        self.version = STATE_VERSION
+        self.reader = GrowingCSVReader(path, HD_NUMERIC_COLUMNS)
+        self.live = HDLiveStats()
+
+    @property
+    def path(self):
+        return self.reader.path
+
+    def update(self):
+        """Lee las filas nuevas y actualiza los estadísticos; devuelve cuántas había."""
+        df = self.reader.read_new()
+        if self.reader.restarted:
+            self.live = HDLiveStats()
+        self.live.update(df)
+        return len(df)
+
+
+def state_path(csv_path):
+    key = hashlib.blake2b(os.path.abspath(csv_path).encode("utf-8"), digest_size=10).hexdigest()
+    return os.path.join(cache_dir(), "tail", f"{key}.pkl")
+
+
+def load_state(csv_path):
+    """Estado guardado del archivo, o uno nuevo si no hay (o la caché está desactivada o es de otra versión)."""
+    path = state_path(csv_path)
+    if cache_enabled() and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                tail = pickle.load(f)
+            if getattr(tail, "version", None) == STATE_VERSION:
+                return tail
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError):
+            pass
+    return HDTail(csv_path)
+
+
+def save_state(tail):
+    if not cache_enabled():
+        return
+    path = state_path(tail.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(tail, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def interim_report(tail, output_folder, plots=True):
+    """Tabla de estadísticos y, con plots, gráficos HD y fasorial a partir de lo acumulado; devuelve las rutas."""
+    from V2L_Hioki_SCRIPT_HD import HD_PLOTS, plot_fasorial, plot_series
+
+    live = tail.live
+    folder = os.path.join(output_folder, os.path.splitext(os.path.basename(tail.path))[0])
+    os.makedirs(folder, exist_ok=True)
+    table_path = os.path.join(folder, "Estadisticas_parciales.csv")
+    live.table().to_csv(table_path, index=False)
+    outputs = [table_path]
+    if not plots:
+        return outputs
+
+    for signals, title_prefix, kwargs in HD_PLOTS:
+        series = {signal: live.series(signal) for signal in signals}
+        outputs += plot_series(series, tail.path, signals, output_folder, title_prefix, **kwargs)
+    outputs.append(plot_fasorial(live.maxima(), tail.path, output_folder, 'Fasorial', pf_stats=live.pf_stats()))
+    return outputs
+
+
+def summary_line(tail):
+    stats = tail.live.stats
+    harmonic = max(HARMONIC_COLUMNS[1:], key=lambda c: stats[c].max if stats[c].count else -np.inf)
+    return (f"{tail.live.rows} filas | AveP1 máx {stats['AveP1'].max:.1f} W | "
+            f"AveUrms1 {stats['AveUrms1'].min:.1f}-{stats['AveUrms1'].max:.1f} V | "
+            f"THD máx {stats['MaxUthd1'].max:.2f} % | mayor armónico {harmonic} {stats[harmonic].max:.2f} %")
+
+
+def main(csv_path, output_folder, interval=INTERVAL_S, once=False, plots=True):
+    """Sigue el CSV e informa cada `interval` segundos si hay filas nuevas (con once, un solo informe)."""
+    tail = load_state(csv_path)
+    first = True
+    try:
+        while True:
+            t0 = time.perf_counter()
+            new_rows = tail.update()
+            t1 = time.perf_counter()
+            if new_rows or first:
+                if tail.live.rows:
+                    interim_report(tail, output_folder, plots)
+                    # Mismo pipeline que hioki-hd: el procesado completo del archivo sustituye estas filas
+                    record("hioki-hd", tail.path, tail.live.metrics())
+                    print(f"+{new_rows} filas en {(t1 - t0) * 1e3:.1f} ms, informe en {time.perf_counter() - t1:.2f} s: "
+                          f"{summary_line(tail)}")
+                else:
+                    print(f"{os.path.basename(tail.path)}: aún no hay filas completas")
+                save_state(tail)
+            first = False
+            if once:
+                return 0
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        save_state(tail)
+        print("Seguimiento detenido.")
+    return 0
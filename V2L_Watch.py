@@ -0,0 +1,191 @@
+"""Modo vigilancia: procesa los archivos de una carpeta de ensayos en cuanto terminan de copiarse.
+
+Un sondeo periódico (asyncio) detecta los archivos nuevos o modificados y espera a que su tamaño y su fecha
+dejen de cambiar durante SETTLE_S segundos. Entonces los pone en una cola acotada de la que tiran `workers`
+consumidores, cada uno con un archivo en el pool de procesos (o de hilos) de V2L_Batch. Si se copia una
+campaña entera de golpe, el sondeo se detiene con la cola llena (contrapresión) y el resto de archivos se
+recoge en cuanto hay sitio. Las salidas se anotan en el mismo manifiesto que --incremental, así que al
+arrancar se omiten los archivos ya procesados.
+"""
+import asyncio
+import os
+import time
+from collections import namedtuple
+
+from V2L_Batch import _report, _run_one, create_pool, default_workers
+from V2L_Build import BuildManifest
+
+# Intervalo de sondeo de la carpeta (s)
+POLL_S = 1.0
+# Tiempo (s) que un archivo debe seguir con el mismo tamaño y la misma fecha para darlo por terminado
+SETTLE_S = 2.0
+# Archivos en espera por consumidor; más allá, el sondeo espera a que se libere sitio
+QUEUE_FACTOR = 2
+
+# Cómo procesar un archivo: func(ruta, *args) en el pool; outputs(resultado) -> rutas generadas
+WatchTarget = namedtuple("WatchTarget", ["extensions", "func", "args", "params", "manifest_folder", "outputs"])
+
+
+def _hioki_hd(output_folder):
+    import V2L_Hioki_SCRIPT_HD as script
+    output_folder = output_folder or script.DEFAULT_OUTPUT
+    return WatchTarget((".csv",), script.process_file, (output_folder,), script.build_params(), output_folder,
+                       lambda result: result["outputs"])
+
+
+def _obd(output_folder):
+    import V2L_OBD_DATA_SCRIPT_KONA as script
+    carpeta = os.path.join(output_folder or script.RUTA_SALIDA, "graficos tratados")
+    os.makedirs(carpeta, exist_ok=True)
+    return WatchTarget((".xlsx", ".xls"), script.graficar_archivo, (carpeta,), script.parametros_compilacion(),
+                       carpeta, lambda result: result)
+
+
+# Carpeta de entrada por defecto y constructor del destino de cada tipo de archivo
+PIPELINES = {
+    "hioki-hd": ("V2L_Hioki_SCRIPT_HD", "DEFAULT_INPUT", _hioki_hd),
+    "obd": ("V2L_OBD_DATA_SCRIPT_KONA", "RUTA_ENTRADA", _obd),
+}
+
+
+def _signature(stat):
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _candidates(folder, extensions):
+    """(ruta, firma) de los archivos de la carpeta con alguna de las extensiones, sin temporales de Office."""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith(("~$", ".")) or not name.lower().endswith(extensions):
+                continue
+            try:
+                if entry.is_file():
+                    yield entry.path, _signature(entry.stat())
+            except FileNotFoundError:
+                continue  # borrado mientras se recorría la carpeta
+
+
+def _readable(path):
+    # En Windows el archivo que otro proceso sigue escribiendo puede estar bloqueado aunque no cambie de tamaño
+    try:
+        with open(path, "rb") as f:
+            f.read(1)
+        return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """Vigila una carpeta y procesa cada archivo nuevo o modificado una vez que deja de cambiar."""
+
+    def __init__(self, input_folder, target, workers=1, poll=POLL_S, settle=SETTLE_S, idle_exit=None):
+        self.input_folder = input_folder
+        self.target = target
+        self.workers = default_workers() if workers is None or workers <= 0 else workers
+        self.poll = poll
+        self.settle = settle
+        self.idle_exit = idle_exit
+        self.manifest = BuildManifest(target.manifest_folder)
+        self.seen = {}      # ruta -> (firma, instante en que se vio por primera vez con esa firma)
+        self.done = {}      # ruta -> firma ya procesada (o fallida: no se reintenta hasta que cambie)
+        self.queued = set()
+        self.errors = 0
+        self.last_activity = time.monotonic()
+
+    def _settled(self, now):
+        """Archivos que han dejado de cambiar y no están al día en el manifiesto, en orden de llegada."""
+        present = {}
+        for path, signature in _candidates(self.input_folder, self.target.extensions):
+            present[path] = signature
+            previous = self.seen.get(path)
+            if previous is None or previous[0] != signature:
+                self.seen[path] = (signature, now)
+        # Los archivos borrados o renombrados dejan de vigilarse
+        for path in set(self.seen) - set(present):
+            del self.seen[path]
+
+        ready = []
+        for path, (signature, since) in sorted(self.seen.items(), key=lambda item: item[1][1]):
+            if path in self.queued or self.done.get(path) == signature:
+                continue
+            if signature[0] == 0 or now - since < self.settle or not _readable(path):
+                continue
+            if self.manifest.is_up_to_date(path, self.target.params):
+                self.done[path] = signature
+                continue
+            ready.append((path, signature))
+        return ready
+
+    def _idle(self, now):
+        pending = any(self.done.get(path) != signature for path, (signature, _) in self.seen.items())
+        return not self.queued and not pending and now - self.last_activity >= self.idle_exit
+
+    async def scan(self, queue):
+        """Sondea la carpeta y encola los archivos terminados; con la cola llena espera (contrapresión)."""
+        while True:
+            for path, signature in self._settled(time.monotonic()):
+                self.queued.add(path)
+                await queue.put((path, signature))
+                self.last_activity = time.monotonic()
+            if self.idle_exit is not None and self._idle(time.monotonic()):
+                return
+            await asyncio.sleep(self.poll)
+
+    async def work(self, queue, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            path, signature = await queue.get()
+            try:
+                result = await loop.run_in_executor(pool, _run_one, self.target.func, path, self.target.args)
+                self._finish(path, signature, result)
+            finally:
+                self.queued.discard(path)
+                self.last_activity = time.monotonic()
+                queue.task_done()
+
+    def _finish(self, path, signature, result):
+        _report(result)
+        self.done[path] = signature
+        if result.error is not None:
+            self.errors += 1
+            return
+        try:
+            current = _signature(os.stat(path))
+        except FileNotFoundError:
+            return
+        if current != signature:
+            # El archivo ha vuelto a cambiar mientras se procesaba: se procesará otra vez cuando se asiente
+            return
+        self.manifest.record(path, self.target.params, self.target.outputs(result.result))
+        self.manifest.save()
+        since = self.seen.get(path, (None, time.monotonic()))[1]
+        print(f"  {os.path.basename(path)}: salidas listas {time.monotonic() - since:.1f} s después de detectarlo")
+
+    async def run(self):
+        queue = asyncio.Queue(maxsize=self.workers * QUEUE_FACTOR)
+        with create_pool(self.workers) as pool:
+            consumers = [asyncio.create_task(self.work(queue, pool)) for _ in range(self.workers)]
+            try:
+                await self.scan(queue)
+                await queue.join()
+            finally:
+                for consumer in consumers:
+                    consumer.cancel()
+                await asyncio.gather(*consumers, return_exceptions=True)
+        return self.errors
+
+
+def main(pipeline, input_folder=None, output_folder=None, workers=1, poll=POLL_S, settle=SETTLE_S, idle_exit=None):
+    """Vigila la carpeta de entrada hasta Ctrl+C (o hasta idle_exit segundos sin actividad) y devuelve los errores."""
+    module_name, input_attr, build_target = PIPELINES[pipeline]
+    if input_folder is None:
+        input_folder = getattr(__import__(module_name), input_attr)
+    watcher = FolderWatcher(input_folder, build_target(output_folder), workers=workers, poll=poll, settle=settle,
+                            idle_exit=idle_exit)
+    print(f"Vigilando {input_folder} ({pipeline}, {watcher.workers} workers). Ctrl+C para terminar.")
+    try:
+        return asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        print("Vigilancia detenida.")
+        return watcher.errors
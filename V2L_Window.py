@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# Ventana que se sustituye por el tramo estable detectado automáticamente
+AUTO = "auto"
+
+# Parámetros por defecto de la detección del régimen estacionario
+STEADY_SPAN_S = 10.0      # duración de la ventana móvil (s)
+STEADY_TOLERANCE = 0.05   # variación máxima (máx - mín) relativa a la media de la ventana
+STEADY_MIN_S = 5.0        # duración mínima del tramo estable (s)
+
+
+def parse_window(text):
+    """Convierte "150:175" en (150.0, 175.0); "auto" se deja tal cual."""
+    if text.strip().lower() == AUTO:
+        return AUTO
+    try:
+        start, end = (float(v) for v in text.split(":"))
+    except ValueError:
+        raise ValueError(f"Ventana no válida: {text!r} (formato inicio:fin en segundos, o 'auto')")
+    if end < start:
+        raise ValueError(f"Ventana no válida: {text!r} (el fin es anterior al inicio)")
+    return start, end
+
+
+def window_label(window):
+    return f"{window[0]:g}-{window[1]:g} s"
+
+
+def monotonic_time(time):
+    """Columna de tiempo como array float comprobando una sola vez que es creciente.
+
+    window_slices, select_windows y resolve_windows confían en recibir este array y no vuelven a recorrerlo.
+    """
+    time = np.asarray(time, dtype=float)
+    if len(time) > 1 and np.any(time[1:] < time[:-1]):
+        raise ValueError("La columna de tiempo no es creciente; no se puede seleccionar por búsqueda binaria")
+    return time
+
+
+def window_slice(time, start, end):
+    """slice de las muestras con start <= t <= end, por búsqueda binaria sobre el tiempo creciente."""
+    time = np.asarray(time)
+    return slice(int(np.searchsorted(time, start, side="left")), int(np.searchsorted(time, end, side="right")))
+
+
+def window_slices(time, windows):
+    """Un slice por ventana (inicio, fin); todas las búsquedas se resuelven en dos llamadas a searchsorted.
+
+    time debe venir de monotonic_time().
+    """
+    if not windows:
+        return []
+    bounds = np.asarray(windows, dtype=float).reshape(-1, 2)
+    starts = np.searchsorted(time, bounds[:, 0], side="left")
+    ends = np.searchsorted(time, bounds[:, 1], side="right")
+    return [slice(int(a), int(b)) for a, b in zip(starts, ends)]
+
+
+def steady_state_window(time, power, span_s=STEADY_SPAN_S, tolerance=STEADY_TOLERANCE, min_duration_s=STEADY_MIN_S):
+    """Tramo (inicio, fin) en s más largo en el que la potencia varía menos de tolerance en cualquier
+    ventana móvil de span_s segundos, o None si no hay ningún tramo de al menos min_duration_s."""
+    return _steady_state_window(monotonic_time(time), power, span_s, tolerance, min_duration_s)
+
+
+def _steady_state_window(time, power, span_s=STEADY_SPAN_S, tolerance=STEADY_TOLERANCE, min_duration_s=STEADY_MIN_S):
+    power = np.asarray(power, dtype=float)
+    if len(time) < 2:
+        return None
+
+    # Ventana móvil en muestras a partir del periodo de muestreo típico
+    dt = np.median(np.diff(time))
+    k = max(int(round(span_s / dt)) if dt > 0 else len(time), 2)
+    if k > len(time):
+        return None
+    rolling = pd.Series(power).rolling(k)
+    hi = rolling.max().to_numpy()[k - 1:]
+    lo = rolling.min().to_numpy()[k - 1:]
+    mean = rolling.mean().to_numpy()[k - 1:]
+    # Ventana i (muestras i .. i+k-1) estable si su rango es pequeño frente a su media
+    with np.errstate(invalid="ignore"):
+        stable = (hi - lo) <= tolerance * np.abs(mean)
+    if not stable.any():
+        return None
+
+    # Racha más larga de ventanas estables consecutivas
+    edges = np.diff(np.concatenate(([0], stable.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    best = np.argmax(ends - starts)
+    first, last = starts[best], ends[best] - 1 + k - 1
+    if time[last] - time[first] < min_duration_s:
+        return None
+    return float(time[first]), float(time[last])
+
+
+def resolve_windows(time, power, windows, **steady_kwargs):
+    """Sustituye AUTO por el tramo estable detectado; las ventanas sin resolver se descartan.
+
+    time debe venir de monotonic_time().
+    """
+    resolved = []
+    for window in windows:
+        if window == AUTO:
+            window = _steady_state_window(time, power, **steady_kwargs)
+            if window is None:
+                continue
+        resolved.append(window)
+    return resolved
+
+
+def select_windows(columns, time, windows):
+    """Vistas (sin copia) de cada columna en cada ventana: [(ventana, {columna: array})].
+
+    time debe venir de monotonic_time().
+    """
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    return [(window, {name: values[s] for name, values in arrays.items()})
+            for window, s in zip(windows, window_slices(time, windows))]
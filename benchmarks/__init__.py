@@ -0,0 +1 @@
+"""Benchmarks de rendimiento de los scripts V2L (ejecutar con python -m benchmarks.<nombre>)."""
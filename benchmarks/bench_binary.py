@@ -0,0 +1,72 @@
+"""Recarga de una captura de forma de onda: texto CSV, caché Parquet y binario en memoria mapeada.
+
+    python -m benchmarks.bench_binary --samples 5000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from V2L_Binary import open_binary
+from V2L_Cache import configure, cached_read
+from V2L_Hioki_SCRIPT_WF import WAVEFORM_COLUMNS, convert_waveform, parse_waveform_csv
+from benchmarks.generators import generar_csv_wf
+
+
+def medir(func, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        resultado = func()
+        tiempos.append(time.perf_counter() - t0)
+    return np.median(tiempos), resultado
+
+
+def recorrer(columnas):
+    """Una pasada por todas las muestras (máximo de cada canal), para que la lectura no quede a medias."""
+    return [float(np.max(columnas[col])) for col in WAVEFORM_COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de recarga de una captura WF según el formato intermedio.")
+    parser.add_argument("--samples", type=int, default=5_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(cache_dir=os.path.join(tmp, "cache"), enabled=True)
+        csv_path = os.path.join(tmp, "captura.csv")
+        generar_csv_wf(csv_path, args.samples)
+        print(f"Captura de {args.samples} muestras: CSV de {os.path.getsize(csv_path) / 1024 ** 2:.0f} MB")
+
+        t_csv, df = medir(lambda: parse_waveform_csv(csv_path), args.repeat)
+        referencia = recorrer(df)
+        del df
+        cached_read(csv_path, "bench_wf", parse_waveform_csv)
+        t_parquet, df = medir(lambda: cached_read(csv_path, "bench_wf", parse_waveform_csv), args.repeat)
+        del df
+
+        filas = [("texto CSV (read_csv)", t_csv, os.path.getsize(csv_path))]
+        filas.append(("caché Parquet", t_parquet, None))
+        for dtype in ("float64", "float32"):
+            ruta = os.path.join(tmp, f"captura_{dtype}.v2lb")
+            t0 = time.perf_counter()
+            convert_waveform(csv_path, ruta, dtype)
+            conversion = time.perf_counter() - t0
+            t_abrir, _ = medir(lambda: open_binary(ruta), args.repeat)
+            t_pasada, maximos = medir(lambda: recorrer(open_binary(ruta)), args.repeat)
+            assert np.allclose(maximos, referencia, rtol=1e-6)
+            filas.append((f"binario {dtype}: abrir", t_abrir, os.path.getsize(ruta)))
+            filas.append((f"binario {dtype}: abrir + pasada", t_pasada, None))
+            print(f"Conversión única a {dtype}: {conversion:.2f} s")
+
+        print(f"{'formato':34s} {'recarga':>10s} {'vs CSV':>8s} {'tamaño':>10s}")
+        for nombre, segundos, tamano in filas:
+            texto = f"{tamano / 1024 ** 2:8.0f} MB" if tamano else ""
+            print(f"{nombre:34s} {segundos * 1e3:8.1f} ms {t_csv / segundos:7.0f}x {texto:>10s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import io
+import time
+
+import numpy as np
+
+from V2L_Decimate import decimate, target_buckets
+from V2L_Render import new_figure
+
+
+def generar_senal(n, seed=0):
+    """Onda de 50 Hz con armónicos, ruido y algunos picos aislados de una sola muestra."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / 20_000.0
+    y = 325 * np.sin(2 * np.pi * 50 * t) + 10 * np.sin(2 * np.pi * 250 * t) + rng.standard_normal(n)
+    picos = rng.choice(n, size=5, replace=False)
+    y[picos] += rng.choice([-1, 1], size=5) * 150
+    return t, y
+
+
+def renderizar(t, y, diezmar, dpi):
+    """Dibuja la serie y devuelve (segundos, bytes del PNG, imagen RGBA, extremos dibujados)."""
+    t0 = time.perf_counter()
+    fig = new_figure((6.28, 2.039))
+    ax = fig.add_subplot()
+    x_plot, y_plot = decimate(t, y, target_buckets(ax, dpi)) if diezmar else (t, y)
+    ax.plot(x_plot, y_plot, color="green")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, dpi=dpi, format="png")
+    fig.canvas.draw()
+    imagen = np.asarray(fig.canvas.buffer_rgba()).copy()
+    fig.clear()
+    return time.perf_counter() - t0, buffer.getbuffer().nbytes, imagen, (y_plot.min(), y_plot.max(), len(y_plot))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de renderizado y conservación de picos con diezmado mín/máx.")
+    parser.add_argument("--samples", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'muestras':>10} {'modo':>10} {'puntos':>9} {'tiempo (s)':>11} {'PNG (KB)':>9} {'err. máx':>9} {'err. mín':>9}")
+    for n in args.samples:
+        t, y = generar_senal(n)
+        imagenes = {}
+        for diezmar in (False, True):
+            segundos, tam, imagen, (y_min, y_max, puntos) = renderizar(t, y, diezmar, args.dpi)
+            imagenes[diezmar] = imagen
+            modo = "diezmado" if diezmar else "completo"
+            print(f"{n:>10} {modo:>10} {puntos:>9} {segundos:>11.3f} {tam / 1024:>9.1f} "
+                  f"{abs(y_max - y.max()):>9.2g} {abs(y_min - y.min()):>9.2g}")
+        distintos = np.any(imagenes[True] != imagenes[False], axis=-1).mean() * 100
+        print(f"{'':>10} píxeles distintos entre ambos renderizados: {distintos:.3f} %")
+
+
+if __name__ == "__main__":
+    main()
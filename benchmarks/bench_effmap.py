@@ -0,0 +1,47 @@
+import argparse
+import os
+import tempfile
+import time
+
+from V2L_Cache import configure
+from V2L_EffMap import cargar_ensayos, exportar_mapas
+from benchmarks.generators import generar_libro_obd
+
+# Barrido sintético: cargas (W) x SOC (%) x temperatura ambiente (°C)
+CARGAS = [100, 250, 500, 750, 1000, 1500, 2000, 2500, 3000, 3300]
+SOCS = [20, 50, 80, 90, 100]
+AMBIENTES = [-10, 0, 25, 40]
+
+
+def generar_barrido(carpeta, archivos, filas):
+    """Genera hasta `archivos` libros OBD con carga, SOC y ambiente en el nombre."""
+    combinaciones = [(c, s, a) for a in AMBIENTES for s in SOCS for c in CARGAS][:archivos]
+    for k, (carga, soc, ambiente) in enumerate(combinaciones):
+        generar_libro_obd(os.path.join(carpeta, f"eff {carga}W SOC{soc} {ambiente}C.xlsx"), filas, seed=k)
+    return len(combinaciones)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo del mapa de eficiencia sobre un barrido de ensayos OBD.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entrada = os.path.join(tmp, "in")
+        os.makedirs(entrada)
+        n = generar_barrido(entrada, args.files, args.rows)
+        configure(cache_dir=os.path.join(tmp, "cache"), enabled=True)
+
+        for pasada in ("sin caché", "con caché"):
+            t0 = time.perf_counter()
+            ensayos = cargar_ensayos(entrada, workers=args.workers)
+            t1 = time.perf_counter()
+            exportar_mapas(ensayos, os.path.join(tmp, "out"))
+            t2 = time.perf_counter()
+            print(f"{pasada}: {n} archivos, carga {t1 - t0:.2f} s, mapas {t2 - t1:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
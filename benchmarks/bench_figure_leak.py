@@ -0,0 +1,77 @@
+"""Regresión de fugas de memoria al renderizar: miles de figuras seguidas con la memoria residente estable.
+
+Cada figura se dibuja con la API orientada a objetos de V2L_Render (sin pyplot) y se guarda en PNG.
+Tras el calentamiento (fuentes, cachés de matplotlib...) la memoria residente no debe crecer más de
+--max-growth-mb; si crece, el script termina con código 1.
+
+    python -m benchmarks.bench_figure_leak --figures 5000
+    python -m benchmarks.bench_figure_leak --figures 5000 --threads 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from V2L_ETAS_DATA_SCRIPT import generate_plot
+from V2L_Profile import current_rss_mb
+from V2L_Render import use_agg
+
+# Fracción inicial de figuras que se descarta como calentamiento
+CALENTAMIENTO = 0.1
+
+
+def dibujar(k, x, y, carpeta):
+    # Un archivo por hilo, sobrescrito en cada figura: solo interesa la memoria, no las imágenes
+    ruta = os.path.join(carpeta, f"{threading.current_thread().name}.png")
+    generate_plot(x=x, y_list=[y, -y], labels=["A", "B"], colors=["blue", "red"], title=f"Figura {k}",
+                  xlabel="Time (s)", ylabel="Valor", save_path=ruta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria residente al renderizar miles de figuras (regresión de fugas).")
+    parser.add_argument("--figures", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=5000, help="Muestras por curva")
+    parser.add_argument("--threads", type=int, default=1, help="Hilos que renderizan a la vez")
+    parser.add_argument("--max-growth-mb", type=float, default=25.0,
+                        help="Crecimiento máximo admitido de la memoria residente tras el calentamiento")
+    args = parser.parse_args()
+    use_agg()
+
+    if current_rss_mb() is None:
+        print("La memoria residente solo se puede medir en Linux (/proc/self/status).")
+        return 0
+
+    rng = np.random.default_rng(0)
+    x = np.arange(args.points) * 0.01
+    y = np.cumsum(rng.standard_normal(args.points))
+    puntos_control = max(1, args.figures // 20)
+    calentamiento = int(args.figures * CALENTAMIENTO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        muestras = []
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix="render") as pool:
+            for inicio in range(0, args.figures, puntos_control):
+                fin = min(inicio + puntos_control, args.figures)
+                list(pool.map(lambda k: dibujar(k, x, y, tmp), range(inicio, fin)))
+                muestras.append((fin, current_rss_mb()))
+                print(f"{fin:>6} figuras: {muestras[-1][1]:7.1f} MB")
+        segundos = time.perf_counter() - t0
+
+    base = next(rss for n, rss in muestras if n >= calentamiento)
+    crecimiento = muestras[-1][1] - base
+    print(f"{args.figures} figuras en {segundos:.1f} s ({args.figures / segundos:.0f} figuras/s, {args.threads} hilos)")
+    print(f"Memoria tras el calentamiento: {base:.1f} MB -> {muestras[-1][1]:.1f} MB ({crecimiento:+.1f} MB)")
+    if crecimiento > args.max_growth_mb:
+        print(f"FUGA: la memoria ha crecido más de {args.max_growth_mb:g} MB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import argparse
+import time
+
+import numpy as np
+
+from V2L_Harmonics import analyze_waveform, analyze_chunks
+from benchmarks.generators import senal_wf
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento y exactitud del análisis armónico vectorizado.")
+    parser.add_argument("--samples", type=int, nargs="+", default=[1_000_000, 5_000_000, 20_000_000])
+    parser.add_argument("--fs", type=float, default=20_000)
+    args = parser.parse_args()
+
+    thd_teorico = np.sqrt(0.03 ** 2 + 0.02 ** 2 + 0.01 ** 2) * 100
+    print(f"{'muestras':>10} {'ventanas':>9} {'una pasada (s)':>15} {'por bloques (s)':>16} {'Msamples/s':>11} "
+          f"{'err. THD (%)':>13} {'err. fase (º)':>14}")
+    for n in args.samples:
+        v, i = senal_wf(n, args.fs)
+
+        t0 = time.perf_counter()
+        result = analyze_waveform(v, i, args.fs)
+        t_pass = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        analyze_chunks((np.c_[v[k:k + 1_000_000], i[k:k + 1_000_000]] for k in range(0, n, 1_000_000)), args.fs)
+        t_chunks = time.perf_counter() - t0
+
+        err_thd = np.max(np.abs(result["U_thd"] - thd_teorico))
+        err_fase = np.max(np.abs(result["phase_deg"] - 25))
+        print(f"{n:>10} {len(result['U_rms']):>9} {t_pass:>15.3f} {t_chunks:>16.3f} {n / t_pass / 1e6:>11.1f} "
+              f"{err_thd:>13.4f} {err_fase:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Lectura de un CSV HD del Hioki: lectura completa (versión anterior) frente al esquema de columnas float32.
+
+    python -m benchmarks.bench_hd_load --hours 24 --extra-columns 150
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from V2L_Hioki_SCRIPT_HD import CSV_ENGINE, load_hd_csv
+from V2L_PowerQuality import HD_NUMERIC_COLUMNS
+from benchmarks.generators import generar_csv_hd
+
+
+def lectura_completa(ruta):
+    """La lectura de antes: todas las columnas del instrumento y conversión a números después."""
+    df = pd.read_csv(ruta)
+    columns = [col for col in HD_NUMERIC_COLUMNS if col in df.columns]
+    df[columns] = df[columns].apply(pd.to_numeric, errors='coerce')
+    return df
+
+
+def medir(func, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = func()
+        tiempos.append(time.perf_counter() - t0)
+    return np.median(tiempos), df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo y memoria de la lectura de un CSV HD del Hioki.")
+    parser.add_argument("--hours", type=float, default=24.0, help="Duración del registro (una fila por segundo)")
+    parser.add_argument("--extra-columns", type=int, default=150, help="Columnas del instrumento que no se usan")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "hd.csv")
+        generar_csv_hd(ruta, int(args.hours * 3600), columnas_extra=args.extra_columns)
+        columnas = len(pd.read_csv(ruta, nrows=0).columns)
+        print(f"CSV HD de {args.hours:g} h: {os.path.getsize(ruta) / 1024 ** 2:.0f} MB, {columnas} columnas "
+              f"({len(HD_NUMERIC_COLUMNS)} usadas)")
+
+        t_base, base = medir(lambda: lectura_completa(ruta), args.repeat)
+        mem_base = base.memory_usage(deep=True).sum()
+        filas = [("completa (read_csv + to_numeric)", t_base, mem_base)]
+        motores = ["c"] + (["pyarrow"] if CSV_ENGINE == "pyarrow" else [])
+        for motor in motores:
+            t, df = medir(lambda: load_hd_csv(ruta, engine=motor), args.repeat)
+            error = np.nanmax(np.abs(df.to_numpy(dtype=float) - base[df.columns].to_numpy(dtype=float)) /
+                              np.maximum(np.abs(base[df.columns].to_numpy(dtype=float)), 1e-12))
+            filas.append((f"esquema float32 ({motor})", t, df.memory_usage(deep=True).sum()))
+            print(f"  {motor}: error relativo máximo frente a float64 {error:.1e}")
+
+        print(f"{'lectura':34s} {'tiempo':>10s} {'vs antes':>9s} {'memoria':>10s} {'vs antes':>9s}")
+        for nombre, segundos, memoria in filas:
+            print(f"{nombre:34s} {segundos * 1e3:8.0f} ms {t_base / segundos:8.1f}x "
+                  f"{memoria / 1024 ** 2:7.1f} MB {mem_base / memoria:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
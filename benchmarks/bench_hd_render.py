@@ -0,0 +1,52 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from V2L_Hioki_SCRIPT_HD import HD_PLOTS, load_hd_csv, plot_and_save
+from V2L_Render import clear_templates, set_figure_reuse, use_agg
+from benchmarks.generators import generar_csv_hd
+
+
+def renderizar_lote(dfs, carpeta, reutilizar):
+    """Dibuja los gráficos de señales de todos los archivos y devuelve el tiempo por archivo."""
+    set_figure_reuse(reutilizar)
+    clear_templates()
+    tiempos = []
+    for ruta, df in dfs:
+        t0 = time.perf_counter()
+        for signals, title_prefix, kwargs in HD_PLOTS:
+            plot_and_save(df, ruta, signals, carpeta, title_prefix, **kwargs)
+        tiempos.append(time.perf_counter() - t0)
+    return np.array(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de renderizado por archivo HD con y sin reutilización de figuras.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+    use_agg()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dfs = []
+        for i in range(args.files):
+            ruta = os.path.join(tmp, f"hd_{i:04d}.csv")
+            generar_csv_hd(ruta, args.rows, seed=i)
+            dfs.append((ruta, load_hd_csv(ruta)))
+
+        print(f"{'modo':>14} {'media (ms)':>11} {'mediana (ms)':>13} {'primero (ms)':>13} {'total (s)':>10}")
+        resultados = {}
+        for reutilizar in (False, True):
+            tiempos = renderizar_lote(dfs, os.path.join(tmp, "out"), reutilizar)
+            resultados[reutilizar] = tiempos
+            modo = "reutilizada" if reutilizar else "nueva"
+            print(f"{modo:>14} {tiempos.mean() * 1e3:>11.1f} {np.median(tiempos) * 1e3:>13.1f} "
+                  f"{tiempos[0] * 1e3:>13.1f} {tiempos.sum():>10.2f}")
+        print(f"Aceleración por archivo: {resultados[False].mean() / resultados[True].mean():.2f}x")
+
+
+if __name__ == "__main__":
+    main()
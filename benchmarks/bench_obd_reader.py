@@ -0,0 +1,90 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+from openpyxl import load_workbook
+
+from V2L_OBD_Reader import MOTOR_EXCEL, leer_datos_obd, filtrar_filas_completas
+from benchmarks.generators import generar_libro_obd
+
+
+def leer_celda_a_celda(ruta):
+    """Ruta original: una llamada a hoja.cell() por valor y filtrado con listas."""
+    wb = load_workbook(ruta, data_only=True)
+    hoja = wb.active
+    datos = [
+        (
+            hoja.cell(row=i, column=4).value,
+            hoja.cell(row=i, column=14).value,
+            hoja.cell(row=i, column=15).value,
+            hoja.cell(row=i, column=11).value,
+            hoja.cell(row=i, column=12).value
+        )
+        for i in range(15, hoja.max_row + 1)
+    ]
+    datos = [fila for fila in datos if all(x is not None for x in fila)]
+    return [x[0] for x in datos], [x[4] for x in datos]
+
+
+def leer_columnar(ruta, motor=None):
+    """Ruta nueva: lectura de las columnas necesarias y máscara vectorizada."""
+    datos = leer_datos_obd(ruta, motor=motor)
+    datos = filtrar_filas_completas(datos, ["tiempo", "voltaje", "corriente", "soc", "potencia"])
+    return datos["tiempo"], datos["potencia"]
+
+
+def _ejecutar(cola, lector, ruta, kwargs):
+    t0 = time.perf_counter()
+    tiempo, potencia = lector(ruta, **kwargs)
+    transcurrido = time.perf_counter() - t0
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cola.put((transcurrido, pico_kb, len(tiempo), float(np.sum(potencia))))
+
+
+def medir(lector, ruta, **kwargs):
+    """Ejecuta un lector en un proceso aparte para medir tiempo y pico de memoria de forma aislada."""
+    cola = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=_ejecutar, args=(cola, lector, ruta, kwargs))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la lectura celda a celda con el lector columnar OBD.")
+    parser.add_argument("--rows", type=int, default=500_000, help="Número de filas del libro sintético")
+    parser.add_argument("--skip-legacy", action="store_true", help="No medir la ruta original (muy lenta)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "obd_sintetico.xlsx")
+        t0 = time.perf_counter()
+        generar_libro_obd(ruta, args.rows)
+        print(f"Libro sintético de {args.rows} filas generado en {time.perf_counter() - t0:.1f} s")
+
+        casos = [("Columnar (openpyxl read_only)", leer_columnar, {"motor": "openpyxl"})]
+        if MOTOR_EXCEL == "calamine":
+            casos.append(("Columnar (calamine)", leer_columnar, {"motor": "calamine"}))
+        if not args.skip_legacy:
+            casos.append(("Celda a celda (original)", leer_celda_a_celda, {}))
+
+        resultados = {}
+        for nombre, lector, kwargs in casos:
+            transcurrido, pico_kb, filas, suma = medir(lector, ruta, **kwargs)
+            resultados[nombre] = (transcurrido, suma)
+            print(f"{nombre:32s} {transcurrido:8.2f} s  pico RSS {pico_kb / 1024:8.1f} MB  ({filas} filas válidas)")
+
+        if "Celda a celda (original)" in resultados:
+            t_viejo, suma_vieja = resultados["Celda a celda (original)"]
+            for nombre, (transcurrido, suma) in resultados.items():
+                assert np.isclose(suma, suma_vieja), nombre
+                print(f"Aceleración {nombre}: x{t_viejo / transcurrido:.1f}")
+
+
+if __name__ == "__main__":
+    main()
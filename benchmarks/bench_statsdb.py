@@ -0,0 +1,65 @@
+"""Base de estadísticos: carga masiva de ejecuciones sintéticas y tiempo de las consultas típicas.
+
+    python -m benchmarks.bench_statsdb --runs 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import closing
+
+import numpy as np
+
+from V2L_StatsDB import connect, query, store
+
+VEHICULOS = ["Kona", "Leaf", "Ariya", "Niro", "Ioniq"]
+CANALES = ["Corriente", "Voltaje", "Potencia", "ADS1_CH1", "ADS1_CH2", "ADS1_CH3"]
+METRICAS = ["count", "nan", "min", "max", "mean", "std", "rms", "integral", "p5", "p50", "p95"]
+
+
+def estadisticos(rng):
+    """{canal: {métrica: valor}} con la forma de frame_stats y valores aleatorios."""
+    return {canal: dict(zip(METRICAS, rng.uniform(0, 4000, len(METRICAS)))) for canal in CANALES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga masiva y consultas sobre la base de estadísticos.")
+    parser.add_argument("--runs", type=int, default=5000, help="Ejecuciones (archivos u hojas) anotadas")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "estadisticas.sqlite")
+        with closing(connect(ruta)) as conn:
+            t0 = time.perf_counter()
+            with conn:
+                for k in range(args.runs):
+                    store(conn, "etas-dcdc", os.path.join(tmp, f"ensayo_{k:05d}.xlsx"), estadisticos(rng),
+                          item="150-175 s", vehicle=VEHICULOS[k % len(VEHICULOS)], when=f"2024-{k % 12 + 1:02d}-01")
+            carga = time.perf_counter() - t0
+            filas = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+            consultas = {
+                "máx. Corriente del Kona con Potencia media > 2 kW": dict(
+                    channel="Corriente", metric="max", vehicle="Kona", filters=[("Potencia", "mean", ">", 2000.0)],
+                    agg="max"),
+                "máx. Corriente de todos los vehículos": dict(channel="Corriente", metric="max", agg="max"),
+                "10 mayores ADS1_CH2.max en 2024-06": dict(
+                    channel="ADS1_CH2", metric="max", since="2024-06-01", until="2024-06-30", limit=10),
+            }
+            print(f"{args.runs} ejecuciones ({filas} métricas) anotadas en {carga:.2f} s "
+                  f"({filas / carga:,.0f} métricas/s)")
+            print(f"Archivo: {os.path.getsize(ruta) / 1024 ** 2:.1f} MB")
+            for nombre, kwargs in consultas.items():
+                tiempos = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    resultado = query(conn, **kwargs)
+                    tiempos.append(time.perf_counter() - t0)
+                print(f"  {nombre}: {np.median(tiempos) * 1e3:.2f} ms (mediana), "
+                      f"{resultado[1] if kwargs.get('agg') else len(resultado)} filas")
+
+
+if __name__ == "__main__":
+    main()
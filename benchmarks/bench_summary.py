@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from V2L_Summary import WaveformSummary, summarize_block, write_summary_excel
+from benchmarks.generators import senal_wf
+
+COLUMNS = ["Value1", "Value2"]
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ordenación completa + Excel frente al motor de resumen top-K/cuantiles.")
+    parser.add_argument("--samples", type=int, default=5_000_000)
+    parser.add_argument("--excel-rows", type=int, default=200_000,
+                        help="Filas escritas a Excel en la ruta original (se extrapola al total)")
+    parser.add_argument("--top-k", type=int, default=1000)
+    args = parser.parse_args()
+
+    v, i = senal_wf(args.samples)
+    df = pd.DataFrame({"Value1": v, "Value2": i})
+    with tempfile.TemporaryDirectory() as tmp:
+        # Ruta original: ordenación completa y volcado de todas las filas a Excel
+        t0 = time.perf_counter()
+        df_sorted = df[COLUMNS].sort_values(by=["Value1"], ascending=False)
+        t_sort = time.perf_counter() - t0
+
+        filas = min(args.excel_rows, len(df_sorted))
+        t0 = time.perf_counter()
+        df_sorted.iloc[:filas].to_excel(os.path.join(tmp, "sorted.xlsx"), index=False, sheet_name="Sorted_Data")
+        t_excel = (time.perf_counter() - t0) * len(df_sorted) / filas
+        t_original = t_sort + t_excel
+
+        # Motor de resumen en memoria
+        t0 = time.perf_counter()
+        tables = summarize_block(df[COLUMNS].to_numpy(), COLUMNS, k=args.top_k)
+        write_summary_excel(tables, os.path.join(tmp, "summary.xlsx"))
+        t_resumen = time.perf_counter() - t0
+
+        # Motor de resumen por bloques (cuantiles aproximados)
+        t0 = time.perf_counter()
+        summary = WaveformSummary(COLUMNS, k=args.top_k)
+        for block in np.array_split(df[COLUMNS].to_numpy(), max(1, args.samples // 1_000_000)):
+            summary.update(block)
+        aproximados = summary.tables()["Quantiles"]["Value1"].to_numpy()
+        t_stream = time.perf_counter() - t0
+        exactos = tables["Quantiles"]["Value1"].to_numpy()
+
+    print(f"Muestras: {args.samples}")
+    print(f"Original: ordenación {t_sort:.2f} s + Excel {t_excel:.2f} s (extrapolado de {filas} filas) = {t_original:.2f} s")
+    if args.samples > EXCEL_MAX_ROWS:
+        print(f"  (en la práctica falla: Excel admite como máximo {EXCEL_MAX_ROWS} filas)")
+    print(f"Resumen en memoria:  {t_resumen:.2f} s  -> aceleración x{t_original / t_resumen:.0f}")
+    print(f"Resumen por bloques: {t_stream:.2f} s  -> error máx. de cuantil {np.max(np.abs(aproximados - exactos)):.3f} V")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from V2L_Hioki_SCRIPT_HD import load_hd_csv
+from V2L_PowerQuality import power_factor_stats
+from V2L_Tail import HDTail
+from benchmarks.generators import generar_csv_hd
+
+
+def relectura_completa(ruta):
+    """Lo que cuesta hoy un vistazo intermedio: leer el CSV entero y recalcular los estadísticos."""
+    df = load_hd_csv(ruta)
+    power_factor_stats(df)
+    return df[["AveP1", "AveUrms1", "MaxUthd1"]].agg(["min", "max"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe parcial de un CSV HD que crece: relectura completa frente a lectura incremental.")
+    parser.add_argument("--hours", type=float, default=3.0, help="Duración del registro (una fila por segundo)")
+    parser.add_argument("--append", type=int, default=60, help="Filas añadidas entre dos informes")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    filas = int(args.hours * 3600)
+    with tempfile.TemporaryDirectory() as tmp:
+        completo = os.path.join(tmp, "completo.csv")
+        generar_csv_hd(completo, filas + args.append * args.repeat)
+        with open(completo, "rb") as f:
+            lineas = f.read().splitlines(keepends=True)
+
+        ruta = os.path.join(tmp, "en_curso.csv")
+        with open(ruta, "wb") as f:
+            f.writelines(lineas[:filas + 1])
+        tail = HDTail(ruta)
+        t0 = time.perf_counter()
+        tail.update()
+        primera = time.perf_counter() - t0
+
+        completa, incremental = [], []
+        for k in range(args.repeat):
+            inicio = filas + 1 + k * args.append
+            with open(ruta, "ab") as f:
+                f.writelines(lineas[inicio:inicio + args.append])
+            t0 = time.perf_counter()
+            relectura_completa(ruta)
+            completa.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            tail.update()
+            tail.live.pf_stats()
+            tail.live.table()
+            incremental.append(time.perf_counter() - t0)
+
+        assert tail.live.rows == len(pd.read_csv(ruta))
+        print(f"Registro de {args.hours:g} h ({filas} filas), +{args.append} filas por informe")
+        print(f"  primera lectura incremental: {primera * 1e3:.1f} ms")
+        print(f"  relectura completa:          {np.median(completa) * 1e3:.1f} ms (mediana)")
+        print(f"  lectura incremental:         {np.median(incremental) * 1e3:.1f} ms (mediana)")
+        print(f"  aceleración: {np.median(completa) / np.median(incremental):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
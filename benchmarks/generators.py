@@ -0,0 +1,107 @@
+"""Generadores de datos sintéticos con el formato de cada instrumento (Hioki HD/WF, ETAS y OBD).
+
+Todos reciben el tamaño (filas o muestras) y una semilla, de modo que los benchmarks son reproducibles.
+"""
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from V2L_ETAS_DATA_SCRIPT import ETAS_COLUMNS
+from V2L_OBD_Reader import COLUMNAS_OBD, FILA_INICIO
+
+
+def senal_wf(n, fs=20_000, f0=50.0, seed=0):
+    """Tensión con 3º/5º/7º armónico conocidos y corriente desfasada 25º, como las capturas WF del Hioki."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    w = 2 * np.pi * f0 * t
+    v = 325 * (np.sin(w) + 0.03 * np.sin(3 * w) + 0.02 * np.sin(5 * w) + 0.01 * np.sin(7 * w))
+    i = 14 * np.sin(w - np.radians(25)) + 0.05 * rng.standard_normal(n)
+    return v + 0.5 * rng.standard_normal(n), i
+
+
+def generar_csv_wf(ruta, muestras=200_000, fs=20_000, f0=50.0, seed=0):
+    """CSV de forma de onda del Hioki: dos columnas (tensión, corriente) sin cabecera."""
+    v, i = senal_wf(muestras, fs, f0, seed)
+    np.savetxt(ruta, np.column_stack([v, i]), delimiter=",", fmt="%.4f")
+
+
+def generar_csv_hd(ruta, n=2000, seed=0, columnas_extra=0):
+    """CSV sintético con las columnas del archivo HD del Hioki (una fila por segundo).
+
+    columnas_extra añade armónicos de otras fases y de corriente que los scripts no usan, como en las
+    exportaciones completas del instrumento.
+    """
+    rng = np.random.default_rng(seed)
+    s = 2000 + 100 * rng.standard_normal(n)
+    pf = 0.95 + 0.01 * rng.standard_normal(n)
+    datos = {
+        "Date": ["2024/10/31"] * n,
+        "Time": np.arange(n, dtype=float),
+        "AveUrms1": 230 + rng.standard_normal(n),
+        "AveIrms1": s / 230,
+        "AveP1": s * pf,
+        "AveS1": s,
+        "AveQ1": s * np.sqrt(1 - pf ** 2),
+        "AvePF1": pf,
+        "MaxUthd1": 1 + 0.1 * rng.random(n),
+    }
+    for h in range(2, 11):
+        datos[f"MaxU1({h})"] = 0.5 * rng.random(n)
+    extra = [f"Max{q}{fase}({h})" for q in "UI" for fase in (1, 2, 3) for h in range(2, 51)]
+    for col in [c for c in extra if c not in datos][:columnas_extra]:
+        datos[col] = 0.5 * rng.random(n)
+    pd.DataFrame(datos).to_csv(ruta, index=False)
+
+
+def generar_libro_etas(ruta, filas=30_000, hojas=3, seed=0):
+    """Libro ETAS con varias hojas: dos filas de cabecera del registrador, nombres de canal y seis columnas."""
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    for k in range(hojas):
+        hoja = wb.create_sheet(f"Run{k}")
+        hoja.append(["ETAS INCA"])
+        hoja.append([f"Medida {k}"])
+        hoja.append(ETAS_COLUMNS)
+        tiempo = np.arange(filas) * 0.01
+        bloque = np.column_stack([
+            tiempo,
+            10 + rng.standard_normal(filas),                       # ADS1_CH1: corriente LV
+            5 + rng.standard_normal(filas),                        # ADS1_CH2: corriente DCDC
+            8 + np.sin(tiempo / 5) + 0.2 * rng.standard_normal(filas),  # ADS1_CH3: corriente V2L
+            rng.standard_normal(filas),                            # ADS1_CH4
+            14 + 0.1 * rng.standard_normal(filas),                 # ADS2_CH3: tensión LV
+        ])
+        for fila in bloque.tolist():
+            hoja.append(fila)
+    wb.save(ruta)
+
+
+def generar_libro_obd(ruta, filas, seed=0):
+    """Genera un libro OBD sintético con cabecera de 14 filas y datos desde la fila 15."""
+    rng = np.random.default_rng(seed)
+    tiempo = np.arange(filas, dtype=float) * 0.1
+    columnas = {
+        "tiempo": tiempo,
+        "soc": np.linspace(90, 20, filas),
+        "potencia": -2.0 + 0.1 * rng.standard_normal(filas),
+        "voltaje": np.linspace(400, 340, filas),
+        "corriente": 5.0 + 0.2 * rng.standard_normal(filas),
+        "temperatura": 25 + 10 * np.sin(tiempo / 600),
+    }
+    # Huecos aleatorios como los que deja el registrador OBD
+    huecos = rng.random(filas) < 0.01
+
+    ancho = max(COLUMNAS_OBD.values())
+    wb = Workbook(write_only=True)
+    hoja = wb.create_sheet("OBD")
+    for i in range(1, FILA_INICIO):
+        hoja.append([f"Cabecera {i}"])
+    for i in range(filas):
+        fila = [None] * ancho
+        for nombre, col in COLUMNAS_OBD.items():
+            fila[col - 1] = float(columnas[nombre][i])
+        if huecos[i]:
+            fila[COLUMNAS_OBD["potencia"] - 1] = None
+        hoja.append(fila)
+    wb.save(ruta)
@@ -0,0 +1,275 @@
+"""Suite de benchmarks de los scripts V2L por etapas (lectura, cálculo, gráficos y escritura).
+
+Cada tubería se ejecuta con datos sintéticos a varios tamaños (1x, 10x, 100x) en un proceso aparte,
+para que el pico de memoria (RSS) de una medida no contamine las siguientes. Los resultados se guardan
+en JSON y se pueden comparar entre versiones:
+
+    python -m benchmarks.suite --scales 1 10 --output base.json
+    python -m benchmarks.suite --compare base.json nuevo.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from V2L_Profile import peak_rss_mb
+from benchmarks import generators
+
+# Tamaño de referencia (1x) de cada tubería: filas, muestras o filas por hoja
+TAMANOS_BASE = {
+    "hd": 2_000,
+    "wf": 100_000,
+    "etas": 2_000,
+    "obd": 1_000,
+}
+HOJAS_ETAS = 3
+FS_WF = 20_000
+
+# Variación relativa a partir de la cual --compare marca una regresión
+UMBRAL_REGRESION = 0.10
+# Etapas más cortas que esto (s) se muestran pero no cuentan como regresión: son ruido de medida
+MINIMO_COMPARABLE_S = 0.05
+
+
+@contextmanager
+def etapa(tiempos, nombre):
+    """Acumula en tiempos[nombre] el tiempo de pared del bloque."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + time.perf_counter() - t0
+
+
+def generar_entrada(tuberia, tamano, carpeta):
+    """Genera la entrada sintética de la tubería y devuelve su ruta."""
+    if tuberia == "hd":
+        ruta = os.path.join(carpeta, "hd.csv")
+        generators.generar_csv_hd(ruta, tamano)
+    elif tuberia == "wf":
+        ruta = os.path.join(carpeta, "wf.csv")
+        generators.generar_csv_wf(ruta, tamano, fs=FS_WF)
+    elif tuberia == "etas":
+        ruta = os.path.join(carpeta, "etas.xlsx")
+        generators.generar_libro_etas(ruta, tamano, hojas=HOJAS_ETAS)
+    elif tuberia == "obd":
+        ruta = os.path.join(carpeta, "obd.xlsx")
+        generators.generar_libro_obd(ruta, tamano)
+    else:
+        raise ValueError(f"Tubería desconocida: {tuberia}")
+    return ruta
+
+
+def tuberia_hd(ruta, salida, tiempos):
+    from V2L_Hioki_SCRIPT_HD import HD_PLOTS, load_hd_csv, plot_and_save, plot_fasorial
+    from V2L_PowerQuality import power_factor_stats
+    with etapa(tiempos, "parse"):
+        df = load_hd_csv(ruta)
+    with etapa(tiempos, "compute"):
+        pf_stats = power_factor_stats(df)
+    with etapa(tiempos, "render"):
+        for signals, title_prefix, kwargs in HD_PLOTS:
+            plot_and_save(df, ruta, signals, salida, title_prefix, **kwargs)
+        plot_fasorial(df, ruta, salida, 'Fasorial', pf_stats=pf_stats)
+
+
+def tuberia_wf(ruta, salida, tiempos):
+    from V2L_Hioki_SCRIPT_WF import TOP_K, WAVEFORM_COLUMNS, extract_data_from_csv, plot_data
+    from V2L_Harmonics import analyze_waveform, save_harmonics
+    from V2L_Summary import summarize_block, write_summary_excel
+    with etapa(tiempos, "parse"):
+        df = extract_data_from_csv(ruta)
+    with etapa(tiempos, "compute"):
+        tablas = summarize_block(df[WAVEFORM_COLUMNS].to_numpy(dtype=float), WAVEFORM_COLUMNS, k=TOP_K)
+        armonicos = analyze_waveform(df['Value1'], df['Value2'], FS_WF)
+    with etapa(tiempos, "render"):
+        plot_data(df, os.path.join(salida, "Image_waveform"), profile="report", logo_path="")
+    with etapa(tiempos, "write"):
+        write_summary_excel(tablas, os.path.join(salida, "summary_values.xlsx"))
+        save_harmonics(armonicos, os.path.join(salida, "harmonics.xlsx"))
+
+
+def tuberia_etas(ruta, salida, tiempos):
+    from V2L_ETAS_DATA_SCRIPT import ETAS_COLUMNS, export_sheet, load_etas_workbook, process_sheet, sheet_block
+    from V2L_Stats import channel_stats
+    with etapa(tiempos, "parse"):
+        libro = load_etas_workbook(ruta)
+        hojas = {hoja: df for hoja, df in libro.groupby("Hoja", sort=False)}
+    with etapa(tiempos, "compute"):
+        bloques = {hoja: sheet_block(df) for hoja, df in hojas.items()}
+        for bloque in bloques.values():
+            channel_stats(bloque[:, 1:], ETAS_COLUMNS[1:], time=bloque[:, 0])
+    with etapa(tiempos, "render"):
+        for hoja, df in hojas.items():
+            process_sheet(df, hoja, salida)
+    with etapa(tiempos, "write"):
+        for hoja, bloque in bloques.items():
+            export_sheet(bloque, hoja, salida)
+
+
+def tuberia_obd(ruta, salida, tiempos):
+    from V2L_OBD_DATA_SCRIPT_KONA import graficar_archivo
+    from V2L_OBD_Reader import cargar_datos_obd, filtrar_filas_completas
+    from V2L_Stats import frame_stats
+    with etapa(tiempos, "parse"):
+        # Lectura del libro y escritura de su copia en caché
+        datos = cargar_datos_obd(ruta)
+    with etapa(tiempos, "compute"):
+        datos = filtrar_filas_completas(datos, ["tiempo", "voltaje", "corriente", "soc", "potencia"])
+        frame_stats(datos, ["voltaje", "corriente", "soc", "potencia"], time_column="tiempo")
+    with etapa(tiempos, "render"):
+        # graficar_archivo vuelve a leer los datos, ya desde la caché
+        graficar_archivo(ruta, salida)
+
+
+TUBERIAS = {
+    "hd": tuberia_hd,
+    "wf": tuberia_wf,
+    "etas": tuberia_etas,
+    "obd": tuberia_obd,
+}
+
+
+def _ejecutar(cola, tuberia, ruta, salida, cache):
+    from V2L_Render import use_agg
+    use_agg()
+    from V2L_Cache import configure
+    configure(cache_dir=cache, enabled=True)
+
+    os.makedirs(salida, exist_ok=True)
+    base = peak_rss_mb()
+    tiempos = {}
+    try:
+        TUBERIAS[tuberia](ruta, salida, tiempos)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    cola.put({"etapas": tiempos, "rss_base_mb": base, "rss_pico_mb": peak_rss_mb(), "error": error})
+
+
+def medir(tuberia, ruta, salida, cache):
+    """Ejecuta la tubería en un proceso nuevo (spawn) y devuelve tiempos por etapa y pico de RSS."""
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_ejecutar, args=(cola, tuberia, ruta, salida, cache))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def version_codigo():
+    """Commit actual del repositorio, o None fuera de git."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar_suite(tuberias, escalas, repeticiones=1):
+    resultados = []
+    print(f"{'tubería':>8} {'escala':>6} {'tamaño':>9} {'parse':>8} {'compute':>8} {'render':>8} {'write':>8} "
+          f"{'total (s)':>9} {'RSS (MB)':>9}")
+    for tuberia in tuberias:
+        for escala in escalas:
+            tamano = TAMANOS_BASE[tuberia] * escala
+            with tempfile.TemporaryDirectory() as tmp:
+                t0 = time.perf_counter()
+                ruta = generar_entrada(tuberia, tamano, tmp)
+                t_generar = time.perf_counter() - t0
+
+                # Con varias repeticiones se guarda la más rápida de cada etapa y el mayor pico de memoria
+                medidas = [medir(tuberia, ruta, os.path.join(tmp, f"out{k}"), os.path.join(tmp, f"cache{k}"))
+                           for k in range(repeticiones)]
+                errores = [m["error"] for m in medidas if m["error"]]
+                picos = [m["rss_pico_mb"] for m in medidas if m["rss_pico_mb"] is not None]
+                etapas = {nombre: min(m["etapas"].get(nombre, float("inf")) for m in medidas)
+                          for nombre in medidas[0]["etapas"]}
+                resultado = {
+                    "tuberia": tuberia, "escala": escala, "tamano": tamano,
+                    "bytes_entrada": os.path.getsize(ruta), "generacion_s": t_generar,
+                    "etapas": etapas, "total_s": sum(etapas.values()),
+                    "rss_base_mb": medidas[0]["rss_base_mb"], "rss_pico_mb": max(picos) if picos else None,
+                    "error": errores[0] if errores else None,
+                }
+            resultados.append(resultado)
+            columnas = " ".join(f"{etapas[e]:8.2f}" if e in etapas else f"{'-':>8}"
+                                for e in ("parse", "compute", "render", "write"))
+            rss = f"{resultado['rss_pico_mb']:9.1f}" if picos else f"{'-':>9}"
+            error = f"  ERROR {resultado['error']}" if resultado["error"] else ""
+            print(f"{tuberia:>8} {escala:>5}x {tamano:>9} {columnas} {resultado['total_s']:9.2f} {rss}{error}")
+    return resultados
+
+
+def comparar(ruta_base, ruta_nueva, umbral=UMBRAL_REGRESION):
+    """Compara dos archivos de resultados etapa a etapa; devuelve el número de regresiones."""
+    with open(ruta_base) as f:
+        base = json.load(f)
+    with open(ruta_nueva) as f:
+        nueva = json.load(f)
+    indice = {(r["tuberia"], r["escala"]): r for r in base["resultados"]}
+
+    print(f"Base: {base.get('version')} ({base.get('fecha')})  Nueva: {nueva.get('version')} ({nueva.get('fecha')})")
+    print(f"{'tubería':>8} {'escala':>6} {'etapa':>9} {'base (s)':>9} {'nueva (s)':>9} {'ratio':>7}")
+    regresiones = 0
+    for r in nueva["resultados"]:
+        anterior = indice.get((r["tuberia"], r["escala"]))
+        if anterior is None or anterior["error"] or r["error"]:
+            continue
+        filas = [(e, anterior["etapas"].get(e), r["etapas"][e]) for e in r["etapas"]]
+        filas += [("total", anterior["total_s"], r["total_s"]), ("RSS (MB)", anterior["rss_pico_mb"], r["rss_pico_mb"])]
+        for nombre, valor_base, valor_nuevo in filas:
+            if not valor_base or valor_nuevo is None:
+                continue
+            ratio = valor_nuevo / valor_base
+            marca = ""
+            if nombre != "RSS (MB)" and max(valor_base, valor_nuevo) < MINIMO_COMPARABLE_S:
+                pass
+            elif ratio > 1 + umbral:
+                marca = "  REGRESIÓN"
+                regresiones += 1
+            elif ratio < 1 - umbral:
+                marca = "  mejora"
+            print(f"{r['tuberia']:>8} {r['escala']:>5}x {nombre:>9} {valor_base:9.2f} {valor_nuevo:9.2f} {ratio:7.2f}{marca}")
+    print(f"{regresiones} regresiones por encima del {umbral:.0%}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempos por etapa y pico de memoria de los scripts V2L con datos sintéticos.")
+    parser.add_argument("--pipelines", nargs="+", choices=list(TUBERIAS), default=list(TUBERIAS))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Múltiplos del tamaño base")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por medida (se guarda la más rápida)")
+    parser.add_argument("--output", default="bench_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVA"), help="Comparar dos archivos de resultados")
+    parser.add_argument("--threshold", type=float, default=UMBRAL_REGRESION, help="Umbral relativo de regresión")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if comparar(*args.compare, umbral=args.threshold) else 0)
+
+    resultados = ejecutar_suite(args.pipelines, args.scales, args.repeat)
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version": version_codigo(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "tamanos_base": TAMANOS_BASE,
+        "resultados": resultados,
+    }
+    with open(args.output, "w") as f:
+        json.dump(informe, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Punto de entrada único de los scripts V2L.
+
+Uso: python v2l.py <subcomando> [opciones]; por ejemplo
+    python v2l.py hioki-hd --input csv/ --output graficos/ --workers 0
+
+Cada subcomando importa su módulo solo al ejecutarse, de modo que matplotlib,
+openpyxl o PIL no se cargan para los subcomandos que no los necesitan. Si no se
+indican rutas se usan las carpetas por defecto de cada script.
+"""
+import argparse
+import logging
+import os
+import sys
+
+
+def _hioki_hd(args):
+    import V2L_Hioki_SCRIPT_HD as script
+    return script.main(args.input or script.DEFAULT_INPUT, args.output or script.DEFAULT_OUTPUT,
+                       workers=args.workers, incremental=args.incremental)
+
+
+def _hioki_wf(args):
+    import V2L_Hioki_SCRIPT_WF as script
+    return script.main(args.input or script.DEFAULT_DIRECTORY, stream=args.stream, chunksize=args.chunksize,
+                       top_k=args.top_k, full_sort=args.full_sort, fs=args.fs, f0=args.f0, hd_folder=args.hd_folder,
+                       incremental=args.incremental, output_root=args.output, workers=args.workers,
+                       profile=args.profile, logo_path=script.LOGO_PATH if args.logo is None else args.logo,
+                       binary=args.binary)
+
+
+def _etas(args):
+    import V2L_ETAS_DATA_SCRIPT as script
+    return script.main(args.input or script.DEFAULT_EXCEL, args.output or script.DEFAULT_OUTPUT,
+                       incremental=args.incremental, workers=args.workers)
+
+
+def _etas_dcdc(args):
+    import V2L_ETAS_POT_DCDC as script
+    return script.main(args.input or script.RUTA_EXCEL, args.output or script.CARPETA_SALIDA,
+                       ventanas=args.window or script.VENTANAS)
+
+
+def _obd(args):
+    import V2L_OBD_DATA_SCRIPT_KONA as script
+    # Sin rutas explícitas se reproduce la ejecución original, incluido el ensayo de resistencia de 3 h
+    endurance = args.endurance or (None if args.input else script.RUTA_ARCHIVO_ESPECIFICO)
+    return script.main(args.input or script.RUTA_ENTRADA, args.output or script.RUTA_SALIDA,
+                       ruta_archivo_especifico=endurance, incremental=args.incremental, workers=args.workers)
+
+
+def _obd_eff(args):
+    import V2L_OBD_Eficiencia as script
+    ventana = args.window or script.VENTANA
+    return script.main(args.input or script.RUTA_ENTRADA, args.output or script.RUTA_SALIDA, workers=args.workers,
+                       ventana=ventana)
+
+
+def _eff_compare(args):
+    import V2L_EFF_Comp as script
+    return script.main(args.input or script.RUTA_EXCEL, args.output or script.RUTA_SALIDA, mostrar=args.show,
+                       referencia=args.reference, ruta_ciclo=args.duty_cycle, paso=args.step)
+
+
+def _watch(args):
+    import V2L_Watch
+    return V2L_Watch.main(args.pipeline, args.input, args.output, workers=args.workers, poll=args.poll,
+                          settle=args.settle, idle_exit=args.idle_exit)
+
+
+def _tail(args):
+    import V2L_Tail
+    import V2L_Hioki_SCRIPT_HD as script
+    return V2L_Tail.main(args.input, args.output or script.DEFAULT_OUTPUT, interval=args.interval, once=args.once,
+                         plots=not args.no_plots)
+
+
+def _window(text):
+    from V2L_Window import parse_window
+    try:
+        return parse_window(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def _add_paths(parser, input_help, output_help):
+    parser.add_argument('--input', help=input_help)
+    parser.add_argument('--output', help=output_help)
+
+
+def _add_workers(parser):
+    parser.add_argument('--workers', type=int, default=1, help='Número de procesos en paralelo (0 = todos los núcleos menos uno)')
+    parser.add_argument('--threads', action='store_true', help='Repartir los archivos en un pool de hilos en lugar de procesos')
+
+
+def _add_incremental(parser):
+    parser.add_argument('--incremental', action='store_true', help='Procesar solo las entradas nuevas o modificadas')
+
+
+def build_parser():
+    # Opciones comunes a todos los subcomandos de procesado
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--cache-dir', help='Carpeta de la caché columnar (por defecto ~/.cache/v2l)')
+    common.add_argument('--no-cache', action='store_true', help='Leer siempre los archivos originales')
+    common.add_argument('--no-decimate', action='store_true', help='Dibujar todas las muestras sin diezmado mín/máx')
+    common.add_argument('--timings', metavar='JSONL',
+                        help='Registrar por archivo los tiempos de cada etapa (JSON lines) y mostrar un resumen al final')
+    common.add_argument('--cprofile', metavar='DIR',
+                        help='Volcar el perfil de cProfile de cada etapa en DIR (activa también el registro de tiempos)')
+    common.add_argument('--db', help='Base SQLite donde se anotan los estadísticos (por defecto, en la carpeta de la caché)')
+    common.add_argument('--no-db', action='store_true', help='No anotar los estadísticos en la base')
+    common.add_argument('--vehicle', help='Vehículo de los ensayos procesados, para las consultas de v2l.py query')
+
+    parser = argparse.ArgumentParser(prog='v2l', description='Procesado de los ensayos V2L: Hioki, ETAS y OBD.')
+    sub = parser.add_subparsers(dest='command', metavar='<subcomando>')
+    sub.required = True
+
+    p = sub.add_parser('hioki-hd', parents=[common], help='Gráficos de potencias y armónicos de los CSV HD del Hioki')
+    _add_paths(p, 'Carpeta con los archivos CSV', 'Carpeta de salida de los gráficos')
+    _add_workers(p)
+    _add_incremental(p)
+    p.add_argument('--no-figure-reuse', action='store_true',
+                   help='Construir cada figura desde cero con recorte ajustado (más lento)')
+    p.set_defaults(func=_hioki_hd)
+
+    p = sub.add_parser('hioki-wf', parents=[common], help='Formas de onda, resumen y armónicos de los CSV del Hioki')
+    _add_paths(p, 'Carpeta con los archivos CSV', 'Carpeta base de las salidas (por defecto, la de entrada)')
+    _add_workers(p)
+    _add_incremental(p)
+    p.add_argument('--stream', choices=['auto', 'always', 'never'], default='auto',
+                   help='Procesar por bloques (auto: solo archivos de más de 1 GB)')
+    p.add_argument('--chunksize', type=int, default=1_000_000, help='Filas por bloque en modo por bloques')
+    p.add_argument('--top-k', type=int, default=1000, help='Número de muestras extremas de la hoja de resumen')
+    p.add_argument('--full-sort', choices=['parquet', 'csv'], help='Exportar además todas las muestras ordenadas por Value1')
+    p.add_argument('--fs', type=float, help='Frecuencia de muestreo (Hz); activa el análisis armónico')
+    p.add_argument('--f0', type=float, default=50.0, help='Frecuencia fundamental (Hz)')
+    p.add_argument('--hd-folder', help='Carpeta con los CSV del Hioki HD para comparar los armónicos')
+    p.add_argument('--profile', choices=['preview', 'report', 'svg', 'pdf'], default='report',
+                   help='Perfil de salida: preview (PNG 150 dpi), report (PNG 300 dpi), svg o pdf')
+    p.add_argument('--logo', help='Imagen de la marca de agua ("" para no añadirla)')
+    p.add_argument('--binary', nargs='?', const='float32', choices=['float32', 'float64'],
+                   help='Convertir cada CSV una sola vez a binario (float32 por defecto) y leerlo como mapa de memoria')
+    p.set_defaults(func=_hioki_wf)
+
+    p = sub.add_parser('etas', parents=[common], help='Gráficos de las hojas del libro ETAS')
+    _add_paths(p, 'Libro Excel del ETAS', 'Carpeta de salida (una subcarpeta por hoja)')
+    _add_workers(p)
+    _add_incremental(p)
+    p.set_defaults(func=_etas)
+
+    p = sub.add_parser('etas-dcdc', parents=[common], help='Potencia del DCDC a partir del libro ETAS')
+    _add_paths(p, 'Libro Excel del ETAS con la potencia del DCDC', 'Carpeta de salida de los gráficos')
+    p.add_argument('--window', type=_window, action='append',
+                   help='Ventana de análisis inicio:fin en s, o "auto" para el tramo estable (repetible; por defecto 150:175)')
+    p.set_defaults(func=_etas_dcdc)
+
+    p = sub.add_parser('obd', parents=[common], help='Gráficos de los registros OBD')
+    _add_paths(p, 'Carpeta con los registros OBD (.xlsx)', 'Carpeta de salida')
+    _add_workers(p)
+    _add_incremental(p)
+    p.add_argument('--endurance', help='Registro del ensayo de resistencia para el gráfico SOC/temperatura/tensión')
+    p.set_defaults(func=_obd)
+
+    p = sub.add_parser('obd-eff', parents=[common], help='Curva de eficiencia a partir de los registros OBD')
+    _add_paths(p, 'Carpeta con los registros OBD (.xlsx)', 'Carpeta de salida')
+    _add_workers(p)
+    # Una sola ventana: la eficiencia de cada ensayo es la de su potencia media en esa ventana
+    p.add_argument('--window', type=_window,
+                   help='Ventana de la potencia media inicio:fin en s, o "auto" para el tramo estable (por defecto 25:170)')
+    p.set_defaults(func=_obd_eff)
+
+    p = sub.add_parser('eff-compare', parents=[common], help='Comparación de eficiencia entre vehículos')
+    _add_paths(p, 'Libro Excel con las eficiencias por vehículo', 'Carpeta de salida')
+    p.add_argument('--show', action='store_true', help='Abrir además el gráfico guardado en el visor de imágenes')
+    p.add_argument('--reference', help='Curva de referencia para las diferencias (por defecto, la primera)')
+    p.add_argument('--duty-cycle', help='CSV del ciclo de trabajo (potencia_kw, peso) para la eficiencia ponderada')
+    p.add_argument('--step', type=float, default=0.1, help='Paso de la malla común de potencias (kW)')
+    p.set_defaults(func=_eff_compare)
+
+    p = sub.add_parser('watch', parents=[common],
+                       help='Vigilar una carpeta y procesar cada archivo nuevo en cuanto termina de copiarse')
+    p.add_argument('pipeline', choices=['hioki-hd', 'obd'], help='Tipo de archivos de la carpeta')
+    _add_paths(p, 'Carpeta a vigilar', 'Carpeta de salida')
+    _add_workers(p)
+    p.add_argument('--poll', type=float, default=1.0, help='Intervalo de sondeo de la carpeta (s)')
+    p.add_argument('--settle', type=float, default=2.0,
+                   help='Segundos sin cambios de tamaño ni fecha para dar un archivo por terminado')
+    p.add_argument('--idle-exit', type=float, metavar='S',
+                   help='Terminar tras S segundos sin archivos pendientes (por defecto, vigilar hasta Ctrl+C)')
+    p.set_defaults(func=_watch)
+
+    p = sub.add_parser('tail', parents=[common],
+                       help='Informes parciales de un CSV HD del Hioki que sigue creciendo (solo lee las filas nuevas)')
+    p.add_argument('--input', required=True, help='CSV HD en curso')
+    p.add_argument('--output', help='Carpeta de salida de los gráficos')
+    p.add_argument('--interval', type=float, default=10.0, help='Segundos entre informes')
+    p.add_argument('--once', action='store_true', help='Actualizar e informar una sola vez (continúa donde lo dejó la anterior)')
+    p.add_argument('--no-plots', action='store_true', help='Solo la tabla de estadísticos, sin regenerar los gráficos')
+    p.set_defaults(func=_tail)
+
+    # Solo para la ayuda: main() pasa las opciones tal cual a V2L_Cache.main()
+    sub.add_parser('cache', help='Gestiona la caché columnar (--list, --clear, --source, --max-mb, --cache-dir)', add_help=False)
+    # Ídem con V2L_StatsDB.main()
+    sub.add_parser('query', help='Consulta los estadísticos anotados de todos los ensayos (--channel, --metric, '
+                                 '--vehicle, --filter, --agg, --list, --sql)', add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['cache']:
+        import V2L_Cache
+        V2L_Cache.main(argv[1:])
+        return 0
+    if argv[:1] == ['query']:
+        import V2L_StatsDB
+        return V2L_StatsDB.main(argv[1:])
+
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    # La configuración se hereda por variables de entorno en los procesos del pool
+    from V2L_Cache import configure
+    from V2L_Decimate import set_decimation
+    configure(cache_dir=args.cache_dir, enabled=False if args.no_cache else None)
+    if args.no_decimate:
+        set_decimation(False)
+    from V2L_Render import set_figure_reuse, use_agg
+    if getattr(args, 'no_figure_reuse', False):
+        set_figure_reuse(False)
+    if getattr(args, 'threads', False):
+        from V2L_Batch import set_executor
+        set_executor('thread')
+    # Todos los gráficos se dibujan fuera de pyplot con el backend Agg, también en los procesos del pool
+    os.environ['MPLBACKEND'] = 'Agg'
+    use_agg()
+
+    import V2L_StatsDB
+    if args.no_db:
+        V2L_StatsDB.configure(enabled=False)
+    else:
+        V2L_StatsDB.configure(path=args.db or V2L_StatsDB.default_path(), vehicle=args.vehicle)
+
+    import V2L_Profile
+    V2L_Profile.configure(log_path=args.timings, profile_dir=args.cprofile)
+
+    errores = args.func(args)
+
+    if V2L_Profile.enabled():
+        V2L_Profile.print_summary(V2L_Profile.load_records())
+        for informe in V2L_Profile.write_profile_reports():
+            print(f"Perfil de la etapa guardado en {informe}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())